@@ -0,0 +1,150 @@
+"""
+Measure read throughput of /habits/due/today while check/uncheck writes run.
+
+Seeds a temporary habits.db, serves the app from it with uvicorn in several
+worker processes, then runs reader threads that request /habits/due/today in
+a loop next to writer threads that alternately check and uncheck batches of
+today's logs. Every write invalidates the cached due list of the worker that
+served it, so most reads after a write go to the database, and the workers'
+connections contend for the same file like in production. Prints reads and
+writes per second, read latency percentiles and failed requests.
+
+Run it once per journal mode to compare:
+
+    python benchmarks/concurrent_reads.py --journal-mode wal
+    python benchmarks/concurrent_reads.py --journal-mode delete
+
+Usage: python benchmarks/concurrent_reads.py [--habits 500] [--days 365] [--workers 4]
+       [--readers 8] [--writers 2] [--batch 20] [--seconds 10] [--journal-mode wal] [--port 8765]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+import httpx
+import numpy as np
+
+# Add the app directory to the path so we can import the modules
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(APP_DIR)
+
+def wait_until_serving(base_url: str, server: subprocess.Popen, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError("uvicorn exited before serving")
+        try:
+            httpx.get(f"{base_url}/openapi.json")
+            return
+        except httpx.TransportError:
+            time.sleep(0.2)
+    raise RuntimeError("uvicorn did not start in time")
+
+def run_readers(client_factory, stop: threading.Event, latencies: list, failures: list):
+    client = client_factory()
+    while not stop.is_set():
+        started = time.perf_counter()
+        response = client.get("/habits/due/today")
+        if response.status_code == 200:
+            latencies.append(time.perf_counter() - started)
+        else:
+            failures.append(response.status_code)
+
+def run_writer(client_factory, stop: threading.Event, log_ids: list, batch: int, writes: list, failures: list):
+    client = client_factory()
+    completed = True
+    while not stop.is_set():
+        for start in range(0, len(log_ids), batch):
+            if stop.is_set():
+                break
+            response = client.post(
+                "/habits/check" if completed else "/habits/uncheck",
+                json={"log_ids": log_ids[start:start + batch]}
+            )
+            if response.status_code == 200:
+                writes.append(1)
+            else:
+                failures.append(response.status_code)
+        completed = not completed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--habits", type=int, default=500)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=2)
+    parser.add_argument("--batch", type=int, default=20)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--journal-mode", default="wal")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # The engines are created from the environment, here and in every worker
+        os.environ["HABITS_DATABASE_URL"] = f"sqlite:///{os.path.join(tmp, 'habits.db')}"
+        os.environ["TIMER_DATABASE_URL"] = f"sqlite:///{os.path.join(tmp, 'timer.db')}"
+        os.environ["SQLITE_JOURNAL_MODE"] = args.journal_mode
+        from explain_queries import seed_habits
+        from habits.database.database import database
+        from habits.database.migrations import MIGRATIONS
+        from utils.migrations import run_migrations
+
+        run_migrations(database.engines.write, MIGRATIONS)
+        start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=args.days)
+        print(f"Seeding {args.habits} habits with {args.days} days of logs ({args.journal_mode})...")
+        seed_habits(database.engines.write, args.habits, args.habits * args.days, start)
+        database.dispose()
+
+        base_url = f"http://127.0.0.1:{args.port}"
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--port", str(args.port),
+             "--workers", str(args.workers), "--log-level", "warning"],
+            cwd=APP_DIR, stdout=subprocess.DEVNULL
+        )
+        try:
+            wait_until_serving(base_url, server)
+            log_ids = [item["latest_log"]["id"] for item in httpx.get(f"{base_url}/habits/due/today").json()]
+            # Writers work on disjoint logs, like separate users checking their own habits
+            log_slices = [log_ids[i::args.writers] for i in range(args.writers)]
+
+            def client_factory():
+                # One client per thread, each with its own keep-alive connection
+                return httpx.Client(base_url=base_url, timeout=60)
+
+            stop = threading.Event()
+            latencies, writes, failures = [], [], []
+            threads = [
+                threading.Thread(target=run_readers, args=(client_factory, stop, latencies, failures))
+                for _ in range(args.readers)
+            ] + [
+                threading.Thread(target=run_writer, args=(client_factory, stop, log_slice, args.batch, writes, failures))
+                for log_slice in log_slices
+            ]
+            for thread in threads:
+                thread.start()
+            time.sleep(args.seconds)
+            stop.set()
+            for thread in threads:
+                thread.join()
+        finally:
+            server.terminate()
+            server.wait()
+
+    latencies_ms = np.array(latencies) * 1000
+    print(f"\n== {args.workers} workers, {args.readers} readers, {args.writers} writers, {args.seconds:.0f}s, "
+          f"journal_mode={args.journal_mode}")
+    print(f"  reads:  {len(latencies) / args.seconds:8.1f}/s")
+    print(f"  writes: {len(writes) / args.seconds:8.1f}/s (batches of {args.batch} logs)")
+    if len(latencies_ms):
+        p50, p95, p99 = np.percentile(latencies_ms, [50, 95, 99])
+        print(f"  read latency ms: p50 {p50:.1f}  p95 {p95:.1f}  p99 {p99:.1f}  max {latencies_ms.max():.1f}")
+    print(f"  failed requests: {len(failures)}")
+
+if __name__ == "__main__":
+    main()
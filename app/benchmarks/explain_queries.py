@@ -0,0 +1,182 @@
+"""
+Check that the hot habit and timer queries are served by indexes.
+
+Builds migrated copies of habits.db and timer.db in a temporary directory,
+seeds them (1M habit logs by default), runs the real repository methods while
+capturing their SQL, and prints EXPLAIN QUERY PLAN for each statement. Exits
+non-zero if any filtered query scans a table without an index.
+
+Usage: python benchmarks/explain_queries.py [--habits 2000] [--logs 1000000] [--sounds 10000]
+"""
+import argparse
+import os
+import re
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import numpy as np
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+# Add the app directory to the path so we can import the modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from habits.database.migrations import MIGRATIONS as HABITS_MIGRATIONS
+from habits.database.models import Habit
+from habits.repositories.habit_log_repository import HabitLogRepository
+from habits.repositories.habit_log_archive_repository import HabitLogArchiveRepository
+from habits.repositories.habit_stats_repository import HabitStatsRepository
+from habits.slots import slot_log_id
+from timer.database.migrations import MIGRATIONS as TIMER_MIGRATIONS
+from timer.repositories.sound_repository import SoundRepository
+from utils.date_utils import compile_recurrence
+from utils.migrations import run_migrations
+
+FULL_SCAN = re.compile(r"\bSCAN (habits|habit_logs|sounds|timers)\b(?! USING)")
+
+def seed_habits(engine, habit_count: int, log_count: int, start: datetime):
+    logs_per_habit = max(1, log_count // habit_count)
+    habit_ids = [str(uuid.uuid4()) for _ in range(habit_count)]
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        cursor.executemany(
+            "INSERT INTO habits (id, name, recurrence, created_at) VALUES (?, ?, 'day', ?)",
+            [(habit_id, f"Habit {i}", start.isoformat(sep=" ")) for i, habit_id in enumerate(habit_ids)]
+        )
+        # Every habit shares the same daily due dates, generated in one vectorized call
+        due_dates = compile_recurrence("day").due_dates(start, start, start + timedelta(days=logs_per_habit))
+        due_dates = np.char.replace(np.datetime_as_string(due_dates, unit="us"), "T", " ").tolist()
+        for habit_id in habit_ids:
+            cursor.executemany(
+                "INSERT INTO habit_logs (id, habit_id, due_date, completed) VALUES (?, ?, ?, ?)",
+                [
+                    (slot_log_id(habit_id, n), habit_id, due_date, n % 3 != 0)
+                    for n, due_date in enumerate(due_dates, start=1)
+                ]
+            )
+        raw.commit()
+        cursor.execute("ANALYZE")
+        raw.commit()
+    finally:
+        raw.close()
+    return habit_ids, logs_per_habit
+
+def seed_sounds(engine, sound_count: int):
+    raw = engine.raw_connection()
+    try:
+        raw.cursor().executemany(
+            "INSERT INTO sounds (id, name, file) VALUES (?, ?, ?)",
+            [(str(uuid.uuid4()), f"sound{i}", f"/sounds/sound{i}.wav") for i in range(sound_count)]
+        )
+        raw.commit()
+        raw.cursor().execute("ANALYZE")
+        raw.commit()
+    finally:
+        raw.close()
+
+class QueryCapture:
+    def __init__(self, engine):
+        self.statements = []
+        event.listen(engine, "before_cursor_execute", self._capture)
+
+    def _capture(self, conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT") and not executemany:
+            self.statements.append((statement, parameters))
+
+    def take(self):
+        statements, self.statements = self.statements, []
+        return statements
+
+def explain(engine, statement, parameters):
+    with engine.connect() as conn:
+        rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall()
+    return [row[-1] for row in rows]
+
+def check(name, engine, capture, action) -> bool:
+    started = time.perf_counter()
+    action()
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    ok = True
+    print(f"\n== {name} ({elapsed_ms:.1f} ms)")
+    for statement, parameters in capture.take():
+        plan = explain(engine, statement, parameters)
+        # Listing a whole table (no WHERE clause) is expected to scan it
+        filtered = " WHERE " in statement.upper()
+        scans = [line for line in plan if filtered and FULL_SCAN.search(line)]
+        ok = ok and not scans
+        print("  " + " ".join(statement.split())[:160])
+        for line in plan:
+            print(f"    {'!!' if line in scans else '->'} {line}")
+    return ok
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--habits", type=int, default=2000)
+    parser.add_argument("--logs", type=int, default=1_000_000)
+    parser.add_argument("--sounds", type=int, default=10_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        habits_engine = create_engine(f"sqlite:///{os.path.join(tmp, 'habits.db')}")
+        timer_engine = create_engine(f"sqlite:///{os.path.join(tmp, 'timer.db')}")
+        run_migrations(habits_engine, HABITS_MIGRATIONS)
+        run_migrations(timer_engine, TIMER_MIGRATIONS)
+
+        start = datetime(2020, 1, 1, 9, 30)
+        print(f"Seeding {args.habits} habits and {args.logs} habit logs...")
+        habit_ids, logs_per_habit = seed_habits(habits_engine, args.habits, args.logs, start)
+        print(f"Seeding {args.sounds} sounds...")
+        seed_sounds(timer_engine, args.sounds)
+
+        habits_capture = QueryCapture(habits_engine)
+        timer_capture = QueryCapture(timer_engine)
+        habits_db = sessionmaker(bind=habits_engine)()
+        timer_db = sessionmaker(bind=timer_engine)()
+        habit_repo = HabitLogRepository(habits_db)
+        stats_repo = HabitStatsRepository(habits_db)
+        archive_repo = HabitLogArchiveRepository(habits_db)
+        sound_repo = SoundRepository(timer_db)
+
+        habit = habits_db.query(Habit).filter(Habit.id == habit_ids[len(habit_ids) // 2]).one()
+        habits_capture.take()
+        day = start + timedelta(days=logs_per_habit // 2)
+
+        results = [
+            check("get_due_habits", habits_engine, habits_capture,
+                  lambda: habit_repo.get_due_habits(day)),
+            check("get_slot_log", habits_engine, habits_capture,
+                  lambda: habit_repo.get_slot_log(habit, logs_per_habit // 2)),
+            check("get_latest_log", habits_engine, habits_capture,
+                  lambda: habit_repo.get_latest_log(habit.id)),
+            check("resolve_habit_log (virtual slot)", habits_engine, habits_capture,
+                  lambda: habit_repo.resolve_habit_log(slot_log_id(habit.id, logs_per_habit + 10))),
+            check("rebuild habit stats", habits_engine, habits_capture,
+                  lambda: stats_repo.rebuild([habit])),
+            check("get_stats (one habit)", habits_engine, habits_capture,
+                  lambda: stats_repo.get_stats(day, habit.id)),
+            check("get_logs_page (after cursor)", habits_engine, habits_capture,
+                  lambda: habit_repo.get_logs_page(100, (day, habit.id))),
+            check("get_logs_page (one habit, date range)", habits_engine, habits_capture,
+                  lambda: habit_repo.get_logs_page(100, None, habit.id, start, day)),
+            check("archive_logs (first days)", habits_engine, habits_capture,
+                  lambda: archive_repo.archive_logs(start + timedelta(days=5))),
+            check("completed_slots (archived)", habits_engine, habits_capture,
+                  lambda: archive_repo.completed_slots([(habit.id, start + timedelta(days=2))])),
+            check("get_sound_by_file", timer_engine, timer_capture,
+                  lambda: sound_repo.get_sound_by_file(f"/sounds/sound{args.sounds // 2}.wav")),
+        ]
+
+        habits_db.close()
+        timer_db.close()
+
+    if not all(results):
+        print("\nFAIL: some hot queries scan a table without an index")
+        sys.exit(1)
+    print("\nOK: all hot queries use an index")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Measure what logging costs the code that logs.
+
+Prints the caller-side cost of a disabled debug call, of an enabled info call
+handed to the background queue, and of the same call written synchronously
+to a stream (the old setup), then the request rate of a few read endpoints
+with logging at LOG_LEVEL (INFO by default) against logging switched off.
+Log output goes to /dev/null while it runs.
+
+Usage: python benchmarks/logging_overhead.py [--calls 200000] [--requests 2000]
+"""
+import argparse
+import io
+import logging
+import os
+import sys
+import tempfile
+import time
+
+# Add the app directory to the path so we can import the modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+ENDPOINTS = ["/habits", "/habits/due/today", "/habits/stats", "/timer/"]
+
+def per_call_ns(fn, calls: int) -> float:
+    started = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    return (time.perf_counter() - started) / calls * 1e9
+
+def requests_per_second(client, count: int) -> float:
+    started = time.perf_counter()
+    for i in range(count):
+        client.get(ENDPOINTS[i % len(ENDPOINTS)])
+    return count / (time.perf_counter() - started)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=200_000)
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    report = sys.stdout
+    # The log listener writes to whatever sys.stdout is when it starts
+    sys.stdout = open(os.devnull, "w")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["HABITS_DATABASE_URL"] = f"sqlite:///{os.path.join(tmp, 'habits.db')}"
+        os.environ["TIMER_DATABASE_URL"] = f"sqlite:///{os.path.join(tmp, 'timer.db')}"
+        # Measure every record's full path, not the rate limiter dropping repeats
+        os.environ["LOG_RATE_LIMIT"] = "0"
+        from fastapi.testclient import TestClient
+        from utils.logging import LOG_LEVEL, setup_logger, stop_logging
+        import main as app_main
+
+        logger = setup_logger("benchmarks.logging_overhead")
+        sync_logger = logging.getLogger("benchmarks.logging_overhead.sync")
+        sync_logger.propagate = False
+        sync_logger.setLevel(logging.DEBUG)
+        sync_logger.addHandler(logging.StreamHandler(io.StringIO()))
+
+        report.write(f"== per call ({args.calls} calls, LOG_LEVEL={LOG_LEVEL})\n")
+        report.write(f"  disabled debug:          {per_call_ns(lambda: logger.debug('Fetched %s', 42), args.calls):8.0f} ns\n")
+        report.write(f"  info through the queue:  {per_call_ns(lambda: logger.info('Fetched %s', 42), args.calls):8.0f} ns\n")
+        report.write(f"  info to a stream inline: {per_call_ns(lambda: sync_logger.info('Fetched %s', 42), args.calls):8.0f} ns\n")
+
+        # Entering the client runs the lifespan, which migrates the temporary databases
+        with TestClient(app_main.app) as client:
+            client.post("/habits", json={"name": "Benchmark", "recurrence": "day"})
+            requests_per_second(client, len(ENDPOINTS) * 10)  # warm up
+
+            with_logging = requests_per_second(client, args.requests)
+            logging.disable(logging.CRITICAL)
+            without_logging = requests_per_second(client, args.requests)
+            logging.disable(logging.NOTSET)
+
+        report.write(f"\n== per request ({args.requests} requests over {', '.join(ENDPOINTS)})\n")
+        report.write(f"  logging at {LOG_LEVEL}: {with_logging:8.0f} req/s ({1e6 / with_logging:.0f} us/request)\n")
+        report.write(f"  logging disabled: {without_logging:8.0f} req/s ({1e6 / without_logging:.0f} us/request)\n")
+        report.write(f"  overhead:         {(1e6 / with_logging - 1e6 / without_logging):8.1f} us/request\n")
+        stop_logging()
+
+if __name__ == "__main__":
+    main()
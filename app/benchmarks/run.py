@@ -0,0 +1,383 @@
+"""
+Benchmark every route of the app in-process, on seeded data.
+
+Serves the app from the databases in --data (made by seed.py; without it a
+small set is seeded into a temporary directory) through httpx's ASGI
+transport, with the lifespan running as under uvicorn. Each route gets
+--requests requests from --concurrency concurrent clients, and each timer
+WebSocket command is sent --requests times over --concurrency sockets, in
+start, pause, resume, stop, set cycles (their req/s is cycles per second).
+Latency percentiles and throughput are printed and written as JSON to
+--output (default benchmarks/results/<time>.json); --baseline prints the
+change from an earlier result file.
+
+Write routes undo their own changes (check then uncheck the same logs,
+create then delete), so a seeded directory can be benchmarked repeatedly.
+PATCH /timer/sounds is left out: it syncs the repository's dingutil/sounds
+directory, not the seeded one. Responses are served as in production, so
+cached lists mostly measure cache hits.
+
+Usage: python benchmarks/run.py [--data DIR] [--requests 200] [--concurrency 8] [--output FILE] [--baseline FILE]
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import httpx
+import numpy as np
+
+# Add the app directory to the path so we can import the modules
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(APP_DIR)
+
+# Size of the data seeded when no --data directory is given
+SMALL_SCALE = {"habits": 1000, "logs": 200_000, "timers": 100, "sounds": 50}
+
+# Items per request of the bulk routes
+BULK_SIZE = 10
+
+class Case(NamedTuple):
+    name: str
+    # Request i as (method, url, keyword arguments for httpx)
+    request: Callable[[int], Tuple[str, str, Dict]]
+    # Called with each successful response, to collect the IDs later cases need
+    on_response: Optional[Callable[[int, httpx.Response], None]] = None
+
+class Fixtures:
+    """IDs of the seeded rows, and of the rows the write cases create"""
+
+    def __init__(self, count: int, habits: List[Dict], due: List[Dict], timers: List[Dict], sounds: List[Dict]):
+        rng = random.Random(0)
+        self.habit_ids = [habit["id"] for habit in habits]
+        self.sample_habits = [rng.choice(self.habit_ids) for _ in range(count)]
+        # Today's logs all share one state in seeded data; write cases flip them and flip them back
+        self.today_completed = sum(item["latest_log"]["completed"] for item in due) * 2 > len(due)
+        self.today_logs = [
+            item["latest_log"]["id"] for item in due if item["latest_log"]["completed"] == self.today_completed
+        ]
+        self.timers = timers
+        self.sound_ids = [sound["id"] for sound in sounds]
+        self.created_habits: List[Optional[str]] = [None] * count
+        self.created_bulk: List[List[str]] = [[] for _ in range(count)]
+        self.created_timers: List[Optional[str]] = [None] * count
+        self.imported: List[str] = []
+
+def days_ago(days: int) -> str:
+    return (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d")
+
+def habit_cases(f: Fixtures) -> List[Case]:
+    logs = f.today_logs or [str(uuid.uuid4())]
+
+    def log_group(i: int) -> List[str]:
+        return [logs[(i * BULK_SIZE + k) % len(logs)] for k in range(BULK_SIZE)]
+
+    def import_body(i: int) -> Dict:
+        ids = [str(uuid.uuid4()) for _ in range(BULK_SIZE)]
+        f.imported.extend(ids)
+        lines = [json.dumps({"id": habit_id, "name": f"Imported {i}", "recurrence": "day"}) for habit_id in ids]
+        return {"content": "\n".join(lines), "headers": {"content-type": "application/x-ndjson"}}
+
+    # Flip today's logs one way, then back: check first when they are open, uncheck first when done
+    first, second = ("uncheck", "check") if f.today_completed else ("check", "uncheck")
+    return [
+        Case("GET /habits", lambda i: ("GET", "/habits", {})),
+        Case("GET /habits?limit=100", lambda i: ("GET", "/habits?limit=100", {})),
+        Case("GET /habits/export", lambda i: ("GET", "/habits/export", {})),
+        Case("GET /habits/{habit_id}/get", lambda i: ("GET", f"/habits/{f.sample_habits[i]}/get", {})),
+        Case("GET /habits/logs?habit_id&limit=100",
+             lambda i: ("GET", f"/habits/logs?habit_id={f.sample_habits[i]}&limit=100", {})),
+        Case("GET /habits/logs/export?habit_id",
+             lambda i: ("GET", f"/habits/logs/export?habit_id={f.sample_habits[i]}", {})),
+        Case("GET /habits/due/today", lambda i: ("GET", "/habits/due/today", {})),
+        Case("GET /habits/due?date", lambda i: ("GET", f"/habits/due?date={days_ago(i % 30)}", {})),
+        Case("GET /habits/calendar", lambda i: ("GET", f"/habits/calendar?from={days_ago(30)}&to={days_ago(0)}", {})),
+        Case("GET /habits/stats", lambda i: ("GET", "/habits/stats", {})),
+        Case("GET /habits/{habit_id}/stats", lambda i: ("GET", f"/habits/{f.sample_habits[i]}/stats", {})),
+        Case(f"PUT /habits/{first}/{{log_id}}", lambda i: ("PUT", f"/habits/{first}/{logs[i % len(logs)]}", {})),
+        Case(f"PUT /habits/{second}/{{log_id}}", lambda i: ("PUT", f"/habits/{second}/{logs[i % len(logs)]}", {})),
+        Case(f"POST /habits/{first}", lambda i: ("POST", f"/habits/{first}", {"json": {"log_ids": log_group(i)}})),
+        Case(f"POST /habits/{second}", lambda i: ("POST", f"/habits/{second}", {"json": {"log_ids": log_group(i)}})),
+        Case("POST /habits",
+             lambda i: ("POST", "/habits", {"json": {"name": f"Benchmark {i}", "recurrence": "day"}}),
+             lambda i, response: f.created_habits.__setitem__(i, response.json()["id"])),
+        Case("PUT /habits/{habit_id}/update",
+             lambda i: ("PUT", f"/habits/{f.created_habits[i]}/update",
+                        {"json": {"name": f"Benchmark {i}", "recurrence": "2 days"}})),
+        Case("DELETE /habits/{habit_id}/delete", lambda i: ("DELETE", f"/habits/{f.created_habits[i]}/delete", {})),
+        Case("POST /habits/bulk",
+             lambda i: ("POST", "/habits/bulk",
+                        {"json": {"habits": [{"name": f"Bulk {i}.{k}", "recurrence": "day"} for k in range(BULK_SIZE)]}}),
+             lambda i, response: f.created_bulk.__setitem__(
+                 i, [result["habit"]["id"] for result in response.json()["results"]])),
+        Case("PUT /habits/bulk",
+             lambda i: ("PUT", "/habits/bulk",
+                        {"json": {"habits": [{"id": habit_id, "name": f"Bulk {i}", "recurrence": "week"}
+                                             for habit_id in f.created_bulk[i]]}})),
+        Case("POST /habits/bulk/delete",
+             lambda i: ("POST", "/habits/bulk/delete", {"json": {"habit_ids": f.created_bulk[i]}})),
+        Case("POST /habits/import", lambda i: ("POST", "/habits/import", import_body(i))),
+    ]
+
+def timer_cases(f: Fixtures) -> List[Case]:
+    sounds = f.sound_ids or [str(uuid.uuid4())]
+    return [
+        Case("GET /timer/", lambda i: ("GET", "/timer/", {})),
+        Case("GET /timer/?limit=100", lambda i: ("GET", "/timer/?limit=100", {})),
+        Case("GET /timer/active", lambda i: ("GET", "/timer/active", {})),
+        Case("GET /timer/stats", lambda i: ("GET", f"/timer/stats?from={days_ago(30)}&to={days_ago(0)}", {})),
+        Case("GET /timer/{timer_id}/events",
+             lambda i: ("GET", f"/timer/{f.timers[i % len(f.timers)]['id']}/events", {})),
+        Case("GET /timer/sounds", lambda i: ("GET", "/timer/sounds", {})),
+        Case("GET /timer/sounds/{sound_id}", lambda i: ("GET", f"/timer/sounds/{sounds[i % len(sounds)]}", {})),
+        Case("HEAD /timer/sounds/{sound_id}", lambda i: ("HEAD", f"/timer/sounds/{sounds[i % len(sounds)]}", {})),
+        Case("POST /timer/",
+             lambda i: ("POST", "/timer/", {"json": {"name": f"Benchmark {i}", "duration": 60}}),
+             lambda i, response: f.created_timers.__setitem__(i, response.json()["id"])),
+        Case("PUT /timer/{timer_id}",
+             lambda i: ("PUT", f"/timer/{f.created_timers[i]}", {"json": {"name": f"Benchmark {i}", "duration": 90}})),
+        Case("DELETE /timer/{timer_id}", lambda i: ("DELETE", f"/timer/{f.created_timers[i]}", {})),
+        Case("GET /dashboard", lambda i: ("GET", "/dashboard", {})),
+        Case("GET /metrics", lambda i: ("GET", "/metrics", {})),
+        Case("GET /openapi.json", lambda i: ("GET", "/openapi.json", {})),
+    ]
+
+def summarize(name: str, latencies: List[float], errors: int, seconds: float) -> Dict:
+    milliseconds = np.array(latencies) * 1000
+    p50, p95, p99 = np.percentile(milliseconds, [50, 95, 99]) if len(milliseconds) else (0.0, 0.0, 0.0)
+    return {
+        "name": name,
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / seconds, 1) if seconds else 0.0,
+        "mean_ms": round(float(milliseconds.mean()), 3) if len(milliseconds) else 0.0,
+        "p50_ms": round(float(p50), 3),
+        "p95_ms": round(float(p95), 3),
+        "p99_ms": round(float(p99), 3),
+    }
+
+async def run_case(client: httpx.AsyncClient, case: Case, count: int, concurrency: int) -> Dict:
+    latencies = []
+    errors = 0
+    indexes = iter(range(count))
+
+    async def worker():
+        nonlocal errors
+        for i in indexes:
+            method, url, kwargs = case.request(i)
+            started = time.perf_counter()
+            response = await client.request(method, url, **kwargs)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                errors += 1
+            elif case.on_response is not None:
+                case.on_response(i, response)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(case.name, latencies, errors, time.perf_counter() - started)
+
+class WebSocketClient:
+    """One timer WebSocket driven directly through the ASGI interface.
+
+    A command counts as handled once the endpoint asks for the next message,
+    since the endpoint sends nothing back per command.
+    """
+
+    def __init__(self, app, path: str):
+        self.app = app
+        self.path = path
+        self.incoming: asyncio.Queue = asyncio.Queue()
+        self.receives = 0
+        self.ready = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+
+    async def _receive(self):
+        self.receives += 1
+        self.ready.set()
+        return await self.incoming.get()
+
+    async def _send(self, message):
+        pass  # Timer updates broadcast to subscribers are dropped
+
+    async def _until_receives(self, count: int):
+        while self.receives < count:
+            if self.task.done():
+                raise RuntimeError(f"WebSocket {self.path} closed")
+            self.ready.clear()
+            await asyncio.wait_for(self.ready.wait(), 10)
+
+    async def connect(self):
+        scope = {
+            "type": "websocket", "asgi": {"version": "3.0"}, "scheme": "ws", "http_version": "1.1",
+            "path": self.path, "raw_path": self.path.encode(), "root_path": "", "query_string": b"",
+            "headers": [(b"host", b"bench")], "server": ("bench", 80), "client": ("bench", 1), "subprotocols": [],
+        }
+        self.task = asyncio.create_task(self.app(scope, self._receive, self._send))
+        await self.incoming.put({"type": "websocket.connect"})
+        # The handshake takes the first receive; the command loop waiting is the second
+        await self._until_receives(2)
+
+    async def command(self, text: str) -> float:
+        target = self.receives + 1
+        started = time.perf_counter()
+        await self.incoming.put({"type": "websocket.receive", "text": text})
+        await self._until_receives(target)
+        return time.perf_counter() - started
+
+    async def close(self):
+        await self.incoming.put({"type": "websocket.disconnect", "code": 1000})
+        await self.task
+
+async def run_websocket_cases(app, f: Fixtures, count: int, concurrency: int) -> List[Dict]:
+    timers = f.timers[:concurrency]
+    clients = [WebSocketClient(app, f"/timer/ws/{timer['id']}") for timer in timers]
+    for client in clients:
+        await client.connect()
+
+    def set_command(timer: Dict) -> str:
+        # Sets the timer to the duration it already has, so the stored row keeps its value
+        hours, rest = divmod(timer["duration"], 3600)
+        return json.dumps({"set": f"{hours:02d}{rest // 60:02d}{rest % 60:02d}"})
+
+    commands = [
+        ("start", lambda timer: json.dumps({"action": "start"})),
+        ("pause", lambda timer: json.dumps({"action": "pause"})),
+        ("resume", lambda timer: json.dumps({"action": "resume"})),
+        ("stop", lambda timer: json.dumps({"action": "stop"})),
+        ("set", set_command),
+    ]
+    latencies: Dict[str, List[float]] = {name: [] for name, _ in commands}
+    indexes = iter(range(count))
+
+    async def worker(client: WebSocketClient, timer: Dict):
+        # Whole cycles, so every command is a valid transition of the timer
+        for _ in indexes:
+            for name, message in commands:
+                latencies[name].append(await client.command(message(timer)))
+
+    try:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(client, timer) for client, timer in zip(clients, timers)))
+        seconds = time.perf_counter() - started
+    finally:
+        for client in clients:
+            await client.close()
+    # Each command's req/s is cycles per second
+    return [summarize(f"WS /timer/ws/{{timer_id}} {name}", latencies[name], 0, seconds) for name, _ in commands]
+
+async def run_benchmarks(count: int, concurrency: int) -> Tuple[List[Dict], Dict[str, int]]:
+    import main as app_main
+
+    transport = httpx.ASGITransport(app=app_main.app)
+    async with app_main.app.router.lifespan_context(app_main.app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            f = Fixtures(
+                count,
+                habits=(await client.get("/habits")).json(),
+                due=(await client.get("/habits/due/today")).json(),
+                timers=(await client.get("/timer/")).json(),
+                sounds=(await client.get("/timer/sounds")).json(),
+            )
+            scale = {"habits": len(f.habit_ids), "timers": len(f.timers), "sounds": len(f.sound_ids)}
+
+            results = []
+            for case in habit_cases(f) + timer_cases(f):
+                if case.name.startswith(("GET", "HEAD")):
+                    await run_case(client, case, min(count, 5), 1)  # warm up
+                results.append(await run_case(client, case, count, concurrency))
+                print_result(results[-1])
+            for result in await run_websocket_cases(app_main.app, f, count, concurrency):
+                results.append(result)
+                print_result(result)
+
+            # Habits imported by the import case have no delete case of their own
+            for start in range(0, len(f.imported), 1000):
+                await client.post("/habits/bulk/delete", json={"habit_ids": f.imported[start:start + 1000]})
+    return results, scale
+
+def print_result(result: Dict):
+    errors = f"  {result['errors']} errors" if result["errors"] else ""
+    print(f"  {result['name']:<42} {result['rps']:9.1f} {result['p50_ms']:9.2f} "
+          f"{result['p95_ms']:9.2f} {result['p99_ms']:9.2f}{errors}")
+
+def print_comparison(results: List[Dict], baseline_path: str):
+    with open(baseline_path) as f:
+        baseline = {result["name"]: result for result in json.load(f)["results"]}
+    print(f"\n== against {baseline_path}")
+    print(f"  {'route':<42} {'req/s':>9} {'p50':>9} {'p99':>9}")
+    for result in results:
+        before = baseline.get(result["name"])
+        if before is None or not before["rps"] or not before["p50_ms"] or not before["p99_ms"]:
+            continue
+        print(f"  {result['name']:<42} {(result['rps'] / before['rps'] - 1) * 100:+8.0f}% "
+              f"{(result['p50_ms'] / before['p50_ms'] - 1) * 100:+8.0f}% "
+              f"{(result['p99_ms'] / before['p99_ms'] - 1) * 100:+8.0f}%")
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=APP_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", help="directory seeded by seed.py")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--output")
+    parser.add_argument("--baseline")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data = args.data or tmp
+        # The app's database modules read these when first imported, which seed.py already does
+        os.environ["HABITS_DATABASE_URL"] = f"sqlite:///{os.path.abspath(os.path.join(data, 'habits.db'))}"
+        os.environ["TIMER_DATABASE_URL"] = f"sqlite:///{os.path.abspath(os.path.join(data, 'timer.db'))}"
+        # Request logging would dominate the output
+        os.environ.setdefault("LOG_LEVEL", "WARNING")
+        if args.data is None:
+            from seed import seed
+            print(f"Seeding {', '.join(f'{count} {name}' for name, count in SMALL_SCALE.items())} into {tmp}")
+            seed(tmp, **SMALL_SCALE)
+
+        print(f"== {args.requests} requests per route, {args.concurrency} concurrent clients")
+        print(f"  {'route':<42} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+        started = datetime.now()
+        results, scale = asyncio.run(run_benchmarks(args.requests, args.concurrency))
+        with sqlite3.connect(os.path.join(data, "habits.db")) as conn:
+            scale["logs"] = conn.execute("SELECT COUNT(*) FROM habit_logs").fetchone()[0]
+
+    report = {
+        "started": started.isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "cpus": os.cpu_count(),
+        "scale": scale,
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "results": results,
+    }
+    output = args.output or os.path.join(APP_DIR, "benchmarks", "results", f"{started:%Y%m%dT%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {output}")
+
+    if args.baseline:
+        print_comparison(results, args.baseline)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Generate habits.db and timer.db at benchmark scale.
+
+Creates DIR/habits.db, DIR/timer.db and DIR/sounds/ with --habits daily
+habits whose --logs logs (two in three completed) end today, --sounds short
+WAV files with their metadata, and --timers timers using them. Completion
+stats are backfilled and logs past the archive horizon are rolled up, as the
+app would have done, so the first requests served from the copy do no
+catch-up work.
+
+Point the app at the result with HABITS_DATABASE_URL=sqlite:///DIR/habits.db
+and TIMER_DATABASE_URL=sqlite:///DIR/timer.db, or pass it to run.py --data.
+
+Usage: python benchmarks/seed.py DIR [--habits 10000] [--logs 5000000] [--timers 1000] [--sounds 500]
+"""
+import argparse
+import os
+import sys
+import time
+import uuid
+import wave
+from datetime import datetime, timedelta
+from typing import Dict
+
+# Add the app directory to the path so we can import the modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from explain_queries import seed_habits
+from habits.database.migrations import MIGRATIONS as HABITS_MIGRATIONS, backfill_habit_completions
+from habits.repositories.habit_log_archive_repository import (
+    ARCHIVE_AFTER_DAYS,
+    HabitLogArchiveRepository,
+    archive_cutoff,
+)
+from timer.database.migrations import MIGRATIONS as TIMER_MIGRATIONS
+from timer.sound_metadata import extract_sound_metadata
+from utils.migrations import run_migrations
+
+def write_sound(path: str, seconds: float = 0.5, rate: int = 8000):
+    with wave.open(path, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(b"\x00\x00" * int(seconds * rate))
+
+def seed_timer_db(engine, sounds_dir: str, sound_count: int, timer_count: int):
+    os.makedirs(sounds_dir, exist_ok=True)
+    sounds = []
+    for i in range(sound_count):
+        path = os.path.join(sounds_dir, f"sound{i}.wav")
+        write_sound(path)
+        sounds.append({"id": str(uuid.uuid4()), "name": f"sound{i}", "file": path, **extract_sound_metadata(path)})
+
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        if sounds:
+            columns = list(sounds[0])
+            cursor.executemany(
+                f"INSERT INTO sounds ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})",
+                [tuple(sound[column] for column in columns) for sound in sounds]
+            )
+        cursor.executemany(
+            "INSERT INTO timers (id, name, duration, sound_id) VALUES (?, ?, ?, ?)",
+            [
+                (str(uuid.uuid4()), f"Timer {i}", 60 * (1 + i % 30), sounds[i % len(sounds)]["id"] if sounds else None)
+                for i in range(timer_count)
+            ]
+        )
+        raw.commit()
+        cursor.execute("ANALYZE")
+        raw.commit()
+    finally:
+        raw.close()
+
+def seed(directory: str, habits: int, logs: int, timers: int, sounds: int) -> Dict[str, int]:
+    """Create and fill the databases in `directory`; returns the counts seeded"""
+    habits_path = os.path.join(directory, "habits.db")
+    timer_path = os.path.join(directory, "timer.db")
+    for path in (habits_path, timer_path):
+        if os.path.exists(path):
+            raise SystemExit(f"{path} already exists; seed into an empty directory")
+    os.makedirs(directory, exist_ok=True)
+
+    habits_engine = create_engine(f"sqlite:///{habits_path}")
+    timer_engine = create_engine(f"sqlite:///{timer_path}")
+    try:
+        run_migrations(habits_engine, HABITS_MIGRATIONS)
+        run_migrations(timer_engine, TIMER_MIGRATIONS)
+
+        logs_per_habit = max(1, logs // habits)
+        now = datetime.now()
+        start = now.replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=logs_per_habit)
+        seed_habits(habits_engine, habits, logs, start)
+        with habits_engine.begin() as conn:
+            backfill_habit_completions(conn)
+        if ARCHIVE_AFTER_DAYS > 0:
+            with Session(habits_engine) as db:
+                HabitLogArchiveRepository(db).archive_logs(archive_cutoff(now))
+            # Give back the pages of the archived logs, so copies of the seed stay small
+            raw = habits_engine.raw_connection()
+            try:
+                raw.execute("VACUUM")
+            finally:
+                raw.close()
+
+        seed_timer_db(timer_engine, os.path.join(directory, "sounds"), sounds, timers)
+    finally:
+        habits_engine.dispose()
+        timer_engine.dispose()
+    return {"habits": habits, "logs": logs_per_habit * habits, "timers": timers, "sounds": sounds}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("dir")
+    parser.add_argument("--habits", type=int, default=10_000)
+    parser.add_argument("--logs", type=int, default=5_000_000)
+    parser.add_argument("--timers", type=int, default=1000)
+    parser.add_argument("--sounds", type=int, default=500)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    counts = seed(args.dir, args.habits, args.logs, args.timers, args.sounds)
+    print(f"Seeded {', '.join(f'{count} {name}' for name, count in counts.items())} "
+          f"into {args.dir} in {time.perf_counter() - started:.1f} s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Compare list endpoint throughput: projected rows + orjson against ORM + response_model.
+
+Seeds temporary databases with --rows habits, timers and sounds (and as many
+active timers), then requests each list endpoint of the app and of a legacy
+app mounting the previous handlers: ORM objects returned through a Pydantic
+response_model. The habit response cache is cleared before every request, so
+both sides query and encode each time.
+
+Usage: python benchmarks/serialization.py [--rows 10000] [--requests 20]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+from fastapi import Depends, FastAPI
+
+# Add the app directory to the path so we can import the modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def seed(habits_engine, timer_engine, rows: int):
+    created_at = (datetime.now() - timedelta(days=30)).isoformat(sep=" ")
+    raw = habits_engine.raw_connection()
+    try:
+        raw.cursor().executemany(
+            "INSERT INTO habits (id, name, recurrence, created_at) VALUES (?, ?, 'day', ?)",
+            [(str(uuid.uuid4()), f"Habit {i}", created_at) for i in range(rows)]
+        )
+        raw.commit()
+    finally:
+        raw.close()
+
+    raw = timer_engine.raw_connection()
+    try:
+        sound_ids = [str(uuid.uuid4()) for _ in range(rows)]
+        raw.cursor().executemany(
+            "INSERT INTO sounds (id, name, file, size_bytes, duration, sample_rate, channels, codec) "
+            "VALUES (?, ?, ?, 1024, 1.5, 44100, 2, 'pcm_s16le')",
+            [(sound_id, f"sound{i}", f"/sounds/sound{i}.wav") for i, sound_id in enumerate(sound_ids)]
+        )
+        raw.cursor().executemany(
+            "INSERT INTO timers (id, name, duration, sound_id) VALUES (?, ?, 60, ?)",
+            [(str(uuid.uuid4()), f"Timer {i}", sound_id) for i, sound_id in enumerate(sound_ids)]
+        )
+        raw.commit()
+    finally:
+        raw.close()
+
+def legacy_app() -> FastAPI:
+    """The list handlers as they were: ORM objects validated and encoded through response_model"""
+    from habits.database.database import get_read_db as get_habits_db
+    from habits.models import Habit, HabitWithLog
+    from habits.repositories.habit_log_repository import HabitLogRepository
+    from habits.repositories.habit_repository import HabitRepository
+    from timer.database.database import get_read_db as get_timer_db
+    from timer.models import Sound, Timer
+    from timer.repositories.sound_repository import SoundRepository
+    from timer.repositories.timer_repository import TimerRepository
+    from timer.websocket_manager import timer_manager
+    import main as app_main
+
+    legacy = FastAPI()
+
+    @legacy.get("/habits", response_model=List[Habit])
+    def get_habits(db=Depends(get_habits_db)):
+        return HabitRepository(db).get_habits()
+
+    @legacy.get("/habits/due/today", response_model=List[HabitWithLog])
+    def get_due_habits_today(db=Depends(get_habits_db)):
+        return HabitLogRepository(db).get_due_habits(app_main.today())
+
+    @legacy.get("/timer/", response_model=List[Timer])
+    def get_timers(db=Depends(get_timer_db)):
+        return TimerRepository(db).get_timers()
+
+    @legacy.get("/timer/sounds", response_model=List[Sound])
+    def get_sounds(db=Depends(get_timer_db)):
+        return SoundRepository(db).get_sounds()
+
+    @legacy.get("/timer/active", response_model=Dict)
+    def get_active_timers():
+        return timer_manager.get_active_timers()
+
+    return legacy
+
+def requests_per_second(client, path: str, count: int, before=None) -> float:
+    started = time.perf_counter()
+    for _ in range(count):
+        if before is not None:
+            before()
+        client.get(path).raise_for_status()
+    return count / (time.perf_counter() - started)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--requests", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["HABITS_DATABASE_URL"] = f"sqlite:///{os.path.join(tmp, 'habits.db')}"
+        os.environ["TIMER_DATABASE_URL"] = f"sqlite:///{os.path.join(tmp, 'timer.db')}"
+        os.environ["STARTUP_WARMUP"] = "0"
+        from fastapi.testclient import TestClient
+        from habits.cache import habit_cache
+        from habits.database.database import database as habits_database
+        from timer.database.database import database as timer_database
+        from timer.websocket_manager import TimerState, timer_manager
+        import main as app_main
+
+        with TestClient(app_main.app) as client:
+            seed(habits_database.engines.write, timer_database.engines.write, args.rows)
+            for i in range(args.rows):
+                timer_id = str(uuid.uuid4())
+                timer_manager.active_timers[timer_id] = TimerState(timer_id, f"Timer {i}", 60)
+            legacy = TestClient(legacy_app())
+
+            print(f"== {args.rows} rows, {args.requests} requests per endpoint (req/s)")
+            print(f"  {'endpoint':<20} {'response_model':>15} {'rows + orjson':>15} {'speedup':>8}")
+            for path in ["/habits", "/habits/due/today", "/timer/", "/timer/sounds", "/timer/active"]:
+                before = habit_cache.clear if path.startswith("/habits") else None
+                requests_per_second(legacy, path, 2)
+                requests_per_second(client, path, 2, before)
+                old = requests_per_second(legacy, path, args.requests)
+                new = requests_per_second(client, path, args.requests, before)
+                print(f"  {path:<20} {old:15.1f} {new:15.1f} {new / old:7.1f}x")
+            timer_manager.active_timers.clear()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Profile cold start: import time, startup, and time to the first served request.
+
+Prints the slowest imports of `main` (from python -X importtime), then starts
+uvicorn on a seeded temporary copy of habits.db and reports how long it takes
+from process spawn until /habits/due/today is first answered, and the
+latency of that first request and the next ones. Run it with
+STARTUP_WARMUP=0 or SCHEMA_CHECK=0 in the environment to see what each
+startup step costs.
+
+Usage: python benchmarks/startup_profile.py [--habits 500] [--days 365] [--top 15] [--port 8766]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import httpx
+
+# Add the app directory to the path so we can import the modules
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(APP_DIR)
+
+def import_profile(top: int):
+    """(self us, cumulative us, module) of the `top` slowest imports of main, and the total"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=APP_DIR, capture_output=True, text=True
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, module = line[len("import time:"):].split("|")
+        rows.append((int(self_us), int(cumulative_us), module.rstrip()))
+    total = next((cumulative for _, cumulative, module in rows if module.strip() == "main"), 0)
+    return sorted(rows, key=lambda row: row[1], reverse=True)[:top], total
+
+def first_request_profile(base_url: str, server: subprocess.Popen, spawned: float, timeout: float = 60):
+    """Seconds from spawn to the first answered request, and that request's latency"""
+    deadline = spawned + timeout
+    while time.perf_counter() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError("uvicorn exited before serving")
+        started = time.perf_counter()
+        try:
+            response = httpx.get(f"{base_url}/habits/due/today")
+        except httpx.TransportError:
+            time.sleep(0.01)
+            continue
+        response.raise_for_status()
+        finished = time.perf_counter()
+        return finished - spawned, finished - started
+    raise RuntimeError("uvicorn did not start in time")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--habits", type=int, default=500)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--port", type=int, default=8766)
+    args = parser.parse_args()
+
+    top, total_us = import_profile(args.top)
+    print(f"== import main: {total_us / 1000:.0f} ms")
+    for self_us, cumulative_us, module in top:
+        print(f"  {cumulative_us / 1000:8.1f} ms cumulative {self_us / 1000:8.1f} ms self  {module}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["HABITS_DATABASE_URL"] = f"sqlite:///{os.path.join(tmp, 'habits.db')}"
+        os.environ["TIMER_DATABASE_URL"] = f"sqlite:///{os.path.join(tmp, 'timer.db')}"
+        from explain_queries import seed_habits
+        from habits.database.database import database
+        from habits.database.migrations import MIGRATIONS
+        from utils.migrations import run_migrations
+
+        run_migrations(database.engines.write, MIGRATIONS)
+        start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=args.days)
+        seed_habits(database.engines.write, args.habits, args.habits * args.days, start)
+        database.dispose()
+
+        base_url = f"http://127.0.0.1:{args.port}"
+        spawned = time.perf_counter()
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--port", str(args.port), "--log-level", "warning"],
+            cwd=APP_DIR, stdout=subprocess.DEVNULL
+        )
+        try:
+            to_first, first_latency = first_request_profile(base_url, server, spawned)
+            latencies = []
+            for _ in range(20):
+                started = time.perf_counter()
+                httpx.get(f"{base_url}/habits/due/today").raise_for_status()
+                latencies.append(time.perf_counter() - started)
+        finally:
+            server.terminate()
+            server.wait()
+
+    print(f"\n== cold start ({args.habits} habits, {args.days} days of logs, "
+          f"SCHEMA_CHECK={os.environ.get('SCHEMA_CHECK', '1')}, STARTUP_WARMUP={os.environ.get('STARTUP_WARMUP', '1')})")
+    print(f"  spawn to first served request: {to_first * 1000:8.0f} ms")
+    print(f"  first request latency:         {first_latency * 1000:8.1f} ms")
+    print(f"  next requests, median:         {sorted(latencies)[len(latencies) // 2] * 1000:8.1f} ms")
+
+if __name__ == "__main__":
+    main()
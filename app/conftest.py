@@ -0,0 +1,10 @@
+import os
+import tempfile
+
+# The databases are chosen when the app is imported; keep the tests off the real ones
+_scratch = tempfile.mkdtemp(prefix="rickity-tests-")
+os.environ.setdefault("HABITS_DATABASE_URL", f"sqlite:///{os.path.join(_scratch, 'habits.db')}")
+os.environ.setdefault("TIMER_DATABASE_URL", f"sqlite:///{os.path.join(_scratch, 'timer.db')}")
+
+# Talks to a running server; run it directly with python
+collect_ignore = ["test_timer_websocket.py"]
@@ -0,0 +1,40 @@
+from typing import List
+
+from pydantic import TypeAdapter
+
+from habits.models import HabitCalendar, HabitStats
+from utils.json_response import dumps
+from utils.response_cache import ResponseCache
+
+# Invalidation namespaces
+HABITS = "habits"  # the habit list; changed by habit create/update/delete
+DUE = "due"        # due habits per date and calendars; also changed by check/uncheck
+STATS = "stats"    # habit stats per day; changed like DUE
+
+habit_stats_adapter = TypeAdapter(List[HabitStats])
+habit_calendar_adapter = TypeAdapter(HabitCalendar)
+
+# Create a global instance of the habit response cache
+habit_cache = ResponseCache()
+
+def serialize_habits(habit_rows: List[dict]) -> bytes:
+    """Encode rows from HabitRepository.get_habit_rows"""
+    return dumps(habit_rows)
+
+def serialize_due_habits(due_habit_rows: List[dict]) -> bytes:
+    """Encode rows from HabitLogRepository.get_due_habit_rows"""
+    return dumps(due_habit_rows)
+
+def serialize_habit_stats(stats: List[HabitStats]) -> bytes:
+    return habit_stats_adapter.dump_json(stats)
+
+def serialize_habit_calendar(calendar: HabitCalendar) -> bytes:
+    return habit_calendar_adapter.dump_json(calendar)
+
+def invalidate_habits():
+    """Call after any habit create, update or delete"""
+    habit_cache.invalidate(HABITS, DUE, STATS)
+
+def invalidate_logs():
+    """Call after any habit log write"""
+    habit_cache.invalidate(DUE, STATS)
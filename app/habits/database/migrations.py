@@ -0,0 +1,194 @@
+import json
+import re
+from typing import Tuple
+
+import numpy as np
+from sqlalchemy.engine import Connection
+
+from utils.migrations import Migration
+
+def create_tables(conn: Connection):
+    conn.exec_driver_sql("""
+        CREATE TABLE IF NOT EXISTS habits (
+            id VARCHAR NOT NULL,
+            name VARCHAR NOT NULL,
+            recurrence VARCHAR NOT NULL,
+            created_at DATETIME,
+            PRIMARY KEY (id)
+        )
+    """)
+    conn.exec_driver_sql("""
+        CREATE TABLE IF NOT EXISTS habit_logs (
+            id VARCHAR NOT NULL,
+            habit_id VARCHAR NOT NULL,
+            due_date DATETIME NOT NULL,
+            completed BOOLEAN,
+            PRIMARY KEY (id),
+            FOREIGN KEY(habit_id) REFERENCES habits (id)
+        )
+    """)
+
+def unique_habit_slots(conn: Connection):
+    # Older databases may hold duplicate slot logs, which would block the unique index.
+    # Keep a completed one where there is any.
+    conn.exec_driver_sql("""
+        DELETE FROM habit_logs WHERE rowid IN (
+            SELECT rowid FROM (
+                SELECT rowid, ROW_NUMBER() OVER (
+                    PARTITION BY habit_id, due_date
+                    ORDER BY completed DESC, rowid
+                ) AS rank
+                FROM habit_logs
+            ) WHERE rank > 1
+        )
+    """)
+    conn.exec_driver_sql(
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_habit_logs_habit_due ON habit_logs (habit_id, due_date)"
+    )
+
+def due_date_indexes(conn: Connection):
+    # Due-habit lookups scan a due_date window across all habits
+    conn.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_habit_logs_due_date ON habit_logs (due_date, habit_id)"
+    )
+    # With virtual slots most stored logs are materialized-but-open ones; completion
+    # history reads (streaks, calendars) only need the completed rows
+    conn.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_habit_logs_completed ON habit_logs (habit_id, due_date) "
+        "WHERE completed = 1"
+    )
+
+def habit_completions(conn: Connection):
+    conn.exec_driver_sql("""
+        CREATE TABLE IF NOT EXISTS habit_completions (
+            habit_id VARCHAR NOT NULL,
+            bitmap BLOB NOT NULL,
+            completed_count INTEGER NOT NULL,
+            longest_streak INTEGER NOT NULL,
+            streak_end INTEGER NOT NULL,
+            streak_length INTEGER NOT NULL,
+            weekday_completed JSON NOT NULL,
+            PRIMARY KEY (habit_id),
+            FOREIGN KEY(habit_id) REFERENCES habits (id)
+        )
+    """)
+    # Backfill from the completed logs already stored; afterwards check/uncheck keep it current
+    backfill_habit_completions(conn)
+
+def calendar_month_slots(conn: Connection):
+    # Month recurrences moved from 30-day periods to calendar months, which renumbers their slots
+    conn.exec_driver_sql("DELETE FROM habit_completions")
+    backfill_habit_completions(conn)
+
+# The backfill is frozen: it reads plain SQL and carries its own copy of the
+# recurrence, slot and summary logic as of version 5, so later changes to the
+# models or to habits.stats cannot change what an old database upgrades to.
+
+RECURRENCE_PATTERN = re.compile(r"^(\d+)?\s*(day|days|week|weeks|month|months)$")
+
+# Offset that makes (days since 1970-01-01) % 7 count from Monday
+EPOCH_WEEKDAY = 3
+
+def recurrence_parts(recurrence: str) -> Tuple[int, str]:
+    """(amount, "day" or "month") of a stored recurrence string"""
+    try:
+        return max(1, int(recurrence)), "day"
+    except ValueError:
+        pass
+    match = RECURRENCE_PATTERN.match(recurrence.lower().strip())
+    if not match:
+        raise ValueError(f"Invalid recurrence: {recurrence!r}")
+    amount = int(match.group(1) or 1)
+    unit = match.group(2).rstrip("s")
+    if unit == "month":
+        return max(1, amount), "month"
+    return max(1, amount * (7 if unit == "week" else 1)), "day"
+
+def occurrence_days(start: np.datetime64, amount: int, unit: str, indices: np.ndarray) -> np.ndarray:
+    if unit == "day":
+        return start + indices * amount
+    # Calendar months keep start's day of the month, clipped to shorter months
+    start_month = start.astype("datetime64[M]")
+    day_of_month = (start - start_month.astype("datetime64[D]")).astype(np.int64)
+    months = start_month + indices * amount
+    first_days = months.astype("datetime64[D]")
+    month_lengths = ((months + 1).astype("datetime64[D]") - first_days).astype(np.int64)
+    return first_days + np.minimum(day_of_month, month_lengths - 1)
+
+def occurrence_indices(start: np.datetime64, amount: int, unit: str, days: np.ndarray) -> np.ndarray:
+    if unit == "day":
+        return np.maximum((days - start).astype(np.int64) // amount, 0)
+    elapsed_months = (days.astype("datetime64[M]") - start.astype("datetime64[M]")).astype(np.int64)
+    indices = np.maximum(elapsed_months // amount, 0)
+    return np.maximum(indices - (occurrence_days(start, amount, unit, indices) > days), 0)
+
+def completion_row(habit_id: str, recurrence: str, created_day: str, due_days: list) -> tuple:
+    """habit_completions row of a habit completed on the given days"""
+    amount, unit = recurrence_parts(recurrence)
+    start = np.datetime64(created_day, "D")
+    completed = np.unique(occurrence_indices(start, amount, unit, np.array(due_days, dtype="datetime64[D]")))
+    # Slots are 1-based; logs stored before the habit's first slot have none
+    completed = completed[completed >= 1]
+    if completed.size == 0:
+        return (habit_id, b"", 0, 0, 0, 0, json.dumps([0] * 7))
+
+    bits = np.zeros(completed[-1] + 1, dtype=np.uint8)
+    bits[completed] = 1
+    bitmap = np.trim_zeros(np.packbits(bits, bitorder="little"), "b").tobytes()
+
+    breaks = np.flatnonzero(np.diff(completed) > 1)
+    starts = np.concatenate(([0], breaks + 1))
+    ends = np.concatenate((breaks, [completed.size - 1]))
+    lengths = ends - starts + 1
+    weekdays = (occurrence_days(start, amount, unit, completed).astype(np.int64) + EPOCH_WEEKDAY) % 7
+    return (
+        habit_id,
+        bitmap,
+        int(completed.size),
+        int(lengths.max()),
+        int(completed[-1]),
+        int(lengths[-1]),
+        json.dumps(np.bincount(weekdays, minlength=7).tolist()),
+    )
+
+def backfill_habit_completions(conn: Connection):
+    completed_days = {}
+    for habit_id, due_day in conn.exec_driver_sql(
+            "SELECT habit_id, date(due_date) FROM habit_logs WHERE completed = 1"):
+        completed_days.setdefault(habit_id, []).append(due_day)
+
+    rows = [
+        completion_row(habit_id, recurrence, created_day, completed_days[habit_id])
+        for habit_id, recurrence, created_day in conn.exec_driver_sql(
+            "SELECT id, recurrence, date(created_at) FROM habits WHERE created_at IS NOT NULL")
+        if habit_id in completed_days
+    ]
+    if rows:
+        conn.exec_driver_sql(
+            "INSERT OR REPLACE INTO habit_completions (habit_id, bitmap, completed_count, longest_streak, "
+            "streak_end, streak_length, weekday_completed) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            rows,
+        )
+
+def habit_log_archive(conn: Connection):
+    conn.exec_driver_sql("""
+        CREATE TABLE IF NOT EXISTS habit_log_archive (
+            habit_id VARCHAR NOT NULL,
+            month DATE NOT NULL,
+            logged_mask INTEGER NOT NULL,
+            completed_mask INTEGER NOT NULL,
+            logged_count INTEGER NOT NULL,
+            completed_count INTEGER NOT NULL,
+            PRIMARY KEY (habit_id, month),
+            FOREIGN KEY(habit_id) REFERENCES habits (id)
+        )
+    """)
+
+MIGRATIONS = [
+    Migration(1, "create habits and habit_logs", create_tables),
+    Migration(2, "unique (habit_id, due_date) on habit_logs", unique_habit_slots),
+    Migration(3, "due_date and completed-log indexes", due_date_indexes),
+    Migration(4, "habit_completions stats table", habit_completions),
+    Migration(5, "calendar-month slots in habit_completions", calendar_month_slots),
+    Migration(6, "habit_log_archive roll-up table", habit_log_archive),
+]
@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, DateTime, String, ForeignKey
+from sqlalchemy import JSON, Boolean, Column, Date, DateTime, Integer, LargeBinary, String, ForeignKey, Index, text
 from datetime import datetime
 import uuid
 
@@ -14,8 +14,40 @@ class Habit(Base):
 
 class HabitLog(Base):
     __tablename__ = "habit_logs"
+    __table_args__ = (
+        # At most one log per habit slot, however many writers race to create it
+        Index("uq_habit_logs_habit_due", "habit_id", "due_date", unique=True),
+        Index("ix_habit_logs_due_date", "due_date", "habit_id"),
+        Index("ix_habit_logs_completed", "habit_id", "due_date", sqlite_where=text("completed = 1")),
+    )
 
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     habit_id = Column(String, ForeignKey("habits.id"), nullable=False)
     due_date = Column(DateTime, nullable=False)
-    completed = Column(Boolean, default=False) 
\ No newline at end of file
+    completed = Column(Boolean, default=False)
+
+class HabitCompletions(Base):
+    """Completion bitmap and streak summary of a habit, kept in step with its logs (see habits.stats)"""
+    __tablename__ = "habit_completions"
+
+    habit_id = Column(String, ForeignKey("habits.id"), primary_key=True)
+    bitmap = Column(LargeBinary, nullable=False, default=b"")
+    completed_count = Column(Integer, nullable=False, default=0)
+    longest_streak = Column(Integer, nullable=False, default=0)
+    streak_end = Column(Integer, nullable=False, default=0)
+    streak_length = Column(Integer, nullable=False, default=0)
+    weekday_completed = Column(JSON, nullable=False)
+
+class HabitLogArchive(Base):
+    """Monthly roll-up of habit logs moved out of habit_logs by the archival job.
+
+    Bit d - 1 of a mask stands for day d of the month.
+    """
+    __tablename__ = "habit_log_archive"
+
+    habit_id = Column(String, ForeignKey("habits.id"), primary_key=True)
+    month = Column(Date, primary_key=True)  # first day of the month
+    logged_mask = Column(Integer, nullable=False, default=0)     # days that had a log
+    completed_mask = Column(Integer, nullable=False, default=0)  # days whose log was completed
+    logged_count = Column(Integer, nullable=False, default=0)
+    completed_count = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,237 @@
+"""
+Bulk import of habits and completion history.
+
+Records arrive in batches of parsed NDJSON or CSV rows. A record with a
+habit_id is a log; any other record is a habit. This is the shape written by
+the /habits/export and /habits/logs/export endpoints, so their output can be
+imported as is. Each batch is written in its own transaction with one
+multi-row INSERT per table. Log stats and due-log materialization run once in
+finish().
+"""
+import csv
+import json
+import time
+import uuid
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Set, Tuple, Union
+
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from habits.database.models import Habit, HabitLog
+from habits.models import ImportIssue, ImportResult
+from habits.repositories.habit_log_repository import HabitLogRepository
+from habits.repositories.habit_stats_repository import HabitStatsRepository
+from habits.slots import slot_due_date, slot_index_at, slot_log_id
+from utils.batching import chunked, BULK_CHUNK_SIZE
+from utils.date_utils import INVALID_RECURRENCE_MESSAGE, Recurrence, compile_recurrence
+from utils.logging import setup_logger
+
+logger = setup_logger(__name__)
+
+# Records per transaction
+IMPORT_BATCH_SIZE = 5000
+
+# Issues reported back in full; later ones are only counted
+MAX_REPORTED_ISSUES = 100
+
+TRUE_VALUES = {"1", "true", "yes", "y", "t"}
+
+def decode_line(line_number: int, line: bytes) -> Union[str, UnicodeDecodeError]:
+    """Text of a line, or the decoding error so it is reported as an issue of that line"""
+    try:
+        return line.decode("utf-8-sig" if line_number == 1 else "utf-8").rstrip("\r")
+    except UnicodeDecodeError as e:
+        return e
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, Union[str, UnicodeDecodeError]]]:
+    """Split a byte stream into numbered text lines without buffering more than one line"""
+    line_number = 0
+    pending = b""
+    async for chunk in chunks:
+        *lines, pending = (pending + chunk).split(b"\n")
+        for line in lines:
+            line_number += 1
+            yield line_number, decode_line(line_number, line)
+    if pending:
+        yield line_number + 1, decode_line(line_number + 1, pending)
+
+def parse_lines(lines: List[Tuple[int, str]], csv_header: Optional[List[str]] = None) -> List[Tuple[int, Any]]:
+    """Parse numbered NDJSON lines, or CSV rows when the CSV header is given"""
+    if csv_header is not None:
+        return list(parse_csv(lines, csv_header))
+    return list(parse_ndjson(lines))
+
+def parse_ndjson(lines: Iterable[Tuple[int, str]]) -> Iterable[Tuple[int, Any]]:
+    for line_number, line in lines:
+        if isinstance(line, UnicodeDecodeError):
+            yield line_number, line
+            continue
+        if not line.strip():
+            continue
+        try:
+            yield line_number, json.loads(line)
+        except ValueError as e:
+            yield line_number, e
+
+def parse_csv(lines: Iterable[Tuple[int, str]], header: List[str]) -> Iterable[Tuple[int, Any]]:
+    for line_number, line in lines:
+        if isinstance(line, UnicodeDecodeError):
+            yield line_number, line
+            continue
+        if not line.strip():
+            continue
+        row = next(csv.reader([line]))
+        # Empty cells are missing values
+        yield line_number, {key: value for key, value in zip(header, row) if value != ""}
+
+def parse_datetime(value: Any) -> datetime:
+    if isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(str(value))
+
+def parse_bool(value: Any) -> bool:
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in TRUE_VALUES
+
+class HabitImporter:
+    def __init__(self, db: Session):
+        self.db = db
+        self.started = time.perf_counter()
+        self.habits = 0
+        self.logs = 0
+        self.issues: List[ImportIssue] = []
+        self.issue_count = 0
+        # created_at and recurrence of every habit a log may refer to
+        self.known_habits: Dict[str, Tuple[datetime, Recurrence]] = {}
+        self.touched_habits: Set[str] = set()
+
+    def add_batch(self, records: List[Tuple[int, Any]]):
+        """Validate and insert one batch of (line number, record) pairs in a single transaction"""
+        habit_rows = []
+        log_records = []
+        for line_number, record in records:
+            if isinstance(record, UnicodeDecodeError):
+                self._issue(line_number, f"Not valid UTF-8: {record}")
+            elif isinstance(record, Exception) or not isinstance(record, dict):
+                self._issue(line_number, f"Not a JSON object: {record}")
+            elif "habit_id" in record:
+                log_records.append((line_number, record))
+            else:
+                row = self._habit_row(line_number, record)
+                if row is not None:
+                    habit_rows.append(row)
+
+        if habit_rows:
+            # Re-importing an export must not duplicate habits that already exist
+            table = Habit.__table__
+            inserted = set(self.db.execute(
+                sqlite_insert(table).on_conflict_do_nothing(index_elements=["id"]).returning(table.c.id),
+                habit_rows
+            ).scalars())
+            self.habits += len(inserted)
+            # Logs of habits that already existed are placed by the stored habit, which _load_habits reads
+            for row in habit_rows:
+                if row["id"] in inserted:
+                    self.known_habits.setdefault(row["id"], (row["created_at"], compile_recurrence(row["recurrence"])))
+
+        self._load_habits({str(record["habit_id"]) for _, record in log_records})
+        log_rows = [row for row in (self._log_row(line_number, record) for line_number, record in log_records)
+                    if row is not None]
+        if log_rows:
+            insert = sqlite_insert(HabitLog.__table__)
+            self.db.execute(
+                insert.on_conflict_do_update(
+                    index_elements=["habit_id", "due_date"],
+                    set_={"completed": insert.excluded.completed}
+                ),
+                log_rows
+            )
+            self.logs += len(log_rows)
+            self.touched_habits.update(row["habit_id"] for row in log_rows)
+
+        self.db.commit()
+
+    def finish(self, now: datetime) -> ImportResult:
+        """Rebuild stats of the habits that received logs and materialize due logs, once"""
+        habit_ids = list(self.touched_habits)
+        for chunk in chunked(habit_ids, BULK_CHUNK_SIZE):
+            HabitStatsRepository(self.db).rebuild(self.db.query(Habit).filter(Habit.id.in_(chunk)).all())
+        self.db.commit()
+        HabitLogRepository(self.db).materialize_due_logs(now)
+
+        seconds = time.perf_counter() - self.started
+        logger.info(f"Imported {self.habits} habits and {self.logs} logs in {seconds:.2f}s "
+                    f"({self.issue_count} records skipped)")
+        return ImportResult(
+            habits=self.habits,
+            logs=self.logs,
+            skipped=self.issue_count,
+            seconds=round(seconds, 3),
+            records_per_second=round((self.habits + self.logs) / seconds, 1) if seconds > 0 else 0.0,
+            issues=self.issues
+        )
+
+    def _habit_row(self, line_number: int, record: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        try:
+            name = str(record["name"])
+            recurrence = str(record["recurrence"])
+            created_at = parse_datetime(record["created_at"]) if record.get("created_at") else datetime.utcnow()
+            habit_id = str(uuid.UUID(str(record["id"]))) if record.get("id") else str(uuid.uuid4())
+        except KeyError as e:
+            self._issue(line_number, f"Missing field {e}")
+            return None
+        except ValueError as e:
+            self._issue(line_number, str(e))
+            return None
+        try:
+            # Compiled once per distinct recurrence string across the whole import
+            compile_recurrence(recurrence)
+        except ValueError:
+            self._issue(line_number, INVALID_RECURRENCE_MESSAGE)
+            return None
+        return {"id": habit_id, "name": name, "recurrence": recurrence, "created_at": created_at}
+
+    def _load_habits(self, habit_ids: Set[str]):
+        missing = [habit_id for habit_id in habit_ids if habit_id not in self.known_habits]
+        for chunk in chunked(missing, BULK_CHUNK_SIZE):
+            for habit_id, created_at, recurrence in (self.db.query(Habit.id, Habit.created_at, Habit.recurrence)
+                                                     .filter(Habit.id.in_(chunk))
+                                                     .all()):
+                self.known_habits[habit_id] = (created_at, compile_recurrence(recurrence))
+
+    def _log_row(self, line_number: int, record: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        habit_id = str(record["habit_id"])
+        habit = self.known_habits.get(habit_id)
+        if habit is None:
+            self._issue(line_number, f"Unknown habit {habit_id}")
+            return None
+        try:
+            due_date = parse_datetime(record["due_date"])
+        except KeyError as e:
+            self._issue(line_number, f"Missing field {e}")
+            return None
+        except ValueError as e:
+            self._issue(line_number, str(e))
+            return None
+
+        created_at, recurrence = habit
+        index = slot_index_at(created_at, recurrence, due_date)
+        if index >= 1 and slot_due_date(created_at, recurrence, index) == due_date:
+            # Logs on a slot's due date take the slot's log ID, like logs written by check
+            log_id = slot_log_id(habit_id, index)
+        else:
+            # Derived from the slot key, so re-importing the same log can never collide on the ID alone
+            log_id = str(uuid.uuid5(uuid.UUID(habit_id), due_date.isoformat()))
+        return {
+            "id": log_id,
+            "habit_id": habit_id,
+            "due_date": due_date,
+            "completed": parse_bool(record.get("completed", False)),
+        }
+
+    def _issue(self, line_number: int, detail: str):
+        self.issue_count += 1
+        if len(self.issues) < MAX_REPORTED_ISSUES:
+            self.issues.append(ImportIssue(line=line_number, detail=detail))
@@ -1,7 +1,7 @@
-from datetime import datetime
+from datetime import date, datetime
 from uuid import UUID
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 
 class HabitBase(BaseModel):
     name: str
@@ -31,4 +31,61 @@ class HabitWithLog(BaseModel):
     latest_log: Optional[HabitLog] = None
 
     class Config:
-        from_attributes = True 
\ No newline at end of file
+        from_attributes = True
+
+class HabitUpdate(HabitBase):
+    id: UUID
+
+class HabitBulkCreate(BaseModel):
+    habits: List[HabitCreate]
+
+class HabitBulkUpdate(BaseModel):
+    habits: List[HabitUpdate]
+
+class HabitBulkDelete(BaseModel):
+    habit_ids: List[UUID]
+
+class HabitLogBulkUpdate(BaseModel):
+    log_ids: List[UUID]
+
+class BulkItemResult(BaseModel):
+    id: Optional[UUID] = None
+    status: str  # "success", "not_found" or "invalid"
+    detail: Optional[str] = None
+    habit: Optional[Habit] = None
+
+class BulkResult(BaseModel):
+    results: List[BulkItemResult]
+
+class ImportIssue(BaseModel):
+    line: int
+    detail: str
+
+class ImportResult(BaseModel):
+    habits: int
+    logs: int
+    skipped: int
+    seconds: float
+    records_per_second: float
+    issues: List[ImportIssue]  # the first skipped records and why
+
+class HabitStats(BaseModel):
+    habit_id: UUID
+    current_streak: int
+    longest_streak: int
+    completed: int
+    due: int
+    completion_rate: Optional[float] = None
+    completion_rate_7d: Optional[float] = None
+    completion_rate_30d: Optional[float] = None
+    completion_rate_365d: Optional[float] = None
+    weekday_completion: List[Optional[float]]  # Monday first; None where nothing fell due
+
+class HabitCalendar(BaseModel):
+    """Habit x day matrices; row i belongs to habits[i], column j to start + j days"""
+    start: date
+    end: date
+    habits: List[Habit]
+    slots: List[List[int]]      # latest slot due by each day, 0 before the first slot
+    completed: List[List[int]]  # 1 where that slot is completed
+
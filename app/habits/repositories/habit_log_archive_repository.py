@@ -0,0 +1,151 @@
+import os
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Set, Tuple
+
+from sqlalchemy import and_, bindparam, or_
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from habits.database.models import HabitLog, HabitLogArchive
+from utils.batching import chunked, BULK_CHUNK_SIZE
+from utils.logging import setup_logger
+
+logger = setup_logger(__name__)
+
+# Logs due longer ago than this are moved into monthly roll-ups (0 disables archival)
+ARCHIVE_AFTER_DAYS = int(os.environ.get("HABIT_LOG_ARCHIVE_DAYS", "365"))
+
+# Logs moved per transaction
+ARCHIVE_BATCH_SIZE = 10000
+
+# One bit per day of the month
+MONTH_MASK = (1 << 31) - 1
+
+def month_of(day: date) -> date:
+    return day.replace(day=1)
+
+def day_bit(day: date) -> int:
+    return 1 << (day.day - 1)
+
+def mask_days(month: date, mask: int) -> List[date]:
+    """Days of the month whose bit is set in mask"""
+    return [month + timedelta(days=bit) for bit in range(31) if mask >> bit & 1]
+
+def archive_cutoff(now: datetime) -> datetime:
+    """Logs due before this instant may have been archived"""
+    return (now - timedelta(days=ARCHIVE_AFTER_DAYS)).replace(hour=0, minute=0, second=0, microsecond=0)
+
+class HabitLogArchiveRepository:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def archive_logs(self, cutoff: datetime) -> int:
+        """Move every log due before cutoff into the monthly roll-ups, in batches.
+
+        Each batch reads the oldest logs through ix_habit_logs_due_date, merges
+        them into the affected archive rows and deletes them, in one transaction.
+        Returns the number of logs moved.
+        """
+        moved = 0
+        while True:
+            logs = (self.db.query(HabitLog.id, HabitLog.habit_id, HabitLog.due_date, HabitLog.completed)
+                    .filter(HabitLog.due_date < cutoff)
+                    .order_by(HabitLog.due_date)
+                    .limit(ARCHIVE_BATCH_SIZE)
+                    .all())
+            if not logs:
+                break
+
+            # Later logs of the same day override earlier state, like the hot table's unique slot
+            logged: Dict[Tuple[str, date], int] = defaultdict(int)
+            completed: Dict[Tuple[str, date], int] = defaultdict(int)
+            for _, habit_id, due_date, is_completed in logs:
+                key = (habit_id, month_of(due_date.date()))
+                bit = day_bit(due_date.date())
+                logged[key] |= bit
+                completed[key] = completed[key] | bit if is_completed else completed[key] & ~bit
+
+            rows = []
+            existing = self._get_rows(logged)
+            for key, logged_mask in logged.items():
+                old = existing.get(key)
+                completed_mask = completed[key]
+                if old is not None:
+                    completed_mask |= old.completed_mask & ~logged_mask
+                    logged_mask |= old.logged_mask
+                rows.append({
+                    "habit_id": key[0],
+                    "month": key[1],
+                    "logged_mask": logged_mask,
+                    "completed_mask": completed_mask,
+                    "logged_count": bin(logged_mask).count("1"),
+                    "completed_count": bin(completed_mask).count("1"),
+                })
+
+            insert = sqlite_insert(HabitLogArchive.__table__)
+            self.db.execute(
+                insert.on_conflict_do_update(
+                    index_elements=["habit_id", "month"],
+                    set_={column: insert.excluded[column] for column in
+                          ("logged_mask", "completed_mask", "logged_count", "completed_count")}
+                ),
+                rows
+            )
+            for chunk in chunked([log_id for log_id, _, _, _ in logs], BULK_CHUNK_SIZE):
+                self.db.query(HabitLog).filter(HabitLog.id.in_(chunk)).delete(synchronize_session=False)
+            self.db.commit()
+            moved += len(logs)
+
+        if moved:
+            logger.info(f"Archived {moved} habit logs due before {cutoff.date()}")
+        return moved
+
+    def completed_days(self, habit_id: str) -> List[date]:
+        """Days with a completed log in the archive"""
+        rows = (self.db.query(HabitLogArchive.month, HabitLogArchive.completed_mask)
+                .filter(HabitLogArchive.habit_id == habit_id, HabitLogArchive.completed_mask != 0)
+                .all())
+        return [day for month, mask in rows for day in mask_days(month, mask)]
+
+    def completed_slots(self, slots: Iterable[Tuple[str, datetime]]) -> Set[Tuple[str, date]]:
+        """Which of the (habit_id, due_date) slots were archived as completed"""
+        days = {(habit_id, due_date.date()) for habit_id, due_date in slots}
+        rows = self._get_rows({(habit_id, month_of(day)) for habit_id, day in days})
+        return {(habit_id, day) for habit_id, day in days
+                if (habit_id, month_of(day)) in rows
+                and rows[(habit_id, month_of(day))].completed_mask & day_bit(day)}
+
+    def clear_completed(self, slots: List[Tuple[str, datetime]]):
+        """Unset archived completions of unchecked slots; the caller commits"""
+        if not slots:
+            return
+        table = HabitLogArchive.__table__
+        self.db.execute(
+            table.update()
+            .where(table.c.habit_id == bindparam("b_habit_id"), table.c.month == bindparam("b_month"),
+                   table.c.completed_mask.op("&")(bindparam("b_bit")) != 0)
+            # The complement is bound from Python: ~ on a bind parameter compiles to a logical NOT
+            .values(completed_mask=table.c.completed_mask.op("&")(bindparam("b_keep")),
+                    completed_count=table.c.completed_count - 1),
+            [{"b_habit_id": habit_id, "b_month": month_of(due_date.date()),
+              "b_bit": day_bit(due_date.date()), "b_keep": ~day_bit(due_date.date()) & MONTH_MASK}
+             for habit_id, due_date in slots]
+        )
+
+    def delete(self, habit_ids: List[str]):
+        for chunk in chunked(habit_ids, BULK_CHUNK_SIZE):
+            (self.db.query(HabitLogArchive)
+             .filter(HabitLogArchive.habit_id.in_(chunk))
+             .delete(synchronize_session=False))
+
+    def _get_rows(self, keys: Iterable[Tuple[str, date]]) -> Dict[Tuple[str, date], HabitLogArchive]:
+        rows = {}
+        # Two bound parameters per key
+        for chunk in chunked(list(keys), BULK_CHUNK_SIZE // 2):
+            rows.update(((row.habit_id, row.month), row) for row in
+                        self.db.query(HabitLogArchive)
+                        .filter(or_(*[and_(HabitLogArchive.habit_id == habit_id, HabitLogArchive.month == month)
+                                      for habit_id, month in chunk]))
+                        .all())
+        return rows
@@ -1,13 +1,28 @@
 from sqlalchemy.orm import Session
-from datetime import datetime, timedelta
+from datetime import datetime
 from uuid import UUID
-from typing import List, Optional
-from sqlalchemy import func
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+from sqlalchemy import and_, bindparam, func, or_, tuple_
+from sqlalchemy.orm import Query
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
 
 from utils.logging import setup_logger
-from utils.date_utils import parse_recurrence, end_of_day
+from utils.date_utils import compile_recurrence, end_of_day
+from utils.batching import chunked, BULK_CHUNK_SIZE
+from utils.pagination import STREAM_BATCH_SIZE
 from habits.database.models import Habit, HabitLog
 from habits.models import HabitWithLog
+from habits.repositories.habit_stats_repository import HabitStatsRepository
+from habits.repositories.habit_log_archive_repository import HabitLogArchiveRepository, archive_cutoff
+from habits.slots import (
+    HABIT_PREFIX_LENGTH,
+    slot_due_date,
+    slot_index_at,
+    slot_log_id,
+    parse_slot_log_id,
+    slot_in_range,
+)
 
 logger = setup_logger(__name__)
 
@@ -15,80 +30,172 @@ class HabitLogRepository:
     def __init__(self, db: Session):
         self.db = db
 
-    def calculate_next_due_date(self, habit: Habit, reference_date: datetime) -> datetime:
-        """Calculate the next due date based on habit recurrence"""
-        logger.debug(f"Calculating next due date for habit {habit.id} from reference date {reference_date}")
-        recurrence_delta = parse_recurrence(habit.recurrence)
-        # Set the due date to end of the day
-        next_due = end_of_day(reference_date + recurrence_delta)
-        logger.debug(f"Next due date calculated: {next_due}")
-        return next_due
-
     def get_latest_log(self, habit_id: str) -> Optional[HabitLog]:
-        """Get the latest log for a habit based on due_date"""
+        """Get the latest persisted log for a habit based on due_date"""
         return (self.db.query(HabitLog)
                 .filter(HabitLog.habit_id == habit_id)
                 .order_by(HabitLog.due_date.desc())
                 .first())
 
-    def create_due_logs(self, habit: Habit, current_date: datetime) -> List[HabitLog]:
-        """Create all necessary logs until current_date"""
-        new_logs = []
-        latest_log = self.get_latest_log(habit.id)
-        
-        # If no logs exist, start from habit creation date
-        if not latest_log:
-            # For first log, use end of creation day as reference
-            next_due = self.calculate_next_due_date(habit, habit.created_at)
-        else:
-            next_due = self.calculate_next_due_date(habit, latest_log.due_date)
-
-        # Create logs until we reach a future date
-        current_eod = end_of_day(current_date)  # Compare with end of current day
-        while next_due <= current_eod:
-            logger.debug(f"Creating log for habit {habit.id} due at {next_due}")
-            new_log = HabitLog(
-                habit_id=habit.id,
-                due_date=next_due,
-                completed=False
-            )
-            new_logs.append(new_log)
-            next_due = self.calculate_next_due_date(habit, next_due)
+    def get_slot_log(self, habit: Habit, index: int) -> HabitLog:
+        """Get the persisted log of a slot, or an unsaved virtual one if it was never written"""
+        due_date = slot_due_date(habit.created_at, compile_recurrence(habit.recurrence), index)
+        db_log = (self.db.query(HabitLog)
+                  .filter(HabitLog.habit_id == habit.id,
+                          HabitLog.due_date == due_date)
+                  .first())
+        if db_log:
+            return db_log
+        archived = (due_date < archive_cutoff(datetime.now())
+                    and bool(HabitLogArchiveRepository(self.db).completed_slots([(habit.id, due_date)])))
+        return HabitLog(
+            id=slot_log_id(habit.id, index),
+            habit_id=habit.id,
+            due_date=due_date,
+            completed=archived
+        )
+
+    def get_logs_page(
+        self,
+        limit: int,
+        after: Optional[Tuple[datetime, str]] = None,
+        habit_id: Optional[UUID] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None
+    ) -> Tuple[List[HabitLog], Optional[Tuple[datetime, str]]]:
+        """One page of stored logs ordered by (due_date, habit_id), and the key to continue after"""
+        query = self._logs_query(habit_id, start, end)
+        if after is not None:
+            query = query.filter(tuple_(HabitLog.due_date, HabitLog.habit_id) > tuple_(*after))
+        logs = query.limit(limit + 1).all()
+        if len(logs) > limit:
+            last = logs[limit - 1]
+            return logs[:limit], (last.due_date, last.habit_id)
+        return logs, None
 
-        if new_logs:
-            self.db.bulk_save_objects(new_logs)
-            self.db.commit()
+    def iter_logs(
+        self,
+        habit_id: Optional[UUID] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None
+    ) -> Iterator[HabitLog]:
+        """Stored logs ordered by (due_date, habit_id), fetched from the database cursor in batches"""
+        return self._logs_query(habit_id, start, end).yield_per(STREAM_BATCH_SIZE)
 
-        return new_logs
+    def _logs_query(self, habit_id: Optional[UUID], start: Optional[datetime], end: Optional[datetime]) -> Query:
+        # (due_date, habit_id) is unique and served by ix_habit_logs_due_date, or by
+        # uq_habit_logs_habit_due when filtering on one habit
+        query = self.db.query(HabitLog)
+        if habit_id is not None:
+            query = query.filter(HabitLog.habit_id == str(habit_id))
+        if start is not None:
+            query = query.filter(HabitLog.due_date >= start)
+        if end is not None:
+            query = query.filter(HabitLog.due_date <= end_of_day(end))
+        return query.order_by(HabitLog.due_date, HabitLog.habit_id)
 
     def get_due_habits(self, date: datetime) -> List[HabitWithLog]:
         """Get habits with their most relevant log for the given date"""
-        logger.debug(f"Fetching habits due on {date}")
-        
-        habits = self.db.query(Habit).all()
-        habits_with_logs = []
+        return [HabitWithLog.model_validate(row) for row in self.get_due_habit_rows(date)]
 
+    def get_due_habit_rows(self, date: datetime) -> List[dict]:
+        """Habits with their most relevant log for the given date, as plain dicts.
+
+        Due slots are computed from each habit's creation date and recurrence;
+        nothing is written. Persisted logs only override the virtual slot state.
+        Columns are projected in the queries, so no ORM objects are built.
+        """
+        logger.debug("Fetching habits due on %s", date)
+
+        habits = self.db.query(Habit.id, Habit.name, Habit.recurrence, Habit.created_at).all()
+
+        # The most relevant slot of each habit is the latest one due by the end of the date
+        relevant_slots = {}
         for habit in habits:
-            # Get or create logs up to the query date
-            self.create_due_logs(habit, date)
-            
-            # Get the most relevant log (first log with due_date >= today)
-            # Compare with end of day
-            date_eod = end_of_day(date)
-            relevant_log = (self.db.query(HabitLog)
-                          .filter(HabitLog.habit_id == habit.id,
-                                 HabitLog.due_date <= date_eod)
-                          .order_by(HabitLog.due_date.desc())
-                          .first())
-            
-            if relevant_log:
-                habits_with_logs.append(HabitWithLog(
-                    habit=habit,
-                    latest_log=relevant_log
-                ))
+            recurrence = compile_recurrence(habit.recurrence)
+            index = slot_index_at(habit.created_at, recurrence, date)
+            if index >= 1:
+                relevant_slots[habit.id] = (index, slot_due_date(habit.created_at, recurrence, index))
+
+        if not relevant_slots:
+            return []
+
+        # Fetch the latest persisted log per habit within the window of relevant slots,
+        # in one query, ranking each habit's logs with a window function
+        date_eod = end_of_day(date)
+        earliest_due = min(due_date for _, due_date in relevant_slots.values())
+        ranked = (self.db.query(
+                      HabitLog.id.label("log_id"),
+                      func.row_number().over(
+                          partition_by=HabitLog.habit_id,
+                          order_by=HabitLog.due_date.desc()
+                      ).label("rank"))
+                  .filter(HabitLog.due_date >= earliest_due,
+                          HabitLog.due_date <= date_eod)
+                  .subquery())
+        persisted_logs = (self.db.query(HabitLog.id, HabitLog.habit_id, HabitLog.due_date, HabitLog.completed)
+                          .join(ranked, HabitLog.id == ranked.c.log_id)
+                          .filter(ranked.c.rank == 1)
+                          .all())
+        logs_by_habit = {log.habit_id: log for log in persisted_logs}
+
+        # Slots past the archive horizon keep their completion in the monthly roll-ups only
+        cutoff = archive_cutoff(datetime.now())
+        archived = HabitLogArchiveRepository(self.db).completed_slots(
+            (habit_id, due_date) for habit_id, (_, due_date) in relevant_slots.items()
+            if due_date < cutoff and getattr(logs_by_habit.get(habit_id), "due_date", None) != due_date
+        )
+
+        habits_with_logs = []
+        for habit in habits:
+            if habit.id not in relevant_slots:
+                continue
+            index, due_date = relevant_slots[habit.id]
+            relevant_log = logs_by_habit.get(habit.id)
+            if relevant_log is not None and relevant_log.due_date == due_date:
+                log = relevant_log._asdict()
+            else:
+                log = {
+                    "id": slot_log_id(habit.id, index),
+                    "habit_id": habit.id,
+                    "due_date": due_date,
+                    "completed": (habit.id, due_date.date()) in archived,
+                }
+            habits_with_logs.append({"habit": habit._asdict(), "latest_log": log})
 
         return habits_with_logs
 
+    def materialize_due_logs(self, date: datetime) -> int:
+        """Persist the slot each habit has due on the given date, in one transaction.
+
+        Slots that already have a log are skipped by the (habit_id, due_date)
+        uniqueness constraint, so concurrent or repeated runs are harmless.
+        Returns the number of logs written.
+        """
+        rows = []
+        for habit in self.db.query(Habit).all():
+            recurrence = compile_recurrence(habit.recurrence)
+            index = slot_index_at(habit.created_at, recurrence, date)
+            if index < 1:
+                continue
+            rows.append({
+                "id": slot_log_id(habit.id, index),
+                "habit_id": habit.id,
+                "due_date": slot_due_date(habit.created_at, recurrence, index),
+                "completed": False,
+            })
+
+        if not rows:
+            return 0
+
+        result = self.db.execute(
+            sqlite_insert(HabitLog.__table__).on_conflict_do_nothing(),
+            rows
+        )
+        self.db.commit()
+        logger.info(f"Materialized {result.rowcount} of {len(rows)} due habit logs for {date.date()}")
+        return result.rowcount
+
     def create_habit_log(self, habit_id: UUID, date: datetime) -> HabitLog:
         logger.info(f"Creating habit log for habit {habit_id} on {date}")
         db_log = HabitLog(
@@ -102,13 +209,121 @@ class HabitLogRepository:
         logger.info(f"Created habit log with ID: {db_log.id}")
         return db_log
 
-    def complete_habit_log(self, log_id: UUID) -> bool:
-        logger.info(f"Marking habit log {log_id} as completed")
+    def resolve_habit_log(self, log_id: UUID) -> Optional[HabitLog]:
+        """Find a log by ID, resolving virtual slot IDs to their (possibly unsaved) log"""
         log_id_str = str(log_id)
         db_log = self.db.query(HabitLog).filter(HabitLog.id == log_id_str).first()
         if db_log:
-            db_log.completed = True
-            self.db.commit()
+            return db_log
+
+        parsed = parse_slot_log_id(log_id_str)
+        if parsed is None:
+            return None
+        habit_prefix, index = parsed
+        # A range rather than LIKE, so the primary key index is used
+        habit = (self.db.query(Habit)
+                 .filter(Habit.id >= habit_prefix, Habit.id < habit_prefix + "~")
+                 .first())
+        if habit is None or slot_log_id(habit.id, index) != log_id_str:
+            return None
+        if not slot_in_range(habit.created_at, compile_recurrence(habit.recurrence), index):
+            return None
+        return self.get_slot_log(habit, index)
+
+    def set_logs_completed(self, log_ids: List[UUID], completed: bool) -> Dict[str, bool]:
+        """Check or uncheck many logs in one transaction.
+
+        Stored logs are updated with a single UPDATE ... WHERE id IN (...); virtual
+        slots are upserted on (habit_id, due_date) when checked, and cleared in the
+        hot table and the archive roll-ups when unchecked. Returns, per distinct
+        log ID (as a string), whether it was found.
+        """
+        # Repeated IDs are written once; callers answer each requested ID from the returned map
+        ids = list(dict.fromkeys(str(log_id) for log_id in log_ids))
+        try:
+            found = self._set_logs_completed(ids, completed)
+        except IntegrityError:
+            # A slot was materialized concurrently under its own ID; retry against the stored row
+            self.db.rollback()
+            found = self._set_logs_completed(ids, completed)
+        self.db.commit()
+        return {log_id: log_id in found for log_id in ids}
+
+    def _set_logs_completed(self, ids: List[str], completed: bool) -> Set[str]:
+        found = set()
+        completed_slots = []
+        for chunk in chunked(ids, BULK_CHUNK_SIZE):
+            for log_id, due_date, habit in (self.db.query(HabitLog.id, HabitLog.due_date, Habit)
+                                            .join(Habit, Habit.id == HabitLog.habit_id)
+                                            .filter(HabitLog.id.in_(chunk))
+                                            .all()):
+                found.add(log_id)
+                index = slot_index_at(habit.created_at, compile_recurrence(habit.recurrence), due_date)
+                completed_slots.append((habit, index))
+        for chunk in chunked(list(found), BULK_CHUNK_SIZE):
+            (self.db.query(HabitLog)
+             .filter(HabitLog.id.in_(chunk))
+             .update({HabitLog.completed: completed}, synchronize_session=False))
+
+        # Resolve the remaining IDs as virtual slots of existing habits
+        slots = {}
+        for log_id in ids:
+            parsed = None if log_id in found else parse_slot_log_id(log_id)
+            if parsed is not None:
+                slots[log_id] = parsed
+        prefixes = list({habit_prefix for habit_prefix, _ in slots.values()})
+        habits_by_prefix = {}
+        for chunk in chunked(prefixes, BULK_CHUNK_SIZE):
+            # Ranges rather than LIKE, so the primary key index is used
+            habits = (self.db.query(Habit)
+                      .filter(or_(*[and_(Habit.id >= prefix, Habit.id < prefix + "~") for prefix in chunk]))
+                      .all())
+            habits_by_prefix.update({habit.id[:HABIT_PREFIX_LENGTH]: habit for habit in habits})
+
+        rows = []
+        for log_id, (habit_prefix, index) in slots.items():
+            habit = habits_by_prefix.get(habit_prefix)
+            if habit is None or slot_log_id(habit.id, index) != log_id:
+                continue
+            if not slot_in_range(habit.created_at, compile_recurrence(habit.recurrence), index):
+                continue
+            found.add(log_id)
+            completed_slots.append((habit, index))
+            rows.append({
+                "id": log_id,
+                "habit_id": habit.id,
+                "due_date": slot_due_date(habit.created_at, compile_recurrence(habit.recurrence), index),
+                "completed": True,
+            })
+
+        # Virtual slots are only persisted once completed
+        if rows and completed:
+            insert = sqlite_insert(HabitLog.__table__)
+            self.db.execute(
+                insert.on_conflict_do_update(
+                    index_elements=["habit_id", "due_date"],
+                    set_={"completed": insert.excluded.completed}
+                ),
+                rows
+            )
+        elif rows:
+            # The slot may still be stored under an older, non-slot log ID
+            table = HabitLog.__table__
+            self.db.execute(
+                table.update()
+                .where(table.c.habit_id == bindparam("b_habit_id"), table.c.due_date == bindparam("b_due_date"))
+                .values(completed=False),
+                [{"b_habit_id": row["habit_id"], "b_due_date": row["due_date"]} for row in rows]
+            )
+            # ...or only survive in the monthly roll-ups once archived
+            HabitLogArchiveRepository(self.db).clear_completed([(row["habit_id"], row["due_date"]) for row in rows])
+
+        HabitStatsRepository(self.db).record_completions(completed_slots, completed)
+        return found
+
+    def complete_habit_log(self, log_id: UUID) -> bool:
+        logger.info(f"Marking habit log {log_id} as completed")
+        if self.set_logs_completed([log_id], True)[str(log_id)]:
             logger.info(f"Habit log {log_id} marked as completed")
             return True
         logger.warning(f"Habit log {log_id} not found")
@@ -117,12 +332,8 @@ class HabitLogRepository:
     def uncomplete_habit_log(self, log_id: UUID) -> bool:
         """Mark a habit log as not completed"""
         logger.info(f"Marking habit log {log_id} as not completed")
-        log_id_str = str(log_id)
-        db_log = self.db.query(HabitLog).filter(HabitLog.id == log_id_str).first()
-        if db_log:
-            db_log.completed = False
-            self.db.commit()
+        if self.set_logs_completed([log_id], False)[str(log_id)]:
             logger.info(f"Habit log {log_id} marked as not completed")
             return True
         logger.warning(f"Habit log {log_id} not found")
-        return False
\ No newline at end of file
+        return False
@@ -1,13 +1,17 @@
 from sqlalchemy.orm import Session
-from datetime import datetime
+from sqlalchemy import bindparam, select
+import uuid
 from uuid import UUID
-from typing import List, Optional
+from typing import Dict, Iterator, List, Optional, Tuple
 
 from utils.logging import setup_logger
-from utils.date_utils import parse_recurrence
-from habits.database.models import Habit, HabitLog
-from habits.models import HabitCreate
-from habits.repositories.habit_log_repository import HabitLogRepository
+from utils.date_utils import INVALID_RECURRENCE_MESSAGE, compile_recurrence
+from utils.batching import chunked, BULK_CHUNK_SIZE
+from utils.pagination import STREAM_BATCH_SIZE
+from habits.database.models import Habit
+from habits.models import HabitCreate, HabitUpdate, BulkItemResult
+from habits.repositories.habit_stats_repository import HabitStatsRepository
+from habits.repositories.habit_log_archive_repository import HabitLogArchiveRepository
 
 logger = setup_logger(__name__)
 
@@ -18,7 +22,7 @@ class HabitRepository:
     def validate_recurrence(self, recurrence: str) -> bool:
         """Validate recurrence string by attempting to parse it"""
         try:
-            parse_recurrence(recurrence)
+            compile_recurrence(recurrence)
             return True
         except ValueError as e:
             logger.warning(f"Invalid recurrence format: {recurrence}. {str(e)}")
@@ -28,14 +32,31 @@ class HabitRepository:
         logger.debug("Fetching all habits")
         return self.db.query(Habit).all()
 
+    def get_habit_rows(self) -> List[dict]:
+        """All habits as plain dicts, projected in the query without loading ORM objects"""
+        return [dict(row) for row in
+                self.db.execute(select(Habit.id, Habit.name, Habit.recurrence, Habit.created_at)).mappings()]
+
+    def get_habits_page(self, limit: int, after: Optional[str] = None) -> Tuple[List[Habit], Optional[Tuple[str]]]:
+        """One page of habits in ID order, and the key to continue after (None on the last page)"""
+        query = self.db.query(Habit).order_by(Habit.id)
+        if after is not None:
+            query = query.filter(Habit.id > after)
+        habits = query.limit(limit + 1).all()
+        if len(habits) > limit:
+            return habits[:limit], (habits[limit - 1].id,)
+        return habits, None
+
+    def iter_habits(self) -> Iterator[Habit]:
+        """All habits in ID order, fetched from the database cursor in batches"""
+        return self.db.query(Habit).order_by(Habit.id).yield_per(STREAM_BATCH_SIZE)
+
     def create_habit(self, habit: HabitCreate) -> Habit:
         logger.info(f"Creating new habit: {habit.name}")
         
         # Validate recurrence format
         if not self.validate_recurrence(habit.recurrence):
-            raise ValueError(
-                "Invalid recurrence format. Valid formats: '7', '7 days', 'day', '1 day', 'week', '2 weeks', 'month', '2 months'"
-            )
+            raise ValueError(INVALID_RECURRENCE_MESSAGE)
         
         db_habit = Habit(
             name=habit.name,
@@ -54,14 +75,16 @@ class HabitRepository:
     def update_habit(self, habit_id: UUID, habit: HabitCreate) -> Optional[Habit]:
         # Validate recurrence format
         if not self.validate_recurrence(habit.recurrence):
-            raise ValueError(
-                "Invalid recurrence format. Valid formats: '7', '7 days', 'day', '1 day', 'week', '2 weeks', 'month', '2 months'"
-            )
+            raise ValueError(INVALID_RECURRENCE_MESSAGE)
             
         db_habit = self.get_habit(habit_id)
         if db_habit:
+            recurrence_changed = db_habit.recurrence != habit.recurrence
             db_habit.name = habit.name
             db_habit.recurrence = habit.recurrence
+            if recurrence_changed:
+                # Stored logs map to different slots under the new period
+                HabitStatsRepository(self.db).rebuild([db_habit])
             self.db.commit()
             self.db.refresh(db_habit)
         return db_habit
@@ -69,22 +92,82 @@ class HabitRepository:
     def delete_habit(self, habit_id: UUID) -> bool:
         db_habit = self.get_habit(habit_id)
         if db_habit:
+            HabitStatsRepository(self.db).delete([db_habit.id])
+            HabitLogArchiveRepository(self.db).delete([db_habit.id])
             self.db.delete(db_habit)
             self.db.commit()
             return True
         return False
 
-    def create_due_habit_logs(self) -> List[HabitLog]:
-        """Create initial logs for all habits"""
-        logger.info("Creating due habit logs")
-        habits = self.get_habits()
-        now = datetime.now()
-        
-        log_repo = HabitLogRepository(self.db)
-        all_new_logs = []
-        
+    def create_habits(self, habits: List[HabitCreate]) -> List[BulkItemResult]:
+        """Create many habits in one transaction; invalid items are reported and skipped"""
+        logger.info(f"Creating {len(habits)} habits")
+        results = []
+        db_habits = []
         for habit in habits:
-            new_logs = log_repo.create_due_logs(habit, now)
-            all_new_logs.extend(new_logs)
-            
-        return all_new_logs 
+            if not self.validate_recurrence(habit.recurrence):
+                results.append(BulkItemResult(status="invalid", detail=INVALID_RECURRENCE_MESSAGE))
+                continue
+            db_habit = Habit(id=str(uuid.uuid4()), name=habit.name, recurrence=habit.recurrence)
+            db_habits.append(db_habit)
+            results.append(db_habit)
+
+        self.db.add_all(db_habits)
+        self.db.commit()
+        return [
+            result if isinstance(result, BulkItemResult)
+            else BulkItemResult(id=result.id, status="success", habit=result)
+            for result in results
+        ]
+
+    def update_habits(self, habits: List[HabitUpdate]) -> List[BulkItemResult]:
+        """Update many habits with one executemany UPDATE in a single transaction"""
+        logger.info(f"Updating {len(habits)} habits")
+        recurrences = self._recurrences([habit.id for habit in habits])
+        results = []
+        rows = []
+        for habit in habits:
+            habit_id = str(habit.id)
+            if habit_id not in recurrences:
+                results.append(BulkItemResult(id=habit.id, status="not_found"))
+            elif not self.validate_recurrence(habit.recurrence):
+                results.append(BulkItemResult(id=habit.id, status="invalid", detail=INVALID_RECURRENCE_MESSAGE))
+            else:
+                rows.append({"b_id": habit_id, "name": habit.name, "recurrence": habit.recurrence})
+                results.append(BulkItemResult(id=habit.id, status="success"))
+
+        if rows:
+            table = Habit.__table__
+            self.db.execute(
+                table.update()
+                .where(table.c.id == bindparam("b_id"))
+                .values(name=bindparam("name"), recurrence=bindparam("recurrence")),
+                rows
+            )
+            # Stored logs map to different slots under a new period
+            changed = [row["b_id"] for row in rows if row["recurrence"] != recurrences[row["b_id"]]]
+            for chunk in chunked(changed, BULK_CHUNK_SIZE):
+                HabitStatsRepository(self.db).rebuild(self.db.query(Habit).filter(Habit.id.in_(chunk)).all())
+        self.db.commit()
+        return results
+
+    def delete_habits(self, habit_ids: List[UUID]) -> List[BulkItemResult]:
+        """Delete many habits with DELETE ... WHERE id IN (...) in a single transaction"""
+        logger.info(f"Deleting {len(habit_ids)} habits")
+        existing = set(self._recurrences(habit_ids))
+        HabitStatsRepository(self.db).delete(list(existing))
+        HabitLogArchiveRepository(self.db).delete(list(existing))
+        for chunk in chunked(list(existing), BULK_CHUNK_SIZE):
+            self.db.query(Habit).filter(Habit.id.in_(chunk)).delete(synchronize_session=False)
+        self.db.commit()
+        return [
+            BulkItemResult(id=habit_id, status="success" if str(habit_id) in existing else "not_found")
+            for habit_id in habit_ids
+        ]
+
+    def _recurrences(self, habit_ids: List[UUID]) -> Dict[str, str]:
+        """Current recurrence of each existing habit among the given IDs"""
+        recurrences = {}
+        for chunk in chunked([str(habit_id) for habit_id in habit_ids], BULK_CHUNK_SIZE):
+            recurrences.update(self.db.query(Habit.id, Habit.recurrence).filter(Habit.id.in_(chunk)).all())
+        return recurrences
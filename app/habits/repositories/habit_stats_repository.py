@@ -0,0 +1,125 @@
+import numpy as np
+from sqlalchemy.orm import Session
+from datetime import date, datetime
+from typing import Dict, List, Optional, Tuple
+
+from utils.logging import setup_logger
+from utils.batching import chunked, BULK_CHUNK_SIZE
+from habits.database.models import Habit, HabitLog, HabitCompletions
+from habits.models import HabitCalendar, HabitStats
+from habits.repositories.habit_log_archive_repository import HabitLogArchiveRepository
+from utils.date_utils import compile_recurrence
+from habits.stats import (
+    CompletionSummary,
+    EMPTY_SUMMARY,
+    calendar_slots,
+    current_stats,
+    set_slots,
+    slots_completed,
+    summarize,
+)
+
+logger = setup_logger(__name__)
+
+class HabitStatsRepository:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def record_completions(self, slots: List[Tuple[Habit, int]], completed: bool):
+        """Apply checked or unchecked (habit, slot index) pairs to the completion bitmaps.
+
+        Runs inside the caller's transaction, after its log writes, so the bitmaps
+        are read under the same write lock and the caller's commit covers both.
+        """
+        indices_by_habit: Dict[str, Tuple[Habit, List[int]]] = {}
+        for habit, index in slots:
+            indices_by_habit.setdefault(habit.id, (habit, []))[1].append(index)
+
+        rows = {}
+        for chunk in chunked(list(indices_by_habit), BULK_CHUNK_SIZE):
+            rows.update((row.habit_id, row) for row in
+                        self.db.query(HabitCompletions).filter(HabitCompletions.habit_id.in_(chunk)).all())
+
+        for habit_id, (habit, indices) in indices_by_habit.items():
+            row = rows.get(habit_id)
+            if row is None:
+                if not completed:
+                    continue
+                row = HabitCompletions(habit_id=habit_id, bitmap=b"")
+                self.db.add(row)
+            row.bitmap = set_slots(row.bitmap, indices, completed)
+            self._summarize(row, habit)
+
+    def rebuild(self, habits: List[Habit]):
+        """Recompute completion bitmaps from the stored completed logs, e.g. after a recurrence change"""
+        for habit in habits:
+            logger.info(f"Rebuilding completion stats for habit {habit.id}")
+            recurrence = compile_recurrence(habit.recurrence)
+            due_dates = (self.db.query(HabitLog.due_date)
+                         .filter(HabitLog.habit_id == habit.id, HabitLog.completed == True)
+                         .all())
+            # Completions older than the archive horizon only survive in the monthly roll-ups
+            days = {due_date.date() for (due_date,) in due_dates}
+            days.update(HabitLogArchiveRepository(self.db).completed_days(habit.id))
+            due_days = np.array(sorted(days), dtype="datetime64[D]")
+            row = self.db.get(HabitCompletions, habit.id)
+            if row is None:
+                row = HabitCompletions(habit_id=habit.id)
+                self.db.add(row)
+            row.bitmap = set_slots(b"", recurrence.indices_at(habit.created_at, due_days), True)
+            self._summarize(row, habit)
+
+    def delete(self, habit_ids: List[str]):
+        for chunk in chunked(habit_ids, BULK_CHUNK_SIZE):
+            (self.db.query(HabitCompletions)
+             .filter(HabitCompletions.habit_id.in_(chunk))
+             .delete(synchronize_session=False))
+
+    def get_stats(self, now: datetime, habit_id: Optional[str] = None) -> List[HabitStats]:
+        """Stats of every habit (or one), from the stored summaries in a single query"""
+        query = (self.db.query(Habit, HabitCompletions)
+                 .outerjoin(HabitCompletions, HabitCompletions.habit_id == Habit.id))
+        if habit_id is not None:
+            query = query.filter(Habit.id == habit_id)
+
+        stats = []
+        for habit, row in query.all():
+            if row is None:
+                bitmap, summary = b"", EMPTY_SUMMARY
+            else:
+                bitmap, summary = row.bitmap, CompletionSummary(
+                    row.completed_count, row.longest_streak, row.streak_end,
+                    row.streak_length, row.weekday_completed
+                )
+            stats.append(HabitStats(
+                habit_id=habit.id,
+                **current_stats(bitmap, summary, habit.created_at, compile_recurrence(habit.recurrence), now)
+            ))
+        return stats
+
+    def get_calendar(self, start: date, end: date) -> HabitCalendar:
+        """Slot and completion matrices of every habit over a date range, from a single query"""
+        days = (end - start).days + 1
+        rows = (self.db.query(Habit, HabitCompletions.bitmap)
+                .outerjoin(HabitCompletions, HabitCompletions.habit_id == Habit.id)
+                .all())
+
+        habits = [habit for habit, _ in rows]
+        slots = np.zeros((len(rows), days), dtype=np.int64)
+        completed = np.zeros((len(rows), days), dtype=np.uint8)
+        for i, (habit, bitmap) in enumerate(rows):
+            slots[i] = calendar_slots(habit.created_at, compile_recurrence(habit.recurrence), start, days)
+            completed[i] = slots_completed(bitmap or b"", slots[i])
+
+        return HabitCalendar(
+            start=start,
+            end=end,
+            habits=habits,
+            slots=slots.tolist(),
+            completed=completed.tolist()
+        )
+
+    def _summarize(self, row: HabitCompletions, habit: Habit):
+        summary = summarize(row.bitmap, habit.created_at, compile_recurrence(habit.recurrence))
+        for field, value in summary._asdict().items():
+            setattr(row, field, value)
@@ -0,0 +1,66 @@
+import asyncio
+from datetime import datetime, timedelta
+from typing import Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from habits.database.database import SessionLocal
+from habits.repositories.habit_log_repository import HabitLogRepository
+from habits.repositories.habit_log_archive_repository import (
+    ARCHIVE_AFTER_DAYS,
+    HabitLogArchiveRepository,
+    archive_cutoff,
+)
+from utils.logging import setup_logger
+
+logger = setup_logger(__name__)
+
+class HabitLogScheduler:
+    """Background task that materializes due habit logs at every day boundary
+    and archives logs past the archive horizon.
+
+    Runs once at startup to catch up, then shortly after each local midnight.
+    Request handlers never write logs themselves.
+    """
+
+    def __init__(self, delay_after_midnight: timedelta = timedelta(seconds=5)):
+        self.delay_after_midnight = delay_after_midnight
+        self.task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self.task is None:
+            self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+    def seconds_until_next_run(self, now: datetime) -> float:
+        next_midnight = (now + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+        return (next_midnight + self.delay_after_midnight - now).total_seconds()
+
+    async def _run(self):
+        while True:
+            try:
+                await run_in_threadpool(self.materialize, datetime.now())
+            except Exception as e:
+                logger.error(f"Error materializing habit logs: {e}")
+            await asyncio.sleep(self.seconds_until_next_run(datetime.now()))
+
+    def materialize(self, date: datetime) -> int:
+        db = SessionLocal()
+        try:
+            written = HabitLogRepository(db).materialize_due_logs(date)
+            if ARCHIVE_AFTER_DAYS > 0:
+                HabitLogArchiveRepository(db).archive_logs(archive_cutoff(date))
+            return written
+        finally:
+            db.close()
+
+# Create a global instance of the scheduler
+habit_log_scheduler = HabitLogScheduler()
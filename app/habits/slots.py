@@ -0,0 +1,48 @@
+"""
+Virtual habit due-slots.
+
+A habit's due dates are not stored: slot N (N >= 1) of a habit falls due at the
+end of the day N recurrence periods (days or calendar months, see
+utils.date_utils.Recurrence) after the habit was created. A HabitLog row
+is only written once a slot is completed (or otherwise annotated), and it reuses
+the slot's log ID, so persisted and virtual logs are addressed the same way.
+
+Slot log IDs are reversible: the first 96 bits are the habit ID and the last
+32 bits the slot index. This lets check/uncheck resolve a log that has never
+been written without any extra request parameters.
+"""
+from datetime import datetime, time, timedelta
+from typing import Optional, Tuple
+
+from utils.date_utils import Recurrence
+
+# Length of the habit ID prefix kept in a slot log ID: 24 hex digits + 4 hyphens
+HABIT_PREFIX_LENGTH = 28
+
+# How far ahead of today a slot can be addressed; later indices are rejected
+SLOT_HORIZON = timedelta(days=366)
+
+def slot_due_date(created_at: datetime, recurrence: Recurrence, index: int) -> datetime:
+    """Due date of the index-th slot (1-based) of a habit"""
+    return datetime.combine(recurrence.day(created_at, index), time.max)
+
+def slot_index_at(created_at: datetime, recurrence: Recurrence, date: datetime) -> int:
+    """Index of the latest slot due by the end of the given date (0 if none yet)"""
+    return recurrence.index_at(created_at, date)
+
+def slot_in_range(created_at: datetime, recurrence: Recurrence, index: int) -> bool:
+    """Whether a slot index is one a client can address: from 1 up to the horizon past today"""
+    return 1 <= index <= slot_index_at(created_at, recurrence, datetime.now() + SLOT_HORIZON)
+
+def slot_log_id(habit_id: str, index: int) -> str:
+    """Deterministic log ID of a habit's slot"""
+    return f"{str(habit_id)[:HABIT_PREFIX_LENGTH]}{index:08x}"
+
+def parse_slot_log_id(log_id: str) -> Optional[Tuple[str, int]]:
+    """Split a slot log ID into (habit ID prefix, slot index)"""
+    log_id = str(log_id)
+    try:
+        index = int(log_id[HABIT_PREFIX_LENGTH:], 16)
+    except ValueError:
+        return None
+    return log_id[:HABIT_PREFIX_LENGTH], index
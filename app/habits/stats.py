@@ -0,0 +1,133 @@
+"""
+Vectorized habit statistics over slot completion bitmaps.
+
+Each habit's completions are kept as a bitmap where bit N is set once slot N
+(see habits.slots) is completed. Checking or unchecking logs flips bits and
+re-summarizes only that habit's bitmap with NumPy. Reads combine the stored
+summary with the current date and a bounded window of the bitmap, so they
+never rescan habit_logs.
+"""
+from datetime import date, datetime, timedelta
+from typing import Iterable, List, NamedTuple, Optional
+
+import numpy as np
+
+from habits.slots import slot_index_at
+from utils.date_utils import DAY, Recurrence
+
+WEEKDAYS = 7
+ROLLING_WINDOWS = (7, 30, 365)
+
+class CompletionSummary(NamedTuple):
+    completed_count: int
+    longest_streak: int
+    streak_end: int     # index of the latest completed slot
+    streak_length: int  # length of the run of completed slots ending at streak_end
+    weekday_completed: List[int]  # completed slots per due weekday, Monday first
+
+EMPTY_SUMMARY = CompletionSummary(0, 0, 0, 0, [0] * WEEKDAYS)
+
+def to_bits(bitmap: bytes) -> np.ndarray:
+    return np.unpackbits(np.frombuffer(bitmap, dtype=np.uint8), bitorder="little")
+
+def from_bits(bits: np.ndarray) -> bytes:
+    packed = np.packbits(bits.astype(np.uint8), bitorder="little")
+    return np.trim_zeros(packed, "b").tobytes()
+
+def set_slots(bitmap: bytes, indices: Iterable[int], completed: bool) -> bytes:
+    """Set or clear the bits of the given slot indices"""
+    bits = to_bits(bitmap)
+    indices = np.fromiter(indices, dtype=np.int64)
+    # Slots are 1-based; logs stored before the habit's first slot have none
+    indices = indices[indices >= 1]
+    if indices.size == 0:
+        return bitmap
+    if completed and indices.max() >= bits.size:
+        bits = np.concatenate([bits, np.zeros(indices.max() + 1 - bits.size, dtype=np.uint8)])
+    bits[indices[indices < bits.size]] = 1 if completed else 0
+    return from_bits(bits)
+
+def summarize(bitmap: bytes, created_at: datetime, recurrence: Recurrence) -> CompletionSummary:
+    """Streaks and weekday counts of a completion bitmap"""
+    completed = np.flatnonzero(to_bits(bitmap))
+    if completed.size == 0:
+        return EMPTY_SUMMARY
+
+    # A new run of consecutive slots starts wherever the gap to the previous completed slot exceeds one
+    breaks = np.flatnonzero(np.diff(completed) > 1)
+    starts = np.concatenate(([0], breaks + 1))
+    ends = np.concatenate((breaks, [completed.size - 1]))
+    lengths = ends - starts + 1
+
+    weekdays = recurrence.weekdays(created_at, completed)
+    return CompletionSummary(
+        completed_count=int(completed.size),
+        longest_streak=int(lengths.max()),
+        streak_end=int(completed[-1]),
+        streak_length=int(lengths[-1]),
+        weekday_completed=np.bincount(weekdays, minlength=WEEKDAYS).tolist(),
+    )
+
+def count_completed(bitmap: bytes, first: int, last: int) -> int:
+    """Number of completed slots with first <= index <= last, reading only those bytes"""
+    if last < first:
+        return 0
+    offset = first // 8 * 8
+    bits = to_bits(bitmap[first // 8:last // 8 + 1])
+    return int(bits[first - offset:last - offset + 1].sum())
+
+def due_per_weekday(created_at: datetime, recurrence: Recurrence, count: int) -> np.ndarray:
+    """Number of slots 1..count falling due on each weekday"""
+    if recurrence.unit != DAY:
+        return np.bincount(recurrence.weekdays(created_at, np.arange(1, count + 1)), minlength=WEEKDAYS)
+    # Slot weekdays of day-based recurrences repeat every 7 slots, so count one cycle and scale it
+    cycle = recurrence.weekdays(created_at, np.arange(1, WEEKDAYS + 1))
+    full_cycles, rest = divmod(count, WEEKDAYS)
+    return (np.bincount(cycle, minlength=WEEKDAYS) * full_cycles
+            + np.bincount(cycle[:rest], minlength=WEEKDAYS))
+
+def rate(completed: int, due: int) -> Optional[float]:
+    return completed / due if due > 0 else None
+
+def current_stats(bitmap: bytes, summary: CompletionSummary, created_at: datetime,
+                  recurrence: Recurrence, now: datetime) -> dict:
+    """Stats of one habit as of now, in constant time for a given habit"""
+    current = slot_index_at(created_at, recurrence, now)
+    # The slot due today only counts once it is completed; until then it is still open
+    current_done = current >= 1 and count_completed(bitmap, current, current) == 1
+    last_due = current if current_done else current - 1
+
+    rolling = {}
+    for window_days in ROLLING_WINDOWS:
+        # Slots falling due within the last window_days days, today included
+        first = max(1, slot_index_at(created_at, recurrence, now - timedelta(days=window_days)) + 1)
+        rolling[window_days] = rate(count_completed(bitmap, first, last_due), last_due - first + 1)
+
+    due_weekdays = due_per_weekday(created_at, recurrence, max(0, last_due))
+    return {
+        "current_streak": summary.streak_length if summary.streak_end >= current - 1 else 0,
+        "longest_streak": summary.longest_streak,
+        "completed": summary.completed_count,
+        "due": max(0, last_due),
+        "completion_rate": rate(summary.completed_count, max(0, last_due)),
+        "completion_rate_7d": rolling[7],
+        "completion_rate_30d": rolling[30],
+        "completion_rate_365d": rolling[365],
+        "weekday_completion": [
+            rate(completed, int(due))
+            for completed, due in zip(summary.weekday_completed, due_weekdays)
+        ],
+    }
+
+def calendar_slots(created_at: datetime, recurrence: Recurrence, start: date, days: int) -> np.ndarray:
+    """Latest slot due by each of the days from start on (0 before the first slot), as slot_index_at"""
+    return recurrence.indices_at(created_at, np.datetime64(start, "D") + np.arange(days))
+
+def slots_completed(bitmap: bytes, slots: np.ndarray) -> np.ndarray:
+    """1 where the slot at each position is completed, else 0"""
+    bits = to_bits(bitmap)
+    completed = np.zeros(slots.shape, dtype=np.uint8)
+    stored = slots < bits.size
+    completed[stored] = bits[slots[stored]]
+    return completed
+
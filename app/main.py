@@ -1,22 +1,116 @@
-from fastapi import FastAPI, Depends, HTTPException
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, Response
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional, Tuple
 from datetime import datetime
+import asyncio
+import csv
+import os
+import time
 from uuid import UUID
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse
+from starlette.concurrency import run_in_threadpool
 
-from habits.database.database import get_db, Base, engine
-from habits.models import Habit, HabitCreate, HabitLog, HabitWithLog
+from habits.database.database import get_db, get_read_db, database as habits_database, ReadSessionLocal
+from habits.database.migrations import MIGRATIONS as HABITS_MIGRATIONS
+from habits.models import (
+    Habit, HabitCreate, HabitLog, HabitWithLog,
+    HabitBulkCreate, HabitBulkUpdate, HabitBulkDelete, HabitLogBulkUpdate,
+    BulkItemResult, BulkResult, HabitStats, HabitCalendar, ImportResult,
+)
 from habits.repositories.habit_repository import HabitRepository
 from habits.repositories.habit_log_repository import HabitLogRepository
+from habits.repositories.habit_stats_repository import HabitStatsRepository
+from habits.scheduler import habit_log_scheduler
+from habits.importer import HabitImporter, IMPORT_BATCH_SIZE, iter_lines, parse_lines
+from habits.cache import (
+    habit_cache, serialize_habits, serialize_due_habits, serialize_habit_stats, serialize_habit_calendar,
+    invalidate_habits, invalidate_logs, HABITS, DUE, STATS,
+)
+from utils.json_response import dumps
 from utils.logging import setup_logger
+from utils.loop_watchdog import loop_watchdog
+from utils.metrics import metrics
+from utils.migrations import run_migrations
+from utils.pagination import (
+    DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, decode_cursor, ndjson_response, page_headers,
+)
+from utils.profiling import (
+    PROFILE_HEADER, PROFILE_TOKEN, PROFILING, ProfiledRoute, ProfilerMiddleware,
+    authorized, list_profiles, profile_path, profile_summary,
+)
+from utils.query_stats import QueryStatsMiddleware
+from utils.response_cache import CachedResponse
 
+from timer.event_recorder import timer_event_recorder
 from timer.routes import router as timer_router
-from timer.database.database import Base as TimerBase, engine as timer_engine
+from timer.websocket_manager import timer_manager
+from timer.database.database import database as timer_database
+from timer.database.migrations import MIGRATIONS as TIMER_MIGRATIONS
+from timer.repositories.sound_repository import SoundRepository
+from timer.repositories.timer_repository import TimerRepository
 
 logger = setup_logger(__name__)
 
-app = FastAPI()
+# Set to 0 where a deploy step already migrated the databases, to skip even the schema version check
+SCHEMA_CHECK = os.environ.get("SCHEMA_CHECK", "1") != "0"
+
+# Set to 0 to serve the first requests from cold caches and connection pools
+STARTUP_WARMUP = os.environ.get("STARTUP_WARMUP", "1") != "0"
+
+def today() -> datetime:
+    return datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+
+def initialize_databases():
+    """Bring both databases up to the latest schema version; a version read when already there"""
+    run_migrations(habits_database.engines.write, HABITS_MIGRATIONS)
+    run_migrations(timer_database.engines.write, TIMER_MIGRATIONS)
+    logger.info("Database schemas up to date")
+
+def cached_habit_lists(day: datetime) -> Tuple[bytes, bytes]:
+    """The encoded habit list and habits due on `day`, from the response cache or computed into it"""
+    db = ReadSessionLocal()
+    try:
+        habits = habit_cache.get_or_compute((HABITS,), lambda: serialize_habits(HabitRepository(db).get_habit_rows()))
+        due = habit_cache.get_or_compute(
+            (DUE, day.date().isoformat()),
+            lambda: serialize_due_habits(HabitLogRepository(db).get_due_habit_rows(day))
+        )
+    finally:
+        db.close()
+    return habits.body, due.body
+
+def warm_up():
+    """Fill the response cache with what the frontend requests first, opening a reader connection on the way"""
+    cached_habit_lists(today())
+    with timer_database.engines.read.connect():
+        pass
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    started = time.perf_counter()
+    if SCHEMA_CHECK:
+        await run_in_threadpool(initialize_databases)
+    if STARTUP_WARMUP:
+        await run_in_threadpool(warm_up)
+    habit_log_scheduler.start()
+    timer_event_recorder.start()
+    await timer_manager.start_update_loop()
+    loop_watchdog.start()
+    logger.info(f"Startup completed in {(time.perf_counter() - started) * 1000:.0f} ms")
+    yield
+    await loop_watchdog.stop()
+    await timer_manager.stop_update_loop()
+    # After the update loop, so the transitions it recorded last are written too
+    await timer_event_recorder.stop()
+    await habit_log_scheduler.stop()
+    habits_database.dispose()
+    timer_database.dispose()
+
+app = FastAPI(lifespan=lifespan)
+# Sync endpoints run in worker threads; with profiling on, the route wraps them to be profiled there too
+app.router.route_class = ProfiledRoute
 
 # Add this before your route definitions
 app.add_middleware(
@@ -30,24 +124,193 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
-
-# Create database tables
-Base.metadata.create_all(bind=engine)
-TimerBase.metadata.create_all(bind=timer_engine)
-logger.info("Database tables created")
+app.add_middleware(QueryStatsMiddleware)
+if PROFILING:
+    app.add_middleware(ProfilerMiddleware)
 
 @app.get("/openapi.json", include_in_schema=False)
 def get_openapi_json():
     return app.openapi()
 
+@app.get("/metrics", include_in_schema=False)
+def get_metrics():
+    """In-process metrics in the Prometheus text format"""
+    return Response(metrics.render(), media_type="text/plain; version=0.0.4")
+
+def check_profile_access(request: Request):
+    # Profiles expose source paths and timings: without a token to guard them they are not served at all
+    if not PROFILING or not PROFILE_TOKEN:
+        raise HTTPException(status_code=404, detail="Profiles are not served without PROFILE_TOKEN")
+    if not authorized(request.headers.get(PROFILE_HEADER)):
+        raise HTTPException(status_code=403, detail=f"Missing or wrong {PROFILE_HEADER} header")
+
+@app.get("/debug/profiles", include_in_schema=False)
+def get_profiles(request: Request):
+    """Saved request profiles, newest first"""
+    check_profile_access(request)
+    return list_profiles()
+
+@app.get("/debug/profiles/{name}", include_in_schema=False)
+def get_profile(name: str, request: Request, raw: bool = False):
+    """The slowest functions of a saved profile, or with raw=true the .prof file for pstats or snakeviz"""
+    check_profile_access(request)
+    path = profile_path(name)
+    if path is None:
+        raise HTTPException(status_code=404, detail=f"Profile {name} not found")
+    if raw:
+        return FileResponse(path, media_type="application/octet-stream", filename=name)
+    return Response(profile_summary(path), media_type="text/plain")
+
+def parse_date(value: str) -> datetime:
+    try:
+        return datetime.strptime(value, "%Y-%m-%d")
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD")
+
+def parse_cursor(cursor: str, length: int) -> list:
+    try:
+        return decode_cursor(cursor, length)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @app.get("/habits", response_model=List[Habit])
-def get_habits(db: Session = Depends(get_db)):
-    logger.info("Fetching all habits")
+def get_habits(
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    db: Session = Depends(get_read_db)
+):
     repo = HabitRepository(db)
-    return repo.get_habits()
+    if limit is not None or after is not None:
+        # Keyset page in ID order; the next page's cursor is in X-Next-Cursor
+        after_id = parse_cursor(after, 1)[0] if after else None
+        habits, next_key = repo.get_habits_page(limit or DEFAULT_PAGE_SIZE, after_id)
+        response.headers.update(page_headers(next_key))
+        return habits
+
+    logger.info("Fetching all habits")
+    return habit_cache.response(
+        request,
+        (HABITS,),
+        lambda: serialize_habits(repo.get_habit_rows())
+    )
+
+@app.post("/habits/bulk", response_model=BulkResult)
+def create_habits(payload: HabitBulkCreate, db: Session = Depends(get_db)):
+    logger.info(f"Bulk creating {len(payload.habits)} habits")
+    results = HabitRepository(db).create_habits(payload.habits)
+    invalidate_habits()
+    return BulkResult(results=results)
+
+@app.put("/habits/bulk", response_model=BulkResult)
+def update_habits(payload: HabitBulkUpdate, db: Session = Depends(get_db)):
+    logger.info(f"Bulk updating {len(payload.habits)} habits")
+    results = HabitRepository(db).update_habits(payload.habits)
+    invalidate_habits()
+    return BulkResult(results=results)
+
+@app.post("/habits/bulk/delete", response_model=BulkResult)
+def delete_habits(payload: HabitBulkDelete, db: Session = Depends(get_db)):
+    logger.info(f"Bulk deleting {len(payload.habit_ids)} habits")
+    results = HabitRepository(db).delete_habits(payload.habit_ids)
+    invalidate_habits()
+    return BulkResult(results=results)
+
+@app.get("/habits/export")
+def export_habits():
+    """Stream all habits as NDJSON, one habit per line"""
+    def lines():
+        # The stream outlives the request's dependencies, so it holds its own session
+        db = ReadSessionLocal()
+        try:
+            for habit in HabitRepository(db).iter_habits():
+                yield Habit.model_validate(habit).model_dump_json()
+        finally:
+            db.close()
+
+    return ndjson_response(lines(), "habits.ndjson")
+
+@app.get("/habits/logs", response_model=List[HabitLog])
+def get_habit_logs(
+    response: Response,
+    habit_id: Optional[UUID] = None,
+    start: Optional[str] = Query(None, alias="from"),
+    end: Optional[str] = Query(None, alias="to"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    db: Session = Depends(get_read_db)
+):
+    """Stored habit logs ordered by due date, one keyset page at a time"""
+    after_key = None
+    if after:
+        due_date, after_habit_id = parse_cursor(after, 2)
+        try:
+            after_key = (datetime.fromisoformat(due_date), after_habit_id)
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    logs, next_key = HabitLogRepository(db).get_logs_page(
+        limit,
+        after_key,
+        habit_id,
+        parse_date(start) if start else None,
+        parse_date(end) if end else None
+    )
+    response.headers.update(page_headers(next_key))
+    return logs
+
+@app.get("/habits/logs/export")
+def export_habit_logs(
+    habit_id: Optional[UUID] = None,
+    start: Optional[str] = Query(None, alias="from"),
+    end: Optional[str] = Query(None, alias="to")
+):
+    """Stream stored habit logs as NDJSON, ordered by due date"""
+    start_date = parse_date(start) if start else None
+    end_date = parse_date(end) if end else None
+
+    def lines():
+        db = ReadSessionLocal()
+        try:
+            for log in HabitLogRepository(db).iter_logs(habit_id, start_date, end_date):
+                yield HabitLog.model_validate(log).model_dump_json()
+        finally:
+            db.close()
+
+    return ndjson_response(lines(), "habit_logs.ndjson")
+
+@app.post("/habits/import", response_model=ImportResult)
+async def import_habits(request: Request, db: Session = Depends(get_db)):
+    """Import habits and logs from an NDJSON body, or CSV with Content-Type text/csv"""
+    is_csv = request.headers.get("content-type", "").startswith("text/csv")
+    importer = HabitImporter(db)
+    csv_header = None
+    batch = []
+
+    def flush(lines, header):
+        importer.add_batch(parse_lines(lines, header))
+
+    # The body is parsed and written one batch at a time, so memory does not grow with its size
+    async for line_number, line in iter_lines(request.stream()):
+        if is_csv and csv_header is None:
+            if isinstance(line, UnicodeDecodeError):
+                raise HTTPException(status_code=400, detail=f"CSV header (line {line_number}) is not valid UTF-8")
+            csv_header = next(csv.reader([line]))
+            continue
+        batch.append((line_number, line))
+        if len(batch) >= IMPORT_BATCH_SIZE:
+            await run_in_threadpool(flush, batch, csv_header)
+            batch = []
+    if batch:
+        await run_in_threadpool(flush, batch, csv_header)
+
+    result = await run_in_threadpool(importer.finish, datetime.now())
+    invalidate_habits()
+    return result
 
 @app.get("/habits/{habit_id}/get", response_model=Habit)
-def get_habit(habit_id: UUID, db: Session = Depends(get_db)):
+def get_habit(habit_id: UUID, db: Session = Depends(get_read_db)):
     repo = HabitRepository(db)
     habit = repo.get_habit(habit_id)
     if not habit:
@@ -61,8 +324,7 @@ def create_habit(habit: HabitCreate, db: Session = Depends(get_db)):
     repo = HabitRepository(db)
     try:
         new_habit = repo.create_habit(habit)
-        logger.info("Creating initial habit logs")
-        repo.create_due_habit_logs()
+        invalidate_habits()
         return new_habit
     except ValueError as e:
         logger.warning(f"Invalid habit data: {str(e)}")
@@ -78,6 +340,7 @@ def update_habit(habit_id: UUID, habit: HabitCreate, db: Session = Depends(get_d
         db_habit = repo.update_habit(habit_id, habit)
         if db_habit is None:
             raise HTTPException(status_code=404, detail="Habit not found")
+        invalidate_habits()
         return db_habit
     except ValueError as e:
         logger.warning(f"Invalid habit data for update: {str(e)}")
@@ -91,29 +354,102 @@ def delete_habit(habit_id: UUID, db: Session = Depends(get_db)):
     repo = HabitRepository(db)
     if not repo.delete_habit(habit_id):
         raise HTTPException(status_code=404, detail="Habit not found")
+    invalidate_habits()
     return {"status": "success"}
 
 @app.get("/habits/due", response_model=List[HabitWithLog])
-def get_due_habits(date: str, db: Session = Depends(get_db)):
-    try:
-        parsed_date = datetime.strptime(date, "%Y-%m-%d")
-    except ValueError:
-        raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD")
-    
-    repo = HabitLogRepository(db)
-    return repo.get_due_habits(parsed_date)
+def get_due_habits(date: str, request: Request, db: Session = Depends(get_read_db)):
+    return due_habits_response(request, parse_date(date), db)
 
 @app.get("/habits/due/today", response_model=List[HabitWithLog])
-def get_due_habits_today(db: Session = Depends(get_db)):
+def get_due_habits_today(request: Request, db: Session = Depends(get_read_db)):
+    return due_habits_response(request, today(), db)
+
+def due_habits_response(request: Request, date: datetime, db: Session):
     repo = HabitLogRepository(db)
-    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-    return repo.get_due_habits(today)
+    return habit_cache.response(
+        request,
+        (DUE, date.date().isoformat()),
+        lambda: serialize_due_habits(repo.get_due_habit_rows(date))
+    )
+
+# Longest range served by /habits/calendar, in days
+CALENDAR_MAX_DAYS = 366
+
+@app.get("/habits/calendar", response_model=HabitCalendar)
+def get_habit_calendar(
+    request: Request,
+    start: str = Query(alias="from"),
+    end: str = Query(alias="to"),
+    db: Session = Depends(get_read_db)
+):
+    start_date = parse_date(start).date()
+    end_date = parse_date(end).date()
+    if not 0 <= (end_date - start_date).days < CALENDAR_MAX_DAYS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"'to' must not be before 'from', and the range may span at most {CALENDAR_MAX_DAYS} days"
+        )
+
+    repo = HabitStatsRepository(db)
+    return habit_cache.response(
+        request,
+        (DUE, "calendar", start_date.isoformat(), end_date.isoformat()),
+        lambda: serialize_habit_calendar(repo.get_calendar(start_date, end_date))
+    )
+
+@app.get("/habits/stats", response_model=List[HabitStats])
+def get_habit_stats(request: Request, db: Session = Depends(get_read_db)):
+    now = datetime.now()
+    repo = HabitStatsRepository(db)
+    return habit_cache.response(
+        request,
+        (STATS, now.date().isoformat()),
+        lambda: serialize_habit_stats(repo.get_stats(now))
+    )
+
+@app.get("/habits/{habit_id}/stats", response_model=HabitStats)
+def get_habit_stats_for_habit(habit_id: UUID, db: Session = Depends(get_read_db)):
+    stats = HabitStatsRepository(db).get_stats(datetime.now(), str(habit_id))
+    if not stats:
+        raise HTTPException(status_code=404, detail="Habit not found")
+    return stats[0]
+
+def timer_and_sound_rows() -> Tuple[List[dict], List[dict]]:
+    db = timer_database.read_session()
+    try:
+        return TimerRepository(db).get_timer_rows(), SoundRepository(db).get_sound_rows()
+    finally:
+        db.close()
+
+@app.get("/dashboard")
+async def get_dashboard(request: Request):
+    """Today's due habits, the habit list, timers, active timers and sounds in one response"""
+    day = today()
+    # One worker thread per database file, so neither waits for the other
+    (habits, due), (timers, sounds) = await asyncio.gather(
+        run_in_threadpool(cached_habit_lists, day),
+        run_in_threadpool(timer_and_sound_rows),
+    )
+    # The habit lists are already encoded in the response cache; splice them in rather than decode them
+    body = b"".join((
+        b'{"date":', dumps(day.date().isoformat()),
+        b',"due":', due,
+        b',"habits":', habits,
+        b',"timers":', dumps(timers),
+        b',"active_timers":', dumps(timer_manager.get_active_timers()),
+        b',"sounds":', dumps(sounds),
+        b"}",
+    ))
+    # ETag from the body, so an unchanged dashboard costs the client a 304
+    return CachedResponse(body).response(request)
 
 @app.put("/habits/check/{log_id}")
 def complete_habit(log_id: UUID, db: Session = Depends(get_db)):
     repo = HabitLogRepository(db)
     if not repo.complete_habit_log(log_id):
         raise HTTPException(status_code=404, detail="Habit log not found")
+    invalidate_logs()
     return {"status": "success"}
 
 @app.put("/habits/uncheck/{log_id}")
@@ -121,7 +457,26 @@ def uncomplete_habit(log_id: UUID, db: Session = Depends(get_db)):
     repo = HabitLogRepository(db)
     if not repo.uncomplete_habit_log(log_id):
         raise HTTPException(status_code=404, detail="Habit log not found")
+    invalidate_logs()
     return {"status": "success"}
 
+@app.post("/habits/check", response_model=BulkResult)
+def complete_habits(payload: HabitLogBulkUpdate, db: Session = Depends(get_db)):
+    return set_logs_completed(payload.log_ids, True, db)
+
+@app.post("/habits/uncheck", response_model=BulkResult)
+def uncomplete_habits(payload: HabitLogBulkUpdate, db: Session = Depends(get_db)):
+    return set_logs_completed(payload.log_ids, False, db)
+
+def set_logs_completed(log_ids: List[UUID], completed: bool, db: Session) -> BulkResult:
+    logger.info(f"Marking {len(log_ids)} habit logs as {'completed' if completed else 'not completed'}")
+    found = HabitLogRepository(db).set_logs_completed(log_ids, completed)
+    invalidate_logs()
+    # One result per requested ID, in order, repeated IDs included
+    return BulkResult(results=[
+        BulkItemResult(id=log_id, status="success" if found[str(log_id)] else "not_found")
+        for log_id in log_ids
+    ])
+
 # Include the timer router
 app.include_router(timer_router, prefix="/timer", tags=["timer"]) 
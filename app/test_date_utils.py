@@ -0,0 +1,18 @@
+import pytest
+
+from utils.date_utils import DAY, MONTH, Recurrence, compile_recurrence
+
+@pytest.mark.parametrize("recurrence, compiled", [
+    ("7", Recurrence(7, DAY)),
+    ("day", Recurrence(1, DAY)),
+    ("2 weeks", Recurrence(14, DAY)),
+    ("month", Recurrence(1, MONTH)),
+    ("3 Months", Recurrence(3, MONTH)),
+])
+def test_compile_recurrence(recurrence, compiled):
+    assert compile_recurrence(recurrence) == compiled
+
+@pytest.mark.parametrize("recurrence", ["0", "-3", "0 days", "0 weeks", "0 months", "fortnight", ""])
+def test_invalid_recurrences_are_rejected(recurrence):
+    with pytest.raises(ValueError):
+        compile_recurrence(recurrence)
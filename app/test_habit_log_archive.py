@@ -0,0 +1,51 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from habits.database.migrations import MIGRATIONS
+from habits.database.models import Habit, HabitCompletions, HabitLogArchive
+from habits.repositories.habit_log_archive_repository import HabitLogArchiveRepository, mask_days
+from habits.repositories.habit_log_repository import HabitLogRepository
+from habits.slots import slot_log_id
+from utils.migrations import run_migrations
+
+HABIT_ID = "6f1c2a4e-0b3d-4c5e-8f7a-9b0c1d2e3f40"
+CREATED_AT = datetime(2024, 1, 1, 9, 30)
+
+def make_session(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'habits.db'}")
+    run_migrations(engine, MIGRATIONS)
+    db = sessionmaker(bind=engine)()
+    db.add(Habit(id=HABIT_ID, name="Read", recurrence="day", created_at=CREATED_AT))
+    db.commit()
+    return db
+
+def test_unchecking_an_archived_slot_keeps_the_rest_of_the_month(tmp_path):
+    db = make_session(tmp_path)
+    logs = HabitLogRepository(db)
+    archive = HabitLogArchiveRepository(db)
+
+    # Slots 1-10 fall due on January 2nd to 11th
+    logs.set_logs_completed([slot_log_id(HABIT_ID, index) for index in range(1, 11)], True)
+    assert archive.archive_logs(CREATED_AT + timedelta(days=31)) == 10
+
+    logs.set_logs_completed([slot_log_id(HABIT_ID, 3)], False)
+
+    row = db.query(HabitLogArchive).filter(HabitLogArchive.habit_id == HABIT_ID).one()
+    assert row.completed_count == 9
+    assert [day.day for day in mask_days(row.month, row.completed_mask)] == [2, 3, 5, 6, 7, 8, 9, 10, 11]
+    assert row.logged_count == 10
+    assert db.get(HabitCompletions, HABIT_ID).completed_count == 9
+
+def test_unchecking_an_unarchived_day_leaves_the_roll_up_alone(tmp_path):
+    db = make_session(tmp_path)
+    logs = HabitLogRepository(db)
+    archive = HabitLogArchiveRepository(db)
+
+    logs.set_logs_completed([slot_log_id(HABIT_ID, index) for index in range(1, 4)], True)
+    archive.archive_logs(CREATED_AT + timedelta(days=31))
+    logs.set_logs_completed([slot_log_id(HABIT_ID, 20)], False)
+
+    row = db.query(HabitLogArchive).filter(HabitLogArchive.habit_id == HABIT_ID).one()
+    assert (row.completed_mask, row.completed_count) == (0b1110, 3)
@@ -0,0 +1,18 @@
+import pytest
+
+from utils.http_cache import RangeNotSatisfiable, parse_range
+
+def test_byte_ranges():
+    assert parse_range("bytes=0-9", 100) == (0, 9)
+    assert parse_range("bytes=90-", 100) == (90, 99)
+    assert parse_range("bytes=-10", 100) == (90, 99)
+    assert parse_range("bytes=95-200", 100) == (95, 99)
+
+def test_ignored_ranges_serve_the_full_body():
+    for header in (None, "", "items=0-9", "bytes=0-9,20-29", "bytes=abc", "bytes=a-9", "bytes=9-0"):
+        assert parse_range(header, 100) is None
+
+@pytest.mark.parametrize("header", ["bytes=-0", "bytes=100-", "bytes=150-200"])
+def test_unsatisfiable_ranges(header):
+    with pytest.raises(RangeNotSatisfiable):
+        parse_range(header, 100)
@@ -0,0 +1,16 @@
+import logging
+
+from utils.logging import RateLimitFilter
+
+def make_record(level: int, message: str, *args) -> logging.LogRecord:
+    return logging.LogRecord("habits", level, "habits/repositories/habit_repository.py", 42, message, args, None)
+
+def test_info_records_are_never_rate_limited():
+    rate_limit = RateLimitFilter(limit=20, window=60)
+    passed = [rate_limit.filter(make_record(logging.INFO, "Created habit with ID: %s", i)) for i in range(25)]
+    assert all(passed)
+
+def test_repeated_errors_are_rate_limited():
+    rate_limit = RateLimitFilter(limit=20, window=60)
+    passed = [rate_limit.filter(make_record(logging.ERROR, "WebSocket error: %s", i)) for i in range(25)]
+    assert passed.count(True) == 20
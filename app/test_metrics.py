@@ -0,0 +1,15 @@
+from utils.metrics import Metrics
+
+def test_large_counters_keep_every_digit():
+    metrics = Metrics()
+    metrics.increment("x", 1234567)
+    first = metrics.render()
+    metrics.increment("x", 3)
+    assert first == "x 1234567\n"
+    assert metrics.render() == "x 1234570\n"
+
+def test_large_summary_sums_keep_every_digit():
+    metrics = Metrics()
+    metrics.observe("y", 1234567.5)
+    metrics.observe("y", 0.25)
+    assert metrics.render() == "y_count 2\ny_sum 1234567.75\n"
@@ -0,0 +1,47 @@
+import uuid
+import wave
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from habits.cache import habit_cache
+from timer.database.database import SessionLocal as TimerSessionLocal
+from timer.repositories.sound_repository import SoundRepository
+from utils.query_stats import query_budget
+
+@pytest.fixture(scope="module")
+def client():
+    with TestClient(main.app) as client:
+        yield client
+
+def test_due_today_runs_two_statements(client):
+    habits = "".join(
+        f'{{"id":"{uuid.uuid4()}","name":"Habit {i}","recurrence":"day","created_at":"2026-01-01T08:00:00"}}\n'
+        for i in range(20)
+    )
+    response = client.post("/habits/import", content=habits, headers={"Content-Type": "application/x-ndjson"})
+    assert response.status_code == 200
+
+    habit_cache.clear()
+    with query_budget(2):
+        response = client.get("/habits/due/today")
+    assert response.status_code == 200
+    assert len(response.json()) == 20
+
+def test_sound_sync_runs_three_statements(client, tmp_path):
+    for i in range(20):
+        with wave.open(str(tmp_path / f"sound{i}.wav"), "wb") as f:
+            f.setnchannels(1)
+            f.setsampwidth(2)
+            f.setframerate(8000)
+            f.writeframes(b"\0\0" * 800)
+
+    db = TimerSessionLocal()
+    try:
+        with query_budget(3, commits=1):
+            sounds = SoundRepository(db).sync_sounds_directory(str(tmp_path))
+    finally:
+        db.close()
+    assert len(sounds) == 20
+    assert all(sound.duration == pytest.approx(0.1) for sound in sounds)
@@ -0,0 +1,22 @@
+from datetime import datetime, timedelta
+
+from habits.slots import parse_slot_log_id, slot_in_range, slot_log_id
+from utils.date_utils import compile_recurrence
+
+HABIT_ID = "6f1c2a4e-0b3d-4c5e-8f7a-9b0c1d2e3f40"
+
+def test_slot_log_ids_round_trip():
+    assert parse_slot_log_id(slot_log_id(HABIT_ID, 300)) == (HABIT_ID[:28], 300)
+    assert parse_slot_log_id(HABIT_ID[:28] + "not-hex!") is None
+
+def test_slots_beyond_the_horizon_are_out_of_range():
+    created_at = datetime.now() - timedelta(days=10)
+    daily = compile_recurrence("day")
+    _, largest = parse_slot_log_id(HABIT_ID[:28] + "ffffffff")
+
+    assert slot_in_range(created_at, daily, 1)
+    assert slot_in_range(created_at, daily, 10 + 365)
+    assert not slot_in_range(created_at, daily, 0)
+    assert not slot_in_range(created_at, daily, 10 + 400)
+    assert not slot_in_range(created_at, daily, largest)
+    assert not slot_in_range(created_at, compile_recurrence("month"), 100)
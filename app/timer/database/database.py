@@ -1,27 +1,32 @@
-from sqlalchemy import create_engine
+import os
+
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
 from sqlalchemy.orm import Session
 from utils.logging import setup_logger
+from utils.storage import Database
 
 logger = setup_logger(__name__)
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./timer.db"
+SQLALCHEMY_DATABASE_URL = os.environ.get("TIMER_DATABASE_URL", "sqlite:///./timer.db")
 
-logger.info(f"Initializing timer database connection: {SQLALCHEMY_DATABASE_URL}")
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, 
-    connect_args={"check_same_thread": False}  # Needed for SQLite
-)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Engines are created by the first session, not at import
+database = Database(SQLALCHEMY_DATABASE_URL)
+SessionLocal = database.session
+ReadSessionLocal = database.read_session
 
 Base = declarative_base()
 
 def get_db():
-    logger.debug("Creating new timer database session")
     db = SessionLocal()
     try:
         yield db
     finally:
-        logger.debug("Closing timer database session")
-        db.close() 
\ No newline at end of file
+        db.close()
+
+def get_read_db():
+    """Session on the read-only pool, for handlers that never write"""
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
@@ -0,0 +1,66 @@
+from sqlalchemy.engine import Connection
+
+from utils.migrations import Migration, column_names
+
+def create_tables(conn: Connection):
+    conn.exec_driver_sql("""
+        CREATE TABLE IF NOT EXISTS sounds (
+            id VARCHAR NOT NULL,
+            name VARCHAR NOT NULL,
+            file VARCHAR NOT NULL,
+            PRIMARY KEY (id)
+        )
+    """)
+    conn.exec_driver_sql("""
+        CREATE TABLE IF NOT EXISTS timers (
+            id VARCHAR NOT NULL,
+            name VARCHAR NOT NULL,
+            duration INTEGER NOT NULL,
+            sound_id VARCHAR,
+            PRIMARY KEY (id),
+            FOREIGN KEY(sound_id) REFERENCES sounds (id)
+        )
+    """)
+
+SOUND_METADATA_COLUMNS = [
+    ("fingerprint", "VARCHAR"),
+    ("size_bytes", "INTEGER"),
+    ("duration", "FLOAT"),
+    ("sample_rate", "INTEGER"),
+    ("channels", "INTEGER"),
+    ("codec", "VARCHAR"),
+    ("checksum", "VARCHAR"),
+]
+
+def sound_metadata(conn: Connection):
+    existing = column_names(conn, "sounds")
+    for name, column_type in SOUND_METADATA_COLUMNS:
+        if name not in existing:
+            conn.exec_driver_sql(f"ALTER TABLE sounds ADD COLUMN {name} {column_type}")
+
+def lookup_indexes(conn: Connection):
+    # Sync matches files on disk to sounds by path
+    conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_sounds_file ON sounds (file)")
+    conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_timers_sound_id ON timers (sound_id)")
+
+def timer_events(conn: Connection):
+    conn.exec_driver_sql("""
+        CREATE TABLE IF NOT EXISTS timer_events (
+            id INTEGER NOT NULL,
+            timer_id VARCHAR NOT NULL,
+            event VARCHAR NOT NULL,
+            at DATETIME NOT NULL,
+            remaining FLOAT NOT NULL,
+            focused FLOAT NOT NULL DEFAULT 0,
+            PRIMARY KEY (id)
+        )
+    """)
+    conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_timer_events_timer_id ON timer_events (timer_id, at, focused)")
+    conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_timer_events_at ON timer_events (at, focused, timer_id)")
+
+MIGRATIONS = [
+    Migration(1, "create sounds and timers", create_tables),
+    Migration(2, "sound metadata columns", sound_metadata),
+    Migration(3, "sound file and timer sound indexes", lookup_indexes),
+    Migration(4, "timer_events history table", timer_events),
+]
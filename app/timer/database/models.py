@@ -7,8 +7,11 @@ import enum
 # This file is kept for backward compatibility but doesn't define any models
 from timer.database.database import Base
 
-# We'll leave this here for reference
+# Transitions recorded in the timer_events table
 class TimerStatus(enum.Enum):
     STARTED = "started"
     PAUSED = "paused"
-    ENDED = "ended" 
\ No newline at end of file
+    RESUMED = "resumed"
+    STOPPED = "stopped"
+    FINISHED = "finished"
+ 
\ No newline at end of file
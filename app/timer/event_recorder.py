@@ -0,0 +1,115 @@
+"""
+Buffered writer of the timer event history.
+
+TimerManager records every transition with record(), which only appends to
+an in-memory buffer, so the tick loop and command handlers never wait on
+SQLite. A background task writes the buffer in one transaction per batch on
+a worker thread: every TIMER_EVENT_FLUSH_SECONDS, or as soon as
+TIMER_EVENT_BATCH_SIZE events are waiting. stop() writes what is left.
+
+The stored history can trail the live timers by up to one flush interval,
+and events still buffered when the process dies are lost. While writes fail
+the events are kept and retried, up to TIMER_EVENT_BUFFER_MAX; beyond that
+the oldest are dropped.
+"""
+import asyncio
+import os
+from collections import deque
+from datetime import datetime
+from itertools import chain
+from typing import Deque, List, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from timer.database.database import SessionLocal
+from timer.database.models import TimerStatus
+from timer.repositories.timer_event_repository import TimerEventRepository
+from utils.logging import setup_logger
+from utils.metrics import metrics
+
+logger = setup_logger(__name__)
+
+# Seconds between writes of the buffered events
+TIMER_EVENT_FLUSH_SECONDS = float(os.environ.get("TIMER_EVENT_FLUSH_SECONDS", "1"))
+
+# Write before the interval is up once this many events are waiting
+TIMER_EVENT_BATCH_SIZE = 500
+
+# Events held while writes fail; the oldest are dropped beyond this
+TIMER_EVENT_BUFFER_MAX = 10000
+
+metrics.describe("timer_events_dropped_total", "counter", "Timer events dropped because the history buffer was full")
+
+class TimerEventRecorder:
+    def __init__(self, interval: float = TIMER_EVENT_FLUSH_SECONDS):
+        self.interval = interval
+        self.buffer: Deque[dict] = deque(maxlen=TIMER_EVENT_BUFFER_MAX)
+        self.task: Optional[asyncio.Task] = None
+        self.wake: Optional[asyncio.Event] = None
+        self.stopping = False
+
+    def record(self, timer_id: str, event: TimerStatus, remaining: float, focused: float = 0.0):
+        """Queue one transition for writing; called on the event loop and never blocks"""
+        if len(self.buffer) == self.buffer.maxlen:
+            metrics.increment("timer_events_dropped_total")
+        self.buffer.append({
+            "timer_id": timer_id,
+            "event": event.value,
+            "at": datetime.utcnow(),
+            "remaining": remaining,
+            "focused": focused,
+        })
+        if len(self.buffer) >= TIMER_EVENT_BATCH_SIZE and self.wake is not None:
+            self.wake.set()
+
+    def start(self):
+        if self.task is None:
+            self.stopping = False
+            self.wake = asyncio.Event()
+            self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the writer once it has written everything recorded so far"""
+        if self.task is None:
+            return
+        self.stopping = True
+        self.wake.set()
+        await self.task
+        self.task = None
+        await self.flush()
+
+    async def _run(self):
+        while not self.stopping:
+            try:
+                await asyncio.wait_for(self.wake.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self.wake.clear()
+            await self.flush()
+
+    async def flush(self):
+        """Write the buffered events in one transaction, off the event loop"""
+        if not self.buffer:
+            return
+        # Taken on the loop thread, so no event is recorded into a batch being written
+        events = list(self.buffer)
+        self.buffer.clear()
+        try:
+            await run_in_threadpool(self.write, events)
+        except Exception as e:
+            logger.error(f"Could not write {len(events)} timer events, retrying with the next batch: {e}")
+            # Ahead of the events recorded meanwhile; the deque keeps the newest when that is too many
+            dropped = len(events) + len(self.buffer) - TIMER_EVENT_BUFFER_MAX
+            if dropped > 0:
+                metrics.increment("timer_events_dropped_total", dropped)
+            self.buffer = deque(chain(events, self.buffer), maxlen=TIMER_EVENT_BUFFER_MAX)
+
+    def write(self, events: List[dict]):
+        db = SessionLocal()
+        try:
+            TimerEventRepository(db).add_events(events)
+        finally:
+            db.close()
+
+# Create a global instance of the timer event recorder
+timer_event_recorder = TimerEventRecorder()
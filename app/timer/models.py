@@ -1,27 +1,47 @@
-from datetime import datetime
+from datetime import date, datetime
 from typing import Optional, List
 from uuid import UUID, uuid4
-from sqlalchemy import Column, String, Integer, ForeignKey, DateTime, Enum
+from sqlalchemy import Column, String, Integer, Float, ForeignKey, DateTime, Enum, Index
 from sqlalchemy.orm import relationship
 from pydantic import BaseModel
 
 from timer.database.database import Base
+from timer.sound_files import media_type_for
 
 # SQLAlchemy Models
 class SoundDB(Base):
     __tablename__ = "sounds"
-    __table_args__ = {'extend_existing': True}
+    __table_args__ = (
+        Index("ix_sounds_file", "file"),
+        {'extend_existing': True},
+    )
     
     id = Column(String, primary_key=True, default=lambda: str(uuid4()))
     name = Column(String, nullable=False)
     file = Column(String, nullable=False)
     
+    # Metadata index, refreshed by sync only when the fingerprint changes
+    fingerprint = Column(String, nullable=True)  # "<size>-<mtime_ns>"
+    size_bytes = Column(Integer, nullable=True)
+    duration = Column(Float, nullable=True)  # in seconds
+    sample_rate = Column(Integer, nullable=True)
+    channels = Column(Integer, nullable=True)
+    codec = Column(String, nullable=True)
+    checksum = Column(String, nullable=True)  # sha256 of the file contents
+    
     # Relationship - one sound can be used by many timers
     timers = relationship("TimerDB", back_populates="sound")
+    
+    @property
+    def media_type(self) -> str:
+        return media_type_for(self.file)
 
 class TimerDB(Base):
     __tablename__ = "timers"
-    __table_args__ = {'extend_existing': True}
+    __table_args__ = (
+        Index("ix_timers_sound_id", "sound_id"),
+        {'extend_existing': True},
+    )
     
     id = Column(String, primary_key=True, default=lambda: str(uuid4()))
     name = Column(String, nullable=False)
@@ -31,6 +51,24 @@ class TimerDB(Base):
     # Relationship - one timer has one sound
     sound = relationship("SoundDB", back_populates="timers")
 
+class TimerEventDB(Base):
+    """Append-only history of timer transitions; rows are never updated or deleted"""
+    __tablename__ = "timer_events"
+    __table_args__ = (
+        # Cover the focused-time sums, per timer and per period
+        Index("ix_timer_events_timer_id", "timer_id", "at", "focused"),
+        Index("ix_timer_events_at", "at", "focused", "timer_id"),
+        {'extend_existing': True},
+    )
+
+    id = Column(Integer, primary_key=True)
+    # No foreign key: history outlives deleted timers
+    timer_id = Column(String, nullable=False)
+    event = Column(String, nullable=False)  # a TimerStatus value
+    at = Column(DateTime, nullable=False)  # UTC
+    remaining = Column(Float, nullable=False)  # seconds left on the timer at the transition
+    focused = Column(Float, nullable=False, default=0)  # seconds of the run this transition ended, if the timer was running
+
 # Pydantic Models for API
 class SoundBase(BaseModel):
     name: str
@@ -38,9 +76,15 @@ class SoundBase(BaseModel):
 
 class Sound(SoundBase):
     id: UUID
+    media_type: str
+    size_bytes: Optional[int] = None
+    duration: Optional[float] = None
+    sample_rate: Optional[int] = None
+    channels: Optional[int] = None
+    codec: Optional[str] = None
+    checksum: Optional[str] = None
     
     class Config:
-        orm_mode = True
         from_attributes = True
 
 class TimerBase(BaseModel):
@@ -55,5 +99,33 @@ class Timer(TimerBase):
     id: UUID
     
     class Config:
-        orm_mode = True
-        from_attributes = True 
\ No newline at end of file
+        from_attributes = True 
+
+class TimerEvent(BaseModel):
+    id: int
+    timer_id: UUID
+    event: str
+    at: datetime
+    remaining: float
+    focused: float
+
+    class Config:
+        from_attributes = True
+
+class TimerFocus(BaseModel):
+    timer_id: UUID
+    name: Optional[str] = None  # None once the timer is deleted
+    focused: float  # seconds
+    runs: int  # runs ended by a pause, stop, finish or restart
+
+class DayFocus(BaseModel):
+    date: date
+    focused: float  # seconds
+
+class TimerStats(BaseModel):
+    """Focused time from `start` to `end`, inclusive, in local days"""
+    start: date
+    end: date
+    focused: float
+    timers: List[TimerFocus]
+    days: List[DayFocus]
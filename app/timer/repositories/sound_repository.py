@@ -1,10 +1,14 @@
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 import os
+from concurrent.futures import ProcessPoolExecutor
 from uuid import UUID
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 from utils.logging import setup_logger
 from timer.models import SoundDB
+from timer.sound_files import media_type_for
+from timer.sound_metadata import extract_sound_metadata, file_fingerprint
 
 logger = setup_logger(__name__)
 
@@ -17,14 +21,25 @@ class SoundRepository:
         logger.debug("Fetching all sounds")
         return self.db.query(SoundDB).all()
 
+    def get_sound_rows(self) -> List[dict]:
+        """All sounds as plain dicts, projected in the query without loading ORM objects"""
+        rows = []
+        for row in self.db.execute(select(
+                SoundDB.id, SoundDB.name, SoundDB.file, SoundDB.size_bytes, SoundDB.duration,
+                SoundDB.sample_rate, SoundDB.channels, SoundDB.codec, SoundDB.checksum)).mappings():
+            sound = dict(row)
+            sound["media_type"] = media_type_for(sound["file"])
+            rows.append(sound)
+        return rows
+
     def get_sound(self, sound_id: UUID) -> Optional[SoundDB]:
         """Get a specific sound by ID"""
-        logger.debug(f"Fetching sound with ID: {sound_id}")
+        logger.debug("Fetching sound with ID: %s", sound_id)
         return self.db.query(SoundDB).filter(SoundDB.id == str(sound_id)).first()
     
     def get_sound_by_file(self, file_path: str) -> Optional[SoundDB]:
         """Get a sound by file path"""
-        logger.debug(f"Fetching sound with file path: {file_path}")
+        logger.debug("Fetching sound with file path: %s", file_path)
         return self.db.query(SoundDB).filter(SoundDB.file == file_path).first()
 
     def create_sound(self, name: str, file_path: str) -> SoundDB:
@@ -50,6 +65,8 @@ class SoundRepository:
     def sync_sounds_directory(self, sounds_dir: str) -> List[SoundDB]:
         """
         Scan the sounds directory and ensure all files have corresponding records in the database.
+        Metadata is (re)extracted, in parallel worker processes, only for files that are new
+        or whose fingerprint changed since the last sync.
         Returns the list of all sounds in the database after the sync.
         """
         logger.info(f"Syncing sounds directory: {sounds_dir}")
@@ -59,24 +76,42 @@ class SoundRepository:
             logger.error(f"Sounds directory not found: {sounds_dir}")
             return []
         
-        sound_files = []
-        
         # Get all sound files in the directory
-        for file in os.listdir(sounds_dir):
-            if file.endswith(('.wav', '.aiff', '.mp3', '.ogg')):
-                sound_files.append(file)
+        sound_files = [
+            file for file in os.listdir(sounds_dir)
+            if file.endswith(('.wav', '.aiff', '.mp3', '.ogg'))
+        ]
         
-        # Ensure each file has a record in the database
+        existing = {sound.file: sound for sound in self.get_sounds()}
+        
+        stale = []
         for file in sound_files:
             file_path = os.path.join(sounds_dir, file)
-            # Use the file stem (filename without extension) as the name
-            name = os.path.splitext(file)[0]
-            
-            # Check if a sound with this file already exists
-            existing_sound = self.get_sound_by_file(file_path)
-            if not existing_sound:
-                # Create a new sound record
-                self.create_sound(name, file_path)
+            sound = existing.get(file_path)
+            if sound is None:
+                # Use the file stem (filename without extension) as the name
+                sound = SoundDB(name=os.path.splitext(file)[0], file=file_path)
+                self.db.add(sound)
+                existing[file_path] = sound
+            if sound.fingerprint != file_fingerprint(os.stat(file_path)):
+                stale.append(sound)
+        
+        if stale:
+            logger.info(f"Extracting metadata for {len(stale)} new or changed sound files")
+            for sound, metadata in zip(stale, self._extract_metadata([sound.file for sound in stale])):
+                for key, value in metadata.items():
+                    setattr(sound, key, value)
+        
+        self.db.commit()
         
         # Return all sounds after sync
-        return self.get_sounds() 
\ No newline at end of file
+        return self.get_sounds()
+
+    def _extract_metadata(self, paths: List[str]) -> List[Dict]:
+        """Extract metadata for the given files, using worker processes for batches"""
+        if len(paths) == 1:
+            return [extract_sound_metadata(paths[0])]
+        
+        workers = min(len(paths), os.cpu_count() or 1)
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(extract_sound_metadata, paths))
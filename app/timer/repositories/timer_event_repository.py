@@ -0,0 +1,83 @@
+from datetime import date, datetime, time, timedelta, timezone
+from typing import List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import func, insert, select, tuple_
+from sqlalchemy.orm import Session
+
+from timer.models import DayFocus, TimerDB, TimerEventDB, TimerFocus, TimerStats
+from utils.logging import setup_logger
+
+logger = setup_logger(__name__)
+
+def utc_range(start: date, end: date) -> Tuple[datetime, datetime]:
+    """The stored (naive UTC) datetimes bounding local days `start` through `end`"""
+    return tuple(
+        datetime.combine(day, time()).astimezone(timezone.utc).replace(tzinfo=None)
+        for day in (start, end + timedelta(days=1))
+    )
+
+class TimerEventRepository:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def add_events(self, events: List[dict]):
+        """Insert a batch of events in one transaction"""
+        logger.debug("Writing %s timer events", len(events))
+        self.db.execute(insert(TimerEventDB), events)
+        self.db.commit()
+
+    def get_events_page(
+        self,
+        timer_id: UUID,
+        limit: int,
+        after: Optional[Tuple[datetime, int]] = None
+    ) -> Tuple[List[TimerEventDB], Optional[Tuple[datetime, int]]]:
+        """One page of a timer's events ordered by (at, id), and the key to continue after"""
+        # Served in order by ix_timer_events_timer_id, whose rows end with the id
+        query = (self.db.query(TimerEventDB)
+                 .filter(TimerEventDB.timer_id == str(timer_id))
+                 .order_by(TimerEventDB.at, TimerEventDB.id))
+        if after is not None:
+            query = query.filter(tuple_(TimerEventDB.at, TimerEventDB.id) > tuple_(*after))
+        events = query.limit(limit + 1).all()
+        if len(events) > limit:
+            last = events[limit - 1]
+            return events[:limit], (last.at, last.id)
+        return events, None
+
+    def get_stats(self, start: date, end: date, timer_id: Optional[UUID] = None) -> TimerStats:
+        """Focused time per timer and per local day, of runs ended from `start` to `end` inclusive.
+
+        A run that crosses midnight counts towards the day it ended. Both sums
+        read only the covering indexes.
+        """
+        start_at, end_at = utc_range(start, end)
+        conditions = [TimerEventDB.at >= start_at, TimerEventDB.at < end_at, TimerEventDB.focused > 0]
+        if timer_id is not None:
+            conditions.append(TimerEventDB.timer_id == str(timer_id))
+
+        focused = func.sum(TimerEventDB.focused).label("focused")
+        timers = [
+            TimerFocus(timer_id=row.timer_id, name=row.name, focused=row.focused, runs=row.runs)
+            for row in self.db.execute(
+                select(TimerEventDB.timer_id, TimerDB.name, focused, func.count().label("runs"))
+                .outerjoin(TimerDB, TimerDB.id == TimerEventDB.timer_id)
+                .where(*conditions)
+                .group_by(TimerEventDB.timer_id)
+                .order_by(focused.desc())
+            )
+        ]
+
+        day = func.date(TimerEventDB.at, "localtime").label("day")
+        days = [
+            DayFocus(date=date.fromisoformat(row.day), focused=row.focused)
+            for row in self.db.execute(select(day, focused).where(*conditions).group_by(day).order_by(day))
+        ]
+        return TimerStats(
+            start=start,
+            end=end,
+            focused=sum(timer.focused for timer in timers),
+            timers=timers,
+            days=days,
+        )
@@ -1,7 +1,8 @@
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from datetime import datetime
 from uuid import UUID
-from typing import List, Optional
+from typing import List, Optional, Tuple
 
 from utils.logging import setup_logger
 from timer.models import TimerDB, TimerCreate
@@ -17,9 +18,25 @@ class TimerRepository:
         logger.debug("Fetching all timers")
         return self.db.query(TimerDB).all()
 
+    def get_timer_rows(self) -> List[dict]:
+        """All timers as plain dicts, projected in the query without loading ORM objects"""
+        return [dict(row) for row in
+                self.db.execute(select(TimerDB.id, TimerDB.name, TimerDB.duration, TimerDB.sound_id)).mappings()]
+
+    def get_timers_page(self, limit: int, after: Optional[str] = None) -> Tuple[List[TimerDB], Optional[Tuple[str]]]:
+        """One page of timers in ID order, and the key to continue after (None on the last page)"""
+        logger.debug("Fetching %s timers after %s", limit, after)
+        query = self.db.query(TimerDB).order_by(TimerDB.id)
+        if after is not None:
+            query = query.filter(TimerDB.id > after)
+        timers = query.limit(limit + 1).all()
+        if len(timers) > limit:
+            return timers[:limit], (timers[limit - 1].id,)
+        return timers, None
+
     def get_timer(self, timer_id: UUID) -> Optional[TimerDB]:
         """Get a specific timer by ID"""
-        logger.debug(f"Fetching timer with ID: {timer_id}")
+        logger.debug("Fetching timer with ID: %s", timer_id)
         return self.db.query(TimerDB).filter(TimerDB.id == str(timer_id)).first()
 
     def create_timer(self, timer: TimerCreate) -> TimerDB:
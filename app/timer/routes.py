@@ -2,43 +2,62 @@ from fastapi import APIRouter, Depends, HTTPException, WebSocket, WebSocketDisco
 from sqlalchemy.orm import Session
 from typing import List, Dict, Optional
 from uuid import UUID
+from datetime import date, datetime
 import json
 import os
-from starlette.responses import FileResponse
 from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
 from fastapi.responses import JSONResponse
 import subprocess
 import tempfile
 
-from timer.database.database import get_db
-from timer.models import Timer, TimerCreate, Sound
+from timer.database.database import ReadSessionLocal, SessionLocal, get_db, get_read_db
+from timer.models import Timer, TimerCreate, TimerEvent, TimerStats, Sound
 from timer.repositories.timer_repository import TimerRepository
+from timer.repositories.timer_event_repository import TimerEventRepository
 from timer.repositories.sound_repository import SoundRepository
 from timer.websocket_manager import timer_manager
+from timer.sound_files import media_type_for, file_fingerprint_etag, not_modified, sound_file_response
+from timer.sound_cache import sound_cache
+from utils.http_cache import make_etag
+from utils.json_response import JSONRowsResponse
+from utils.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, decode_cursor, page_headers
 from utils.logging import setup_logger
+from utils.profiling import PROFILE_HEADER, PROFILING, ProfiledRoute, profile, selected
+from utils.query_stats import DEBUG, track_queries
 
 logger = setup_logger(__name__)
 
-router = APIRouter()
+router = APIRouter(route_class=ProfiledRoute)
 
 # Sound routes
 @router.get("/sounds", response_model=List[Sound])
-async def get_sounds(db: Session = Depends(get_db)):
+async def get_sounds(db: Session = Depends(get_read_db)):
     """Get all sounds"""
     logger.info("Fetching all sounds")
     repo = SoundRepository(db)
-    return repo.get_sounds()
+    return JSONRowsResponse(repo.get_sound_rows())
 
 @router.get("/sounds/{sound_id}")
+# Registered separately so HEAD gets an operation ID of its own in the OpenAPI schema
+@router.head("/sounds/{sound_id}", operation_id="head_sound_file")
 async def get_sound_file(
     sound_id: UUID, 
+    request: Request,
     convert_format: Optional[str] = Query(None, description="Format to convert to (mp3, wav)"),
     db: Session = Depends(get_db)
 ):
     """Get a sound file by ID"""
     logger.info(f"Fetching sound file for ID: {sound_id}")
+    
+    # Serve from memory when possible: no database lookup and no disk access
+    cached_sound = sound_cache.get(str(sound_id))
+    if cached_sound is not None and not (convert_format and cached_sound.media_type == "audio/aiff"):
+        return cached_sound.response(request)
+    
     repo = SoundRepository(db)
-    sound = repo.get_sound(sound_id)
+    # In a worker thread: waiting on the session's connection here would block the event loop
+    sound = await run_in_threadpool(repo.get_sound, sound_id)
     
     if sound is None:
         raise HTTPException(
@@ -46,8 +65,8 @@ async def get_sound_file(
             detail=f"Sound with ID {sound_id} not found"
         )
     
-    # Check if the file exists
-    if not os.path.exists(sound.file):
+    # Check if the file exists; disk access also stays off the event loop
+    if not await run_in_threadpool(os.path.exists, sound.file):
         raise HTTPException(
             status_code=404,
             detail=f"Sound file {sound.file} not found"
@@ -55,22 +74,19 @@ async def get_sound_file(
     
     # Determine the correct media type based on file extension
     file_ext = os.path.splitext(sound.file)[1].lower()
-    media_type = "audio/mpeg"  # Default to MP3
-    
-    if file_ext == ".aiff" or file_ext == ".aif":
-        media_type = "audio/aiff"
-    elif file_ext == ".wav":
-        media_type = "audio/wav"
-    elif file_ext == ".ogg":
-        media_type = "audio/ogg"
-    elif file_ext == ".mp3":
-        media_type = "audio/mpeg"
+    media_type = media_type_for(sound.file)
     
     # Log the file and media type for debugging
     logger.info(f"Serving sound file: {sound.file} with media type: {media_type}")
     
     # Check if format conversion is requested
     if convert_format and file_ext in ['.aiff', '.aif'] and convert_format.lower() in ['mp3', 'wav']:
+        converted_etag = make_etag(await run_in_threadpool(file_fingerprint_etag, sound.file), convert_format.lower())
+        # Revalidation of a converted file never needs to run ffmpeg again
+        cached = not_modified(request, converted_etag)
+        if cached is not None:
+            return cached
+
         try:
             # Create a temporary file for the converted audio
             with tempfile.NamedTemporaryFile(suffix=f'.{convert_format.lower()}', delete=False) as tmp_file:
@@ -79,7 +95,8 @@ async def get_sound_file(
             try:
                 # Attempt to run ffmpeg to convert the file
                 logger.info(f"Converting {file_ext} to {convert_format} using ffmpeg")
-                subprocess.run(
+                await run_in_threadpool(
+                    subprocess.run,
                     ['ffmpeg', '-i', sound.file, '-y', tmp_path],
                     check=True,
                     stdout=subprocess.PIPE,
@@ -94,12 +111,16 @@ async def get_sound_file(
                 
                 # Return the converted file
                 logger.info(f"Serving converted sound file: {tmp_path} with media type: {media_type}")
-                return FileResponse(
+                response = await run_in_threadpool(
+                    sound_file_response,
+                    request,
                     tmp_path,
                     media_type=media_type,
                     filename=f"{os.path.splitext(os.path.basename(sound.file))[0]}.{convert_format.lower()}",
-                    background=BackgroundTask(lambda: os.unlink(tmp_path) if os.path.exists(tmp_path) else None)
+                    etag=converted_etag
                 )
+                response.background = BackgroundTask(lambda: os.unlink(tmp_path) if os.path.exists(tmp_path) else None)
+                return response
             except (subprocess.CalledProcessError, FileNotFoundError) as e:
                 logger.error(f"Failed to convert audio: {str(e)}")
                 # If conversion fails, fall back to original file
@@ -109,11 +130,9 @@ async def get_sound_file(
             # Fall back to original file
     
     # Return the original file if no conversion or conversion failed
-    return FileResponse(
-        sound.file,
-        media_type=media_type,
-        filename=os.path.basename(sound.file)
-    )
+    # A miss stats and reads the file (up to SOUND_CACHE_MAX_ENTRY_BYTES) in a worker thread
+    cached_sound = await run_in_threadpool(sound_cache.load, str(sound.id), sound.file)
+    return cached_sound.response(request)
 
 @router.patch("/sounds", response_model=List[Sound])
 async def sync_sounds(db: Session = Depends(get_db)):
@@ -129,19 +148,36 @@ async def sync_sounds(db: Session = Depends(get_db)):
             content={"detail": f"Sounds directory not found: {sounds_dir}"}
         )
     
-    sounds = repo.sync_sounds_directory(sounds_dir)
+    # Metadata extraction reads every changed file; keep it off the event loop
+    sounds = await run_in_threadpool(repo.sync_sounds_directory, sounds_dir)
+    # Files may have been replaced on disk; re-read them on next request
+    sound_cache.invalidate()
     return sounds
 
 # Timer routes
 @router.get("/", response_model=List[Timer])
-async def get_timers(db: Session = Depends(get_db)):
-    """Get all timer definitions"""
-    logger.info("Fetching all timers")
+async def get_timers(
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    db: Session = Depends(get_read_db)
+):
+    """Get all timer definitions, or one keyset page of them when limit or after is given"""
     repo = TimerRepository(db)
-    return repo.get_timers()
+    if limit is None and after is None:
+        logger.info("Fetching all timers")
+        return JSONRowsResponse(repo.get_timer_rows())
+
+    try:
+        after_id = decode_cursor(after, 1)[0] if after else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    timers, next_key = repo.get_timers_page(limit or DEFAULT_PAGE_SIZE, after_id)
+    response.headers.update(page_headers(next_key))
+    return timers
 
 @router.post("/", response_model=Timer)
-async def create_timer(timer: TimerCreate, db: Session = Depends(get_db)):
+def create_timer(timer: TimerCreate, db: Session = Depends(get_db)):
     """Create a new timer definition"""
     logger.info(f"Creating new timer: {timer.name}")
     repo = TimerRepository(db)
@@ -158,10 +194,48 @@ async def create_timer(timer: TimerCreate, db: Session = Depends(get_db)):
 @router.get("/active", response_model=Dict)
 async def get_active_timers():
     """Get all currently active timers"""
-    return timer_manager.get_active_timers()
+    return JSONRowsResponse(timer_manager.get_active_timers())
+
+# Longest range served by /timer/stats, in days
+STATS_MAX_DAYS = 366
+
+@router.get("/stats", response_model=TimerStats)
+def get_timer_stats(
+    start: date = Query(alias="from"),
+    end: date = Query(alias="to"),
+    timer_id: Optional[UUID] = None,
+    db: Session = Depends(get_read_db)
+):
+    """Focused time per timer and per day, from the timer history"""
+    if not 0 <= (end - start).days < STATS_MAX_DAYS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"'to' must not be before 'from', and the range may span at most {STATS_MAX_DAYS} days"
+        )
+    return TimerEventRepository(db).get_stats(start, end, timer_id)
+
+@router.get("/{timer_id}/events", response_model=List[TimerEvent])
+def get_timer_events(
+    timer_id: UUID,
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    db: Session = Depends(get_read_db)
+):
+    """One keyset page of a timer's recorded transitions, oldest first"""
+    after_key = None
+    if after:
+        try:
+            at, after_id = decode_cursor(after, 2)
+            after_key = (datetime.fromisoformat(at), int(after_id))
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    events, next_key = TimerEventRepository(db).get_events_page(timer_id, limit, after_key)
+    response.headers.update(page_headers(next_key))
+    return events
 
 @router.delete("/{timer_id}", response_model=Dict)
-async def delete_timer(timer_id: UUID, db: Session = Depends(get_db)):
+def delete_timer(timer_id: UUID, db: Session = Depends(get_db)):
     """Delete a timer by ID"""
     logger.info(f"Request to delete timer: {timer_id}")
     repo = TimerRepository(db)
@@ -176,7 +250,7 @@ async def delete_timer(timer_id: UUID, db: Session = Depends(get_db)):
     return {"message": f"Timer with ID {timer_id} deleted successfully"}
 
 @router.put("/{timer_id}", response_model=Timer)
-async def update_timer(timer_id: UUID, timer: TimerCreate, db: Session = Depends(get_db)):
+def update_timer(timer_id: UUID, timer: TimerCreate, db: Session = Depends(get_db)):
     """Update an existing timer"""
     logger.info(f"Updating timer: {timer_id}")
     repo = TimerRepository(db)
@@ -196,15 +270,73 @@ async def update_timer(timer_id: UUID, timer: TimerCreate, db: Session = Depends
             detail=str(e)
         )
 
+def load_timer(timer_id: str):
+    """Read a timer with a short-lived session; called in a worker thread"""
+    db = ReadSessionLocal()
+    try:
+        return TimerRepository(db).get_timer(UUID(timer_id))
+    finally:
+        db.close()
+
+def save_timer_duration(timer_id: str, duration: int):
+    """Store a timer's new duration with a short-lived session; called in a worker thread"""
+    db = SessionLocal()
+    try:
+        repo = TimerRepository(db)
+        timer = repo.get_timer(UUID(timer_id))
+        if timer:
+            repo.update_timer(UUID(timer_id), TimerCreate(name=timer.name, duration=duration, sound_id=timer.sound_id))
+    finally:
+        db.close()
+
+async def handle_timer_command(data: str, timer_id: str) -> str:
+    """Apply one command received on a timer WebSocket; returns its name for metrics"""
+    name = "invalid"
+    try:
+        command = json.loads(data)
+        action = command.get("action")
+        # Client-sent actions are not used as metric labels as-is, to bound the label set
+        name = action if action in ("start", "pause", "stop", "resume") else "set" if "set" in command else "unknown"
+    
+        if action == "start":
+            await timer_manager.start_timer(timer_id)
+        elif action == "pause":
+            await timer_manager.pause_timer(timer_id)
+        elif action == "stop":
+            await timer_manager.stop_timer(timer_id)
+        elif action == "resume":
+            await timer_manager.resume_timer(timer_id)
+        # Handle 'set' command for updating timer value
+        elif 'set' in command:
+            new_time = command.get('set')
+            if new_time and isinstance(new_time, str):
+                try:
+                    # Update timer value
+                    success = await timer_manager.set_timer_value(timer_id, new_time)
+                    timer_state = timer_manager.active_timers.get(timer_id)
+                    if success and timer_state:
+                        # If successful, also update in the database, off the event loop:
+                        # the writer may be held by a request whose teardown needs the loop
+                        await run_in_threadpool(save_timer_duration, timer_id, timer_state.duration)
+                except ValueError as e:
+                    logger.error(f"Error setting timer value: {e}")
+        else:
+            logger.warning(f"Unknown action: {action}")
+    except json.JSONDecodeError:
+        logger.warning(f"Invalid JSON received: {data}")
+    except Exception as e:
+        logger.error(f"Error processing command: {e}")
+    return name
+
 @router.websocket("/ws/{timer_id}")
-async def websocket_endpoint(websocket: WebSocket, timer_id: str, db: Session = Depends(get_db)):
+async def websocket_endpoint(websocket: WebSocket, timer_id: str):
     """WebSocket endpoint for timer updates"""
     await websocket.accept()
     
     try:
-        # Get timer from database
-        repo = TimerRepository(db)
-        timer = repo.get_timer(UUID(timer_id))
+        # Get timer from database; every lookup uses its own session in a worker thread,
+        # so an open socket never holds a connection or waits for one on the event loop
+        timer = await run_in_threadpool(load_timer, timer_id)
         if timer is None:
             await websocket.close(code=1000, reason="Timer not found")
             return
@@ -218,50 +350,24 @@ async def websocket_endpoint(websocket: WebSocket, timer_id: str, db: Session =
         # Ensure the update loop is running
         await timer_manager.start_update_loop()
         
+        # Commands are profiled when the socket was opened with the profiling header, or sampled
+        profile_header = websocket.headers.get(PROFILE_HEADER) if PROFILING else None
+
         # Listen for commands from the client
         while True:
             data = await websocket.receive_text()
-            try:
-                command = json.loads(data)
-                action = command.get("action")
-                
-                if action == "start":
-                    await timer_manager.start_timer(timer_id)
-                elif action == "pause":
-                    await timer_manager.pause_timer(timer_id)
-                elif action == "stop":
-                    await timer_manager.stop_timer(timer_id)
-                elif action == "resume":
-                    await timer_manager.resume_timer(timer_id)
-                # Handle 'set' command for updating timer value
-                elif 'set' in command:
-                    new_time = command.get('set')
-                    if new_time and isinstance(new_time, str):
-                        try:
-                            # Update timer value
-                            success = await timer_manager.set_timer_value(timer_id, new_time)
-                            if success:
-                                # If successful, also update in the database
-                                updated_timer = repo.get_timer(UUID(timer_id))
-                                if updated_timer:
-                                    # Get current timer state to get the new duration in seconds
-                                    timer_state = timer_manager.active_timers.get(timer_id)
-                                    if timer_state:
-                                        # Create a TimerCreate object with the current name and new duration
-                                        timer_update = TimerCreate(
-                                            name=updated_timer.name,
-                                            duration=timer_state.duration,
-                                            sound_id=updated_timer.sound_id
-                                        )
-                                        repo.update_timer(UUID(timer_id), timer_update)
-                        except ValueError as e:
-                            logger.error(f"Error setting timer value: {e}")
+            # Count the queries of each command, as the middleware does for HTTP requests
+            with track_queries() as stats:
+                if PROFILING and selected(profile_header):
+                    async with profile("websocket_endpoint") as capture:
+                        name = await handle_timer_command(data, timer_id)
+                        if capture is not None:
+                            capture.label = f"websocket_endpoint:{name}"
                 else:
-                    logger.warning(f"Unknown action: {action}")
-            except json.JSONDecodeError:
-                logger.warning(f"Invalid JSON received: {data}")
-            except Exception as e:
-                logger.error(f"Error processing command: {e}")
+                    name = await handle_timer_command(data, timer_id)
+            stats.record(f"websocket_endpoint:{name}")
+            if DEBUG:
+                logger.info("Timer command %s: %d queries, %d commits, %.2f ms", name, stats.queries, stats.commits, stats.seconds * 1000)
     
     except WebSocketDisconnect:
         # Client disconnected
@@ -0,0 +1,145 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from fastapi import Request
+from starlette.responses import Response
+
+from timer.sound_files import (
+    file_fingerprint_etag,
+    media_type_for,
+    not_modified,
+    requested_range,
+    sound_file_response,
+    validator_headers,
+)
+from utils.http_cache import RangeNotSatisfiable
+from utils.logging import setup_logger
+
+logger = setup_logger(__name__)
+
+# Total bytes of sound data kept in memory, and the largest single file cached.
+# Files above the entry limit are still indexed (path, ETag, headers) but their
+# bodies are streamed from disk.
+SOUND_CACHE_MAX_BYTES = int(os.environ.get("SOUND_CACHE_MAX_BYTES", 32 * 1024 * 1024))
+SOUND_CACHE_MAX_ENTRY_BYTES = int(os.environ.get("SOUND_CACHE_MAX_ENTRY_BYTES", 2 * 1024 * 1024))
+
+class MemoryViewResponse(Response):
+    """Response whose body is handed to the server as-is, without copying"""
+
+    def render(self, content) -> memoryview:
+        return memoryview(content)
+
+class CachedSound:
+    def __init__(self, sound_id: str, path: str, data: Optional[bytes], stat: os.stat_result):
+        self.sound_id = sound_id
+        self.path = path
+        self.media_type = media_type_for(path)
+        self.filename = os.path.basename(path)
+        self.size = stat.st_size
+        self.etag = file_fingerprint_etag(path, stat)
+        self.data = memoryview(data) if data is not None else None
+        self.headers = validator_headers(self.etag)
+        self.headers["Content-Disposition"] = f'inline; filename="{self.filename}"'
+
+    @property
+    def nbytes(self) -> int:
+        return self.data.nbytes if self.data is not None else 0
+
+    def response(self, request: Request) -> Response:
+        """Serve this sound without touching the database or, for resident files, the disk"""
+        cached = not_modified(request, self.etag)
+        if cached is not None:
+            return cached
+
+        if self.data is None:
+            # Too large to keep resident: stream it from disk
+            return sound_file_response(request, self.path, self.media_type, self.filename, etag=self.etag)
+
+        headers = dict(self.headers)
+        try:
+            byte_range = requested_range(request, self.etag, self.size)
+        except RangeNotSatisfiable:
+            headers["Content-Range"] = f"bytes */{self.size}"
+            return Response(status_code=416, headers=headers)
+
+        if byte_range is None:
+            status_code, body = 200, self.data
+        else:
+            start, end = byte_range
+            status_code, body = 206, self.data[start:end + 1]
+            headers["Content-Range"] = f"bytes {start}-{end}/{self.size}"
+        headers["Content-Length"] = str(body.nbytes)
+
+        if request.method == "HEAD":
+            return Response(status_code=status_code, headers=headers, media_type=self.media_type)
+        return MemoryViewResponse(body, status_code=status_code, headers=headers, media_type=self.media_type)
+
+class SoundCache:
+    """Size-bounded LRU cache of sound file bytes and their response headers.
+
+    Entries are keyed by sound ID and are only dropped by eviction or an
+    explicit invalidate(), e.g. after the sounds directory is synced.
+    """
+
+    def __init__(self, max_bytes: int = SOUND_CACHE_MAX_BYTES, max_entry_bytes: int = SOUND_CACHE_MAX_ENTRY_BYTES):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.total_bytes = 0
+        self._entries: "OrderedDict[str, CachedSound]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, sound_id: str) -> Optional[CachedSound]:
+        with self._lock:
+            entry = self._entries.get(sound_id)
+            if entry is not None:
+                self._entries.move_to_end(sound_id)
+            return entry
+
+    def load(self, sound_id: str, path: str) -> CachedSound:
+        """Read a sound file from disk and add it to the cache"""
+        stat = os.stat(path)
+        data = None
+        if stat.st_size <= min(self.max_entry_bytes, self.max_bytes):
+            with open(path, "rb") as f:
+                data = f.read()
+        entry = CachedSound(sound_id, path, data, stat)
+
+        with self._lock:
+            previous = self._entries.pop(sound_id, None)
+            if previous is not None:
+                self.total_bytes -= previous.nbytes
+            self._entries[sound_id] = entry
+            self.total_bytes += entry.nbytes
+            self._evict()
+
+        logger.debug("Cached sound %s (%s bytes resident)", sound_id, entry.nbytes)
+        return entry
+
+    def invalidate(self, sound_id: Optional[str] = None):
+        """Drop one sound, or every sound when no ID is given"""
+        with self._lock:
+            if sound_id is None:
+                self._entries.clear()
+                self.total_bytes = 0
+                return
+            entry = self._entries.pop(sound_id, None)
+            if entry is not None:
+                self.total_bytes -= entry.nbytes
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "total_bytes": self.total_bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+    def _evict(self):
+        while self.total_bytes > self.max_bytes and self._entries:
+            _, evicted = self._entries.popitem(last=False)
+            self.total_bytes -= evicted.nbytes
+
+# Create a global instance of the sound cache
+sound_cache = SoundCache()
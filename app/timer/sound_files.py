@@ -0,0 +1,116 @@
+import os
+from typing import Iterator, Optional
+
+from fastapi import Request
+from starlette.responses import FileResponse, Response, StreamingResponse
+
+from utils.http_cache import (
+    IMMUTABLE_CACHE_CONTROL,
+    RangeNotSatisfiable,
+    etag_matches,
+    make_etag,
+    parse_range,
+)
+from utils.logging import setup_logger
+
+logger = setup_logger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+
+MEDIA_TYPES = {
+    ".aiff": "audio/aiff",
+    ".aif": "audio/aiff",
+    ".wav": "audio/wav",
+    ".ogg": "audio/ogg",
+    ".mp3": "audio/mpeg",
+}
+
+def media_type_for(path: str) -> str:
+    """Determine the media type of a sound file from its extension"""
+    file_ext = os.path.splitext(path)[1].lower()
+    return MEDIA_TYPES.get(file_ext, "audio/mpeg")  # Default to MP3
+
+def file_fingerprint_etag(path: str, stat: Optional[os.stat_result] = None) -> str:
+    """Strong ETag from the file's identity, size and modification time"""
+    if stat is None:
+        stat = os.stat(path)
+    return make_etag(path, stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+def validator_headers(etag: str) -> dict:
+    """Headers shared by every sound response, including 304s"""
+    return {
+        "ETag": etag,
+        "Cache-Control": IMMUTABLE_CACHE_CONTROL,
+        "Accept-Ranges": "bytes",
+    }
+
+def not_modified(request: Request, etag: str) -> Optional[Response]:
+    """Return a 304 response if the client already holds this representation"""
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=validator_headers(etag))
+    return None
+
+def requested_range(request: Request, etag: str, size: int):
+    """Resolve the Range header, honouring If-Range against the current ETag"""
+    if_range = request.headers.get("if-range")
+    if if_range and if_range.strip() != etag:
+        return None
+    return parse_range(request.headers.get("range"), size)
+
+def _iter_file(path: str, start: int, length: int) -> Iterator[bytes]:
+    with open(path, "rb") as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+def sound_file_response(
+    request: Request,
+    path: str,
+    media_type: str,
+    filename: str,
+    etag: Optional[str] = None,
+) -> Response:
+    """Serve a sound file with ETag validation, immutable caching and byte ranges"""
+    stat = os.stat(path)
+    if etag is None:
+        etag = file_fingerprint_etag(path, stat)
+
+    cached = not_modified(request, etag)
+    if cached is not None:
+        return cached
+
+    size = stat.st_size
+    headers = validator_headers(etag)
+    headers["Content-Disposition"] = f'inline; filename="{filename}"'
+
+    try:
+        byte_range = requested_range(request, etag, size)
+    except RangeNotSatisfiable:
+        headers["Content-Range"] = f"bytes */{size}"
+        return Response(status_code=416, headers=headers)
+
+    if byte_range is None:
+        status_code, start, length = 200, 0, size
+    else:
+        start, end = byte_range
+        status_code, length = 206, end - start + 1
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(length)
+
+    if request.method == "HEAD":
+        return Response(status_code=status_code, headers=headers, media_type=media_type)
+
+    if byte_range is None and "range" not in request.headers:
+        # Whole file: lets the server use sendfile where it supports it
+        return FileResponse(path, headers=headers, media_type=media_type, stat_result=stat)
+
+    return StreamingResponse(
+        _iter_file(path, start, length),
+        status_code=status_code,
+        headers=headers,
+        media_type=media_type,
+    )
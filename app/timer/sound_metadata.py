@@ -0,0 +1,119 @@
+import hashlib
+import json
+import math
+import os
+import struct
+import subprocess
+import wave
+from typing import Dict, Optional
+
+from timer.sound_files import CHUNK_SIZE
+
+def file_fingerprint(stat: os.stat_result) -> str:
+    """Cheap change detector for a sound file: size and modification time"""
+    return f"{stat.st_size}-{stat.st_mtime_ns}"
+
+def file_checksum(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _wav_metadata(path: str) -> Dict:
+    with wave.open(path, "rb") as w:
+        frames = w.getnframes()
+        rate = w.getframerate()
+        return {
+            "duration": frames / rate if rate else None,
+            "sample_rate": rate,
+            "channels": w.getnchannels(),
+            "codec": f"pcm_s{w.getsampwidth() * 8}le",
+        }
+
+def _read_extended(data: bytes) -> float:
+    """Decode an 80-bit IEEE 754 extended float (AIFF sample rate)"""
+    exponent, mantissa = struct.unpack(">HQ", data)
+    sign = -1 if exponent & 0x8000 else 1
+    exponent &= 0x7FFF
+    if exponent == 0 and mantissa == 0:
+        return 0.0
+    return sign * math.ldexp(mantissa, exponent - 16383 - 63)
+
+def _aiff_metadata(path: str) -> Dict:
+    with open(path, "rb") as f:
+        form, _, kind = struct.unpack(">4sI4s", f.read(12))
+        if form != b"FORM" or kind not in (b"AIFF", b"AIFC"):
+            raise ValueError("Not an AIFF file")
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                raise ValueError("AIFF file has no COMM chunk")
+            chunk_id, chunk_size = struct.unpack(">4sI", header)
+            if chunk_id != b"COMM":
+                f.seek(chunk_size + (chunk_size & 1), os.SEEK_CUR)
+                continue
+            comm = f.read(chunk_size)
+            channels, frames, sample_size = struct.unpack(">hIh", comm[:8])
+            rate = _read_extended(comm[8:18])
+            codec = f"pcm_s{sample_size}be"
+            if kind == b"AIFC" and len(comm) >= 22:
+                codec = comm[18:22].decode("ascii", "replace").strip().lower()
+            return {
+                "duration": frames / rate if rate else None,
+                "sample_rate": int(rate),
+                "channels": channels,
+                "codec": codec,
+            }
+
+def _ffprobe_metadata(path: str) -> Dict:
+    result = subprocess.run(
+        ["ffprobe", "-v", "error", "-select_streams", "a:0",
+         "-show_entries", "stream=codec_name,sample_rate,channels:format=duration",
+         "-of", "json", path],
+        check=True,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+    probe = json.loads(result.stdout)
+    stream = (probe.get("streams") or [{}])[0]
+    duration = probe.get("format", {}).get("duration")
+    sample_rate = stream.get("sample_rate")
+    return {
+        "duration": float(duration) if duration else None,
+        "sample_rate": int(sample_rate) if sample_rate else None,
+        "channels": stream.get("channels"),
+        "codec": stream.get("codec_name"),
+    }
+
+def extract_sound_metadata(path: str) -> Dict[str, Optional[object]]:
+    """Extract size, checksum, fingerprint and audio properties of a sound file.
+
+    WAV and AIFF headers are parsed directly; other formats are probed with
+    ffprobe when it is installed. Audio properties that cannot be determined
+    are left as None. Runs in worker processes, so it must stay picklable.
+    """
+    stat = os.stat(path)
+    metadata = {
+        "size_bytes": stat.st_size,
+        "fingerprint": file_fingerprint(stat),
+        "checksum": file_checksum(path),
+        "duration": None,
+        "sample_rate": None,
+        "channels": None,
+        "codec": None,
+    }
+
+    file_ext = os.path.splitext(path)[1].lower()
+    try:
+        if file_ext == ".wav":
+            metadata.update(_wav_metadata(path))
+        elif file_ext in (".aiff", ".aif"):
+            metadata.update(_aiff_metadata(path))
+        else:
+            metadata.update(_ffprobe_metadata(path))
+    except (wave.Error, ValueError, struct.error, EOFError, OSError, subprocess.CalledProcessError):
+        # Unsupported encoding or ffprobe missing: keep what we could compute
+        pass
+
+    return metadata
@@ -7,6 +7,8 @@ from uuid import UUID
 from fastapi import WebSocket, WebSocketDisconnect
 import os
 
+from timer.database.models import TimerStatus
+from timer.event_recorder import timer_event_recorder
 from utils.logging import setup_logger
 logger = setup_logger(__name__)
 
@@ -21,6 +23,7 @@ class TimerState:
         self.start_time: Optional[datetime] = None
         self.pause_time: Optional[datetime] = None
         self.sound_id = sound_id  # Sound ID for when timer finishes
+        self.run_remaining = float(duration)  # Remaining time when the current run started or resumed
     
     def seconds_to_hhmmss(self, seconds: int) -> str:
         """Convert seconds to HHmmss format"""
@@ -39,6 +42,10 @@ class TimerState:
         
         return hours * 3600 + minutes * 60 + seconds
     
+    def remaining_at(self, now: datetime) -> float:
+        """Remaining time of a rolling timer at `now`"""
+        return max(0, self.duration - (now - self.start_time).total_seconds())
+    
     def to_dict(self):
         return {
             "timer_id": self.timer_id,
@@ -60,6 +67,16 @@ class TimerManager:
         if self.update_task is None:
             self.update_task = asyncio.create_task(self._update_timers())
     
+    async def stop_update_loop(self):
+        """Cancel the background update task"""
+        if self.update_task is not None:
+            self.update_task.cancel()
+            try:
+                await self.update_task
+            except asyncio.CancelledError:
+                pass
+            self.update_task = None
+    
     async def _update_timers(self):
         """Background task that updates timer states and notifies subscribers"""
         while True:
@@ -76,6 +93,7 @@ class TimerManager:
                             # Status was rolling and now it's finished, so play sound
                             timer.status = "finished"
                             timer.remaining = 0
+                            self._record(timer, TimerStatus.FINISHED, timer.run_remaining)
                             
                             # Include sound_id in the notification to signal to the client
                             # that a sound should be played
@@ -90,7 +108,7 @@ class TimerManager:
                 
                 await asyncio.sleep(1)  # Update every second
             except Exception as e:
-                logger.error(f"Error in timer update loop: {e}")
+                logger.error("Error in timer update loop: %s", e)
                 await asyncio.sleep(1)  # Continue even if there's an error
     
     async def register_timer(self, timer_id: str, name: str, duration: int, sound_id: Optional[str] = None) -> TimerState:
@@ -123,12 +141,16 @@ class TimerManager:
             raise ValueError(f"Timer {timer_id} not found")
         
         timer = self.active_timers[timer_id]
-        if timer.status == "stopped":
-            # Starting from the beginning
-            timer.remaining = timer.duration
+        now = datetime.utcnow()
+        # Starting again while running ends the current run
+        focused = timer.run_remaining - timer.remaining_at(now) if timer.status == "rolling" else 0.0
+        # The update loop counts down from the full duration after any start
+        timer.remaining = timer.duration
         
         timer.status = "rolling"
-        timer.start_time = datetime.utcnow()
+        timer.start_time = now
+        timer.run_remaining = timer.duration
+        self._record(timer, TimerStatus.STARTED, focused)
         await self._notify_subscribers(timer_id)
     
     async def pause_timer(self, timer_id: str):
@@ -145,6 +167,7 @@ class TimerManager:
         # Calculate remaining time at pause
         elapsed = (timer.pause_time - timer.start_time).total_seconds()
         timer.remaining = max(0, timer.duration - elapsed)
+        self._record(timer, TimerStatus.PAUSED, timer.run_remaining - timer.remaining)
         await self._notify_subscribers(timer_id)
     
     async def stop_timer(self, timer_id: str):
@@ -153,6 +176,12 @@ class TimerManager:
             raise ValueError(f"Timer {timer_id} not found")
         
         timer = self.active_timers[timer_id]
+        if timer.status == "rolling":
+            timer.remaining = timer.remaining_at(datetime.utcnow())
+            focused = timer.run_remaining - timer.remaining
+        else:
+            focused = 0.0
+        self._record(timer, TimerStatus.STOPPED, focused)
         timer.status = "stopped"  # Explicitly set as stopped, not finished
         timer.remaining = timer.duration  # Reset to full duration
         await self._notify_subscribers(timer_id)
@@ -174,10 +203,16 @@ class TimerManager:
         current_time = datetime.utcnow()
         time_already_spent = timer.duration - timer.remaining
         timer.start_time = current_time - timedelta(seconds=time_already_spent)
+        timer.run_remaining = timer.remaining
+        self._record(timer, TimerStatus.RESUMED)
         
         # Notify subscribers about the state change
         await self._notify_subscribers(timer_id)
     
+    def _record(self, timer: TimerState, event: TimerStatus, focused: float = 0.0):
+        """Add a transition to the timer history; `focused` is the length of the run it ended"""
+        timer_event_recorder.record(timer.timer_id, event, timer.remaining, focused)
+    
     async def _notify_subscribers(self, timer_id: str, play_sound: bool = False):
         """Notify all subscribers to a timer about its current state"""
         if timer_id not in self.active_timers:
@@ -199,7 +234,8 @@ class TimerManager:
             try:
                 await self._notify_subscriber(timer_id, websocket, timer_data)
             except Exception as e:
-                logger.error(f"Error notifying subscriber: {e}")
+                # Rate-limited per call site, so a dead socket does not flood the log every tick
+                logger.warning("Dropping subscriber of timer %s: %s", timer_id, e)
                 dead_sockets.add(websocket)
         
         # Clean up dead sockets
@@ -212,13 +248,10 @@ class TimerManager:
             return
         
         timer = self.active_timers[timer_id]
-        try:
-            if timer_data is None:
-                timer_data = timer.to_dict()
-            await websocket.send_json(timer_data)
-        except Exception as e:
-            logger.error(f"Failed to send update to subscriber: {e}")
-            raise
+        if timer_data is None:
+            timer_data = timer.to_dict()
+        # Failures are logged by the caller
+        await websocket.send_json(timer_data)
     
     def get_active_timers(self):
         """Get all active timers"""
@@ -0,0 +1,17 @@
+from typing import Iterable, Iterator, List, TypeVar
+
+T = TypeVar("T")
+
+# Keeps IN (...) lists and multi-row inserts well below SQLite's bound-parameter limit
+BULK_CHUNK_SIZE = 500
+
+def chunked(items: Iterable[T], size: int) -> Iterator[List[T]]:
+    """Split an iterable into lists of at most `size` items"""
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
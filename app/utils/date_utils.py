@@ -1,13 +1,115 @@
-from datetime import timedelta, datetime, time
+from datetime import timedelta, datetime, date
+from functools import lru_cache
+from typing import NamedTuple, Union
 import re
 
+import numpy as np
+
+DAY = "day"
+MONTH = "month"
+
+# Days per unit; weeks are compiled to days
+UNIT_DAYS = {
+    'day': 1,
+    'week': 7,
+}
+
+# Average month length, only used where a month must be expressed as a timedelta
+AVERAGE_MONTH_DAYS = 30.44
+
+INVALID_RECURRENCE_MESSAGE = (
+    "Invalid recurrence format. Valid formats: '7', '7 days', 'day', '1 day', 'week', '2 weeks', 'month', '2 months'"
+)
+
+RECURRENCE_PATTERN = re.compile(r"^(\d+)?\s*(day|days|week|weeks|month|months)$")
+
+# Offset that makes (days since 1970-01-01) % 7 count from Monday, as date.weekday() does
+EPOCH_WEEKDAY = 3
+
 def end_of_day(dt: datetime) -> datetime:
     """Convert a datetime to the end of that day (23:59:59)"""
     return dt.replace(hour=23, minute=59, second=59, microsecond=999999)
 
-def parse_recurrence(recurrence: str) -> timedelta:
-    """Convert a recurrence string to a timedelta object.
-    
+def as_date(value: Union[date, datetime]) -> date:
+    return value.date() if isinstance(value, datetime) else value
+
+def to_day(value: Union[date, datetime]) -> np.datetime64:
+    return np.datetime64(as_date(value), "D")
+
+class Recurrence(NamedTuple):
+    """A compiled recurrence: every `amount` days or every `amount` calendar months.
+
+    Occurrence N (N >= 0) of a recurrence anchored at `start` falls on the day
+    N periods after start. Calendar months keep start's day of the month,
+    clipped to the last day of shorter months (Jan 31 -> Feb 28 -> Mar 31).
+    All methods accept NumPy arrays of indices or days and work on them in one
+    vectorized pass.
+    """
+    amount: int
+    unit: str
+
+    @property
+    def period(self) -> timedelta:
+        """Length of one period; approximate for calendar months"""
+        if self.unit == MONTH:
+            return timedelta(days=round(self.amount * AVERAGE_MONTH_DAYS))
+        return timedelta(days=self.amount)
+
+    def days(self, start: Union[date, datetime], indices) -> np.ndarray:
+        """Days (datetime64[D]) of the given occurrence indices"""
+        start_day = to_day(start)
+        indices = np.asarray(indices, dtype=np.int64)
+        if self.unit == DAY:
+            return start_day + indices * self.amount
+
+        start_month = start_day.astype("datetime64[M]")
+        day_of_month = (start_day - start_month.astype("datetime64[D]")).astype(np.int64)
+        months = start_month + indices * self.amount
+        first_days = months.astype("datetime64[D]")
+        month_lengths = ((months + 1).astype("datetime64[D]") - first_days).astype(np.int64)
+        return first_days + np.minimum(day_of_month, month_lengths - 1)
+
+    def day(self, start: Union[date, datetime], index: int) -> date:
+        if self.unit == DAY:
+            # Scalar fast path; NumPy only pays off on arrays
+            return as_date(start) + timedelta(days=self.amount * index)
+        return self.days(start, index).item()
+
+    def weekdays(self, start: Union[date, datetime], indices) -> np.ndarray:
+        """Weekday (Monday = 0) of each occurrence index"""
+        return (self.days(start, indices).astype(np.int64) + EPOCH_WEEKDAY) % 7
+
+    def indices_at(self, start: Union[date, datetime], days) -> np.ndarray:
+        """Index of the latest occurrence on or before each day (0 before start)"""
+        start_day = to_day(start)
+        days = np.asarray(days, dtype="datetime64[D]")
+        if self.unit == DAY:
+            return np.maximum((days - start_day).astype(np.int64) // self.amount, 0)
+
+        elapsed_months = (days.astype("datetime64[M]") - start_day.astype("datetime64[M]")).astype(np.int64)
+        indices = np.maximum(elapsed_months // self.amount, 0)
+        # Within the month of an occurrence, the days before it still belong to the previous one
+        return np.maximum(indices - (self.days(start_day, indices) > days), 0)
+
+    def index_at(self, start: Union[date, datetime], day: Union[date, datetime]) -> int:
+        if self.unit == DAY:
+            return max(0, (as_date(day) - as_date(start)).days // self.amount)
+        return int(self.indices_at(start, to_day(day)))
+
+    def due_dates(self, start: datetime, since: datetime, until: datetime) -> np.ndarray:
+        """End-of-day instants (datetime64[us]) of every occurrence after start due in (since, until]"""
+        first = max(1, self.index_at(start, since) + 1)
+        last = self.index_at(start, until)
+        if last < first:
+            return np.array([], dtype="datetime64[us]")
+        days = self.days(start, np.arange(first, last + 1))
+        # Occurrences are due at the end of their day
+        return (days + 1).astype("datetime64[us]") - np.timedelta64(1, "us")
+
+@lru_cache(maxsize=1024)
+def compile_recurrence(recurrence: str) -> Recurrence:
+    """Compile a recurrence string once; later calls with the same string are cache hits.
+
     Accepts formats like:
     - "7" or "7 days"
     - "day" or "1 day"
@@ -17,33 +119,24 @@ def parse_recurrence(recurrence: str) -> timedelta:
     """
     # First try to parse as an integer (days)
     try:
-        days = int(recurrence)
-        return timedelta(days=days)
+        amount, unit = int(recurrence), DAY
     except ValueError:
-        pass
-
-    # Handle single unit strings (day, week, month)
-    unit_mapping = {
-        'day': 1,
-        'week': 7,
-        'month': 30.44  # approximate
-    }
-    
-    recurrence = recurrence.lower().strip()
-    if recurrence in unit_mapping:
-        return timedelta(days=unit_mapping[recurrence])
-
-    # Parse string format with numbers
-    pattern = r"^(\d+)?\s*(day|days|week|weeks|month|months)$"
-    match = re.match(pattern, recurrence)
-    
-    if not match:
-        raise ValueError(
-            "Invalid recurrence format. Valid formats: '7', '7 days', 'day', '1 day', 'week', '2 weeks', 'month', '2 months'"
-        )
-    
-    amount = int(match.group(1) or 1)  # Default to 1 if no number specified
-    unit = match.group(2).rstrip('s')  # Remove 's' to match unit_mapping
-    
-    days = amount * unit_mapping[unit]
-    return timedelta(days=round(days)) 
\ No newline at end of file
+        match = RECURRENCE_PATTERN.match(recurrence.lower().strip())
+        if not match:
+            raise ValueError(INVALID_RECURRENCE_MESSAGE)
+        amount = int(match.group(1) or 1)  # Default to 1 if no number specified
+        unit = match.group(2).rstrip('s')
+
+    # A recurrence must move forward; "0" or "-3" would never fall due again
+    if amount < 1:
+        raise ValueError(INVALID_RECURRENCE_MESSAGE)
+    if unit == MONTH:
+        return Recurrence(amount, MONTH)
+    return Recurrence(amount * UNIT_DAYS[unit], DAY)
+
+def parse_recurrence(recurrence: str) -> timedelta:
+    """Convert a recurrence string to a timedelta object (months are approximate).
+
+    Prefer compile_recurrence, which keeps calendar months exact.
+    """
+    return compile_recurrence(recurrence).period
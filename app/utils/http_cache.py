@@ -0,0 +1,80 @@
+import hashlib
+from typing import Optional, Tuple
+
+# Sound files are addressed by a stable ID and re-validated through their ETag,
+# so browsers can keep them for a year without asking again.
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+def make_etag(*parts) -> str:
+    """Build a strong, quoted ETag from the given fingerprint parts"""
+    digest = hashlib.sha1()
+    for part in parts:
+        if not isinstance(part, (bytes, bytearray, memoryview)):
+            part = str(part).encode("utf-8")
+        digest.update(part)
+        digest.update(b"\x00")
+    return f'"{digest.hexdigest()}"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Check an If-None-Match header value against an ETag.
+
+    Uses the weak comparison required for If-None-Match, so `W/"x"` matches `"x"`.
+    """
+    if not if_none_match:
+        return False
+
+    if if_none_match.strip() == "*":
+        return True
+
+    bare_etag = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == bare_etag:
+            return True
+    return False
+
+class RangeNotSatisfiable(ValueError):
+    """Raised when a Range header cannot be served for the given resource size"""
+
+def parse_range(range_header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """Parse a single `bytes=` Range header into an inclusive (start, end) pair.
+
+    Returns None when the header is absent or should be ignored (other units,
+    multiple ranges, malformed values), in which case the full body is served.
+    Raises RangeNotSatisfiable when the range lies outside the resource.
+    """
+    if not range_header:
+        return None
+
+    unit, _, ranges = range_header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in ranges:
+        return None
+
+    start_str, sep, end_str = ranges.strip().partition("-")
+    if not sep:
+        return None
+
+    try:
+        if start_str == "":
+            suffix = int(end_str)
+        else:
+            start = int(start_str)
+            end = int(end_str) if end_str else size - 1
+    except ValueError:
+        return None
+
+    if start_str == "":
+        # Suffix range: the last N bytes
+        if suffix <= 0:
+            raise RangeNotSatisfiable(range_header)
+        start = max(0, size - suffix)
+        end = size - 1
+
+    if start >= size:
+        raise RangeNotSatisfiable(range_header)
+    if start > end:
+        return None
+
+    return start, min(end, size - 1)
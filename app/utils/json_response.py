@@ -0,0 +1,26 @@
+"""
+Fast JSON for rows read straight from the database.
+
+List endpoints project columns into plain dicts in their queries and encode
+them with orjson, instead of building ORM objects, validating them against
+the response model and encoding them again. The data is trusted: it was
+validated on the way in. Handlers that return a JSONRowsResponse skip
+FastAPI's response_model validation; keep response_model on the route so the
+OpenAPI schema still describes the payload.
+
+orjson writes UUIDs, dates and naive datetimes in the same format as
+Pydantic, so the output matches the validated path.
+"""
+from typing import Any
+
+import orjson
+from starlette.responses import Response
+
+def dumps(content: Any) -> bytes:
+    return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+class JSONRowsResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
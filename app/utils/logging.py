@@ -1,25 +1,171 @@
+"""
+Application logging.
+
+Loggers hand records to a bounded in-memory queue; a background listener
+thread formats and writes them, so request handlers and the event loop never
+wait on stdout. When the queue is full, records are dropped and counted
+instead of blocking.
+
+Configured from the environment:
+
+- LOG_LEVEL: default level, INFO unless set
+- LOG_LEVELS: per-module overrides, e.g. "habits.repositories=DEBUG,timer=WARNING";
+  the longest matching module prefix wins
+- LOG_FORMAT: "text" (default) or "json", one JSON object per line
+- LOG_RATE_LIMIT / LOG_RATE_WINDOW: at most LOG_RATE_LIMIT warnings and errors
+  per call site every LOG_RATE_WINDOW seconds; the rest are counted and
+  reported with the next record let through. Lower levels are never limited
+
+Hot paths should pass arguments instead of f-strings
+(logger.debug("Fetched %s", key)), so disabled levels cost no formatting.
+"""
+import atexit
+import json
 import logging
+import os
+import queue
 import sys
-from datetime import datetime
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional, Tuple
+
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+LOG_LEVELS = os.environ.get("LOG_LEVELS", "")
+LOG_FORMAT = os.environ.get("LOG_FORMAT", "text").lower()
+LOG_QUEUE_SIZE = int(os.environ.get("LOG_QUEUE_SIZE", "10000"))
+LOG_RATE_LIMIT = int(os.environ.get("LOG_RATE_LIMIT", "20"))
+LOG_RATE_WINDOW = float(os.environ.get("LOG_RATE_WINDOW", "60"))
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+def parse_levels(spec: str) -> Dict[str, str]:
+    levels = {}
+    for item in spec.split(","):
+        module, _, level = item.partition("=")
+        if module.strip() and level.strip():
+            levels[module.strip()] = level.strip().upper()
+    return levels
+
+MODULE_LEVELS = parse_levels(LOG_LEVELS)
+
+def level_for(name: str) -> str:
+    """Level of a logger: the override of the longest module prefix of its name, or LOG_LEVEL"""
+    matches = [module for module in MODULE_LEVELS if name == module or name.startswith(module + ".")]
+    return MODULE_LEVELS[max(matches, key=len)] if matches else LOG_LEVEL
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+class RateLimitFilter(logging.Filter):
+    """Let through at most `limit` warnings and errors per call site in each `window` seconds.
+
+    Repetitive errors (a dead websocket on every tick, a failing background
+    loop) would otherwise flood the output. The first record through after a
+    suppressed stretch reports how many were skipped. INFO and DEBUG records
+    are distinct events (one per created habit, say) and always pass.
+    """
+
+    def __init__(self, limit: int, window: float):
+        super().__init__()
+        self.limit = limit
+        self.window = window
+        self.lock = threading.Lock()
+        # call site -> (window start, records let through, records suppressed)
+        self.sites: Dict[Tuple[str, int], Tuple[float, int, int]] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.limit <= 0 or record.levelno < logging.WARNING:
+            return True
+        key = (record.pathname, record.lineno)
+        now = time.monotonic()
+        with self.lock:
+            started, passed, suppressed = self.sites.get(key, (now, 0, 0))
+            if now - started >= self.window:
+                started, passed = now, 0
+            if passed >= self.limit:
+                self.sites[key] = (started, passed, suppressed + 1)
+                return False
+            self.sites[key] = (started, passed + 1, 0)
+        if suppressed:
+            record.msg = f"{record.msg} ({suppressed} similar messages suppressed)"
+        return True
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler that drops records instead of blocking when the queue is full.
+
+    The queue is a SimpleQueue, which is cheaper to put to than queue.Queue;
+    its size bound is checked before each put and may be exceeded slightly
+    under concurrency.
+    """
+
+    def __init__(self, log_queue: queue.SimpleQueue, max_size: int):
+        super().__init__(log_queue)
+        self.max_size = max_size
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Only this handler sees the record, so it is updated in place rather than copied
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        if self.queue.qsize() >= self.max_size:
+            self.dropped += 1
+            return
+        self.queue.put_nowait(record)
+
+_handler: Optional[DroppingQueueHandler] = None
+_listener: Optional[QueueListener] = None
+_lock = threading.Lock()
+
+def get_handler() -> DroppingQueueHandler:
+    """The shared queue handler, starting its listener thread on first use"""
+    global _handler, _listener
+    with _lock:
+        if _handler is None:
+            output = logging.StreamHandler(sys.stdout)
+            output.setFormatter(JsonFormatter() if LOG_FORMAT == "json" else logging.Formatter(TEXT_FORMAT))
+            log_queue = queue.SimpleQueue()
+            _handler = DroppingQueueHandler(log_queue, LOG_QUEUE_SIZE)
+            _handler.addFilter(RateLimitFilter(LOG_RATE_LIMIT, LOG_RATE_WINDOW))
+            _listener = QueueListener(log_queue, output, respect_handler_level=True)
+            _listener.start()
+            atexit.register(stop_logging)
+        return _handler
+
+def stop_logging():
+    """Flush queued records and stop the listener thread"""
+    global _listener
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+            if _handler is not None and _handler.dropped:
+                sys.stdout.write(f"{_handler.dropped} log records dropped: log queue full\n")
 
-# Configure logging format
 def setup_logger(name):
     logger = logging.getLogger(name)
-    
+
     if not logger.handlers:  # Prevent duplicate handlers
-        logger.setLevel(logging.DEBUG)
-        
-        # Create console handler
-        handler = logging.StreamHandler(sys.stdout)
-        handler.setLevel(logging.DEBUG)
-        
-        # Create formatter
-        formatter = logging.Formatter(
-            '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-        )
-        handler.setFormatter(formatter)
-        
-        # Add handler to logger
-        logger.addHandler(handler)
-    
-    return logger 
\ No newline at end of file
+        logger.setLevel(level_for(name))
+        logger.addHandler(get_handler())
+        # Records are written once, by the listener, even if the root logger has handlers
+        logger.propagate = False
+
+    return logger
@@ -0,0 +1,136 @@
+"""
+Event loop blocking watchdog.
+
+A heartbeat task stamps the time every LOOP_BLOCK_MS / 4 on the event loop,
+and a monitor thread checks the stamp. When it is older than LOOP_BLOCK_MS,
+something is running on the loop without yielding: a sync database call,
+file access or a subprocess in an async handler. The monitor then captures
+the loop thread's stack and attributes the block to its call site: the
+innermost frame in the app's own code.
+
+Each block is logged at WARNING, with the stack only the first time its call
+site is seen, and counted in the metrics as event_loop_blocks_total and event_loop_block_seconds,
+labelled by call site. The sites seen most often are logged at shutdown.
+
+LOOP_BLOCK_MS=0 disables the watchdog.
+"""
+import asyncio
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import Counter
+from typing import Optional
+
+from utils.logging import setup_logger
+from utils.metrics import metrics
+
+logger = setup_logger(__name__)
+
+# Report the loop as blocked once a callback runs this long without yielding; 0 disables the watchdog
+LOOP_BLOCK_MS = float(os.environ.get("LOOP_BLOCK_MS", "100"))
+
+# Innermost frames of a blocked stack written to the log
+LOOP_BLOCK_STACK_DEPTH = 15
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Frames of these files wrap every request; a block is attributed to the code they call
+MIDDLEWARE_FILES = {
+    os.path.join(APP_DIR, "utils", name) for name in ("loop_watchdog.py", "query_stats.py", "profiling.py")
+}
+
+metrics.describe("event_loop_blocks_total", "counter", f"Times the event loop was blocked for over {LOOP_BLOCK_MS:g} ms")
+metrics.describe("event_loop_block_seconds", "summary", "How long the event loop stayed blocked")
+
+def call_site(frame) -> str:
+    """`path:line function` of the innermost app frame of a stack, or of its innermost frame"""
+    innermost = frame
+    while frame is not None:
+        path = frame.f_code.co_filename
+        if path.startswith(APP_DIR) and path not in MIDDLEWARE_FILES:
+            return f"{os.path.relpath(path, APP_DIR)}:{frame.f_lineno} {frame.f_code.co_name}"
+        frame = frame.f_back
+    if innermost is None:
+        return "unknown"
+    return f"{innermost.f_code.co_filename}:{innermost.f_lineno} {innermost.f_code.co_name}"
+
+class LoopWatchdog:
+    def __init__(self, threshold: float = LOOP_BLOCK_MS / 1000):
+        self.threshold = threshold
+        self.interval = threshold / 4
+        self.beat = time.monotonic()
+        self.sites: Counter = Counter()
+        self.task: Optional[asyncio.Task] = None
+        self.thread: Optional[threading.Thread] = None
+        self.stopping = threading.Event()
+        self.loop_thread_id: Optional[int] = None
+
+    def start(self):
+        """Start the heartbeat on the running loop and the monitor thread"""
+        if self.threshold <= 0 or self.task is not None:
+            return
+        self.loop_thread_id = threading.get_ident()
+        self.beat = time.monotonic()
+        self.stopping.clear()
+        self.task = asyncio.create_task(self._heartbeat())
+        self.thread = threading.Thread(target=self._monitor, name="loop-watchdog", daemon=True)
+        self.thread.start()
+
+    async def stop(self):
+        if self.task is None:
+            return
+        self.stopping.set()
+        self.task.cancel()
+        try:
+            await self.task
+        except asyncio.CancelledError:
+            pass
+        self.task = None
+        self.thread.join()
+        self.thread = None
+        if self.sites:
+            worst = ", ".join(f"{site} ({count}x)" for site, count in self.sites.most_common(5))
+            logger.warning(f"Event loop blocked {sum(self.sites.values())} times; most often at {worst}")
+
+    async def _heartbeat(self):
+        while True:
+            self.beat = time.monotonic()
+            await asyncio.sleep(self.interval)
+
+    def _monitor(self):
+        blocked_since: Optional[float] = None  # the heartbeat stamp a reported block started from
+        site = None
+        while not self.stopping.wait(self.interval):
+            beat = self.beat
+            if blocked_since is not None and beat != blocked_since:
+                # The loop got to run again: the block lasted from the missed beat until now, roughly
+                seconds = beat - blocked_since - self.interval
+                metrics.observe("event_loop_block_seconds", seconds, site=site)
+                logger.debug("Event loop was blocked for %.0f ms at %s", seconds * 1000, site)
+                blocked_since = None
+            if blocked_since is None and time.monotonic() - beat > self.threshold:
+                frame = sys._current_frames().get(self.loop_thread_id)
+                if frame is None:
+                    continue
+                blocked_since = beat
+                site = call_site(frame)
+                first_seen = site not in self.sites
+                stack = "".join(traceback.format_stack(frame, LOOP_BLOCK_STACK_DEPTH)) if first_seen else None
+                del frame
+                self.sites[site] += 1
+                metrics.increment("event_loop_blocks_total", site=site)
+                if first_seen:
+                    logger.warning(
+                        "Event loop blocked for over %.0f ms at %s\n%s",
+                        self.threshold * 1000, site, stack
+                    )
+                else:
+                    logger.warning(
+                        "Event loop blocked for over %.0f ms at %s (%d times so far)",
+                        self.threshold * 1000, site, self.sites[site]
+                    )
+
+# Create a global instance of the watchdog
+loop_watchdog = LoopWatchdog()
@@ -0,0 +1,81 @@
+"""
+In-process metrics, served in the Prometheus text format at /metrics.
+
+Counters only go up; summaries keep a count and a sum per label set, so a
+scraper can derive rates and averages. Like the response cache, values live
+in the worker process: each uvicorn worker reports its own.
+"""
+import threading
+from typing import Dict, Tuple
+
+LabelSet = Tuple[Tuple[str, str], ...]
+
+def escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def format_labels(labels: LabelSet) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{escape_label(value)}"' for name, value in labels) + "}"
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._help: Dict[str, Tuple[str, str]] = {}
+        self._counters: Dict[Tuple[str, LabelSet], float] = {}
+        self._summaries: Dict[Tuple[str, LabelSet], Tuple[int, float]] = {}
+
+    def describe(self, name: str, kind: str, text: str):
+        """Register the TYPE ("counter" or "summary") and HELP line of a metric"""
+        self._help[name] = (kind, text)
+
+    def increment(self, name: str, value: float = 1, **labels: str):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels: str):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            count, total = self._summaries.get(key, (0, 0.0))
+            self._summaries[key] = (count + 1, total + value)
+
+    def snapshot(self) -> Dict[str, float]:
+        """Every current sample, keyed by its exposition name; summaries as _count and _sum"""
+        with self._lock:
+            samples = {f"{name}{format_labels(labels)}": value for (name, labels), value in self._counters.items()}
+            for (name, labels), (count, total) in self._summaries.items():
+                samples[f"{name}_count{format_labels(labels)}"] = count
+                samples[f"{name}_sum{format_labels(labels)}"] = total
+        return samples
+
+    def render(self) -> str:
+        with self._lock:
+            counters = sorted(self._counters.items())
+            summaries = sorted(self._summaries.items())
+        lines = []
+        described = set()
+
+        def header(name: str):
+            if name not in described and name in self._help:
+                kind, text = self._help[name]
+                lines.append(f"# HELP {name} {text}")
+                lines.append(f"# TYPE {name} {kind}")
+            described.add(name)
+
+        for (name, labels), value in counters:
+            header(name)
+            # Every digit is kept; a rounded total stops moving once it is large
+            lines.append(f"{name}{format_labels(labels)} {value}")
+        for (name, labels), (count, total) in summaries:
+            header(name)
+            lines.append(f"{name}_count{format_labels(labels)} {count}")
+            lines.append(f"{name}_sum{format_labels(labels)} {total}")
+        return "\n".join(lines) + "\n"
+
+    def clear(self):
+        with self._lock:
+            self._counters.clear()
+            self._summaries.clear()
+
+metrics = Metrics()
@@ -0,0 +1,44 @@
+from typing import Callable, List, NamedTuple
+
+from sqlalchemy.engine import Connection, Engine
+
+from utils.logging import setup_logger
+
+logger = setup_logger(__name__)
+
+class Migration(NamedTuple):
+    version: int
+    description: str
+    upgrade: Callable[[Connection], None]
+
+def get_schema_version(engine: Engine) -> int:
+    """Read the schema version stored in the SQLite header (PRAGMA user_version)"""
+    with engine.connect() as conn:
+        return conn.exec_driver_sql("PRAGMA user_version").scalar()
+
+def run_migrations(engine: Engine, migrations: List[Migration]) -> int:
+    """Apply every migration newer than the database's schema version, in order.
+
+    SQLite commits DDL eagerly, so migrations must be idempotent (IF NOT EXISTS,
+    column checks) to be safely re-run after an interrupted upgrade.
+    Returns the resulting schema version.
+    """
+    current = get_schema_version(engine)
+    latest = migrations[-1].version if migrations else 0
+    if current >= latest:
+        logger.debug(f"Schema of {engine.url} is up to date (version {current})")
+        return current
+
+    for migration in migrations:
+        if migration.version <= current:
+            continue
+        logger.info(f"Migrating {engine.url} to version {migration.version}: {migration.description}")
+        with engine.begin() as conn:
+            migration.upgrade(conn)
+            conn.exec_driver_sql(f"PRAGMA user_version = {int(migration.version)}")
+        current = migration.version
+
+    return current
+
+def column_names(conn: Connection, table: str) -> List[str]:
+    return [row[1] for row in conn.exec_driver_sql(f'PRAGMA table_info("{table}")')]
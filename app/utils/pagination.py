@@ -0,0 +1,52 @@
+"""
+Keyset pagination cursors and NDJSON streaming.
+
+A page is requested with `limit` and an optional `after` cursor. The cursor is
+an opaque, URL-safe encoding of the sort key of the last row served; the next
+page starts strictly after it, so pages stay stable under concurrent inserts
+and every page costs one index range scan, however deep it is. The cursor of
+the next page is returned in the X-Next-Cursor header and is absent on the
+last page.
+"""
+import base64
+import json
+from typing import Any, Iterable, List, Optional, Sequence
+
+from starlette.responses import StreamingResponse
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# Rows fetched from the database cursor per round trip while streaming
+STREAM_BATCH_SIZE = 1000
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+def encode_cursor(key: Sequence[Any]) -> str:
+    raw = json.dumps(list(key), default=str, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str, length: int) -> List[Any]:
+    """Decode a cursor holding a sort key of the given length; raises ValueError if malformed"""
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (ValueError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
+    if not isinstance(key, list) or len(key) != length:
+        raise ValueError("Invalid cursor")
+    return key
+
+def page_headers(next_key: Optional[Sequence[Any]]) -> dict:
+    headers = {"Access-Control-Expose-Headers": NEXT_CURSOR_HEADER}
+    if next_key is not None:
+        headers[NEXT_CURSOR_HEADER] = encode_cursor(next_key)
+    return headers
+
+def ndjson_response(lines: Iterable[str], filename: str) -> StreamingResponse:
+    """Stream one JSON document per line; lines must not contain newlines"""
+    return StreamingResponse(
+        (line + "\n" for line in lines),
+        media_type=NDJSON_MEDIA_TYPE,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
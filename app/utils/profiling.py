@@ -0,0 +1,214 @@
+"""
+Opt-in profiling of single requests and timer commands.
+
+A request is profiled when it carries `X-Profile: <PROFILE_TOKEN>`, or at
+random with probability PROFILE_SAMPLE_RATE; a timer WebSocket opened with
+the header has every command profiled. The cProfile stats are written to
+PROFILE_DIR as .prof files (read them with `python -m pstats` or snakeviz),
+keeping the newest PROFILE_KEEP, and listed at GET /debug/profiles, which
+requires the token and is not served when only sampling is configured.
+
+The profiler runs on the event loop thread for the whole request, and in the
+worker thread of sync endpoints. While an async handler awaits, other
+coroutines run on the loop and show up in its profile too. One request is
+profiled at a time; others selected meanwhile run unprofiled.
+
+With neither PROFILE_TOKEN nor PROFILE_SAMPLE_RATE set nothing is installed,
+so unprofiled requests pay nothing.
+"""
+import cProfile
+import functools
+import hmac
+import inspect
+import io
+import os
+import pstats
+import random
+import re
+import threading
+import time
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional
+
+from fastapi.routing import APIRoute
+from starlette.concurrency import run_in_threadpool
+
+from utils.logging import setup_logger
+
+logger = setup_logger(__name__)
+
+# Requests carrying this value in the X-Profile header are profiled; empty disables the header
+PROFILE_TOKEN = os.environ.get("PROFILE_TOKEN", "")
+
+# Fraction of requests and timer commands profiled at random
+PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", "0"))
+
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "./profiles")
+
+# Older profiles are deleted as new ones are written
+PROFILE_KEEP = int(os.environ.get("PROFILE_KEEP", "50"))
+
+PROFILE_HEADER = "X-Profile"
+
+PROFILING = bool(PROFILE_TOKEN) or PROFILE_SAMPLE_RATE > 0
+
+# <started>_<label>_<milliseconds>ms.prof
+PROFILE_NAME = re.compile(r"^(\d{8}T\d{12})_([A-Za-z0-9_-]+)_(\d+)ms\.prof$")
+
+class ProfileCapture:
+    """The profilers of one request: one per thread it ran on, merged when saved"""
+
+    def __init__(self, label: str):
+        self.label = label
+        self.started = datetime.now()
+        self.profilers: List[cProfile.Profile] = []
+
+    def profiler(self) -> cProfile.Profile:
+        profiler = cProfile.Profile()
+        self.profilers.append(profiler)
+        return profiler
+
+    def save(self, seconds: float) -> str:
+        """Write the merged stats to PROFILE_DIR, delete the oldest beyond PROFILE_KEEP, and return the file name"""
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        label = re.sub(r"[^A-Za-z0-9_-]", "-", self.label)
+        name = f"{self.started:%Y%m%dT%H%M%S%f}_{label}_{seconds * 1000:.0f}ms.prof"
+        stats = pstats.Stats(self.profilers[0])
+        for profiler in self.profilers[1:]:
+            stats.add(profiler)
+        stats.dump_stats(os.path.join(PROFILE_DIR, name))
+
+        # Names start with the time, so they sort oldest first
+        if PROFILE_KEEP > 0:
+            for old in list_profile_names()[:-PROFILE_KEEP]:
+                os.remove(os.path.join(PROFILE_DIR, old))
+        return name
+
+_current: ContextVar[Optional[ProfileCapture]] = ContextVar("profile_capture", default=None)
+
+# cProfile hooks the thread it is enabled on, so the loop thread can only run one profiler at a time
+_capturing = threading.Lock()
+
+def authorized(value: Optional[str]) -> bool:
+    return bool(PROFILE_TOKEN) and value is not None and hmac.compare_digest(value, PROFILE_TOKEN)
+
+def selected(header_value: Optional[str]) -> bool:
+    """Whether to profile a request or command that carried `header_value` in X-Profile"""
+    return authorized(header_value) or (PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE)
+
+@asynccontextmanager
+async def profile(label: str) -> AsyncIterator[Optional[ProfileCapture]]:
+    """Profile the block on this thread, and sync endpoints it calls, then save the profile.
+
+    Yields the capture, whose label may still be changed, or None when another
+    request is being profiled.
+    """
+    if not _capturing.acquire(blocking=False):
+        yield None
+        return
+
+    capture = ProfileCapture(label)
+    token = _current.set(capture)
+    profiler = capture.profiler()
+    started = time.perf_counter()
+    profiler.enable()
+    try:
+        yield capture
+    finally:
+        profiler.disable()
+        _current.reset(token)
+        seconds = time.perf_counter() - started
+        try:
+            name = await run_in_threadpool(capture.save, seconds)
+            logger.info("Profiled %s in %.1f ms: %s", capture.label, seconds * 1000, name)
+        except OSError as e:
+            logger.error(f"Could not save profile of {capture.label}: {e}")
+        finally:
+            _capturing.release()
+
+def profiled_endpoint(endpoint):
+    """Wrap a sync endpoint to profile it, in its worker thread, when its request is profiled"""
+    @functools.wraps(endpoint)
+    def wrapper(*args, **kwargs):
+        capture = _current.get()
+        if capture is None:
+            return endpoint(*args, **kwargs)
+        profiler = capture.profiler()
+        try:
+            profiler.enable()
+        except ValueError:
+            # From Python 3.12 one profiler covers every thread, and the loop thread's is already active
+            return endpoint(*args, **kwargs)
+        try:
+            return endpoint(*args, **kwargs)
+        finally:
+            profiler.disable()
+
+    wrapper.profiled = True
+    return wrapper
+
+class ProfiledRoute(APIRoute):
+    """APIRoute whose sync endpoint is also profiled; a plain APIRoute when profiling is off"""
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        if PROFILING and not inspect.iscoroutinefunction(endpoint) and not getattr(endpoint, "profiled", False):
+            endpoint = profiled_endpoint(endpoint)
+        super().__init__(path, endpoint, **kwargs)
+
+class ProfilerMiddleware:
+    """Profile selected HTTP requests; only installed when profiling is configured"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        header = next((value.decode("latin-1") for key, value in scope["headers"] if key == b"x-profile"), None)
+        # Reading the profiles must not rotate them out
+        if not selected(header) or scope["path"].startswith("/debug/profiles"):
+            await self.app(scope, receive, send)
+            return
+
+        async with profile("unmatched") as capture:
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                endpoint = scope.get("endpoint")
+                if capture is not None and endpoint is not None:
+                    capture.label = endpoint.__name__
+
+def list_profile_names() -> List[str]:
+    try:
+        return sorted(name for name in os.listdir(PROFILE_DIR) if PROFILE_NAME.match(name))
+    except FileNotFoundError:
+        return []
+
+def list_profiles() -> List[Dict]:
+    """Saved profiles, newest first"""
+    profiles = []
+    for name in reversed(list_profile_names()):
+        started, label, milliseconds = PROFILE_NAME.match(name).groups()
+        profiles.append({
+            "name": name,
+            "label": label,
+            "started": datetime.strptime(started, "%Y%m%dT%H%M%S%f").isoformat(),
+            "duration_ms": int(milliseconds),
+        })
+    return profiles
+
+def profile_path(name: str) -> Optional[str]:
+    """Path of a saved profile, or None if `name` is not one"""
+    if not PROFILE_NAME.match(name) or not os.path.exists(os.path.join(PROFILE_DIR, name)):
+        return None
+    return os.path.join(PROFILE_DIR, name)
+
+def profile_summary(path: str, limit: int = 40) -> str:
+    """The `limit` functions with the highest cumulative time, as printed by pstats"""
+    output = io.StringIO()
+    pstats.Stats(path, stream=output).sort_stats("cumulative").print_stats(limit)
+    return output.getvalue()
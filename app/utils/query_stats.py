@@ -0,0 +1,190 @@
+"""
+SQL query accounting.
+
+Every engine created by utils/storage.py is instrumented: each statement is
+timed, and counted against the HTTP request or WebSocket command it runs
+for. QueryStatsMiddleware opens a scope per request; code outside a request
+(the WebSocket command loop) opens one with track_queries().
+
+Per-request totals go to the in-process metrics served at /metrics. With
+DEBUG=1 they are also returned on every response:
+
+    X-DB-Queries: 3
+    X-DB-Commits: 1
+    X-DB-Time-Ms: 1.72
+
+Statements slower than SLOW_QUERY_MS are logged at WARNING with their
+parameters and SQLite's query plan.
+
+DB time is the time spent in cursor.execute(): for SQLite that is the
+statement's first step, so rows fetched afterwards are not included.
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from utils.logging import setup_logger
+from utils.metrics import metrics
+
+logger = setup_logger(__name__)
+
+# Return query counts and DB time as response headers
+DEBUG = os.environ.get("DEBUG", "0") == "1"
+
+# Statements running longer than this are logged with parameters and plan; 0 disables the log
+SLOW_QUERY_MS = float(os.environ.get("SLOW_QUERY_MS", "100"))
+
+# Longest parameter list written to the slow-query log, in characters
+SLOW_QUERY_MAX_PARAMS = 500
+
+metrics.describe("db_request_queries", "summary", "SQL statements per request or WebSocket command")
+metrics.describe("db_request_commits", "summary", "Commits per request or WebSocket command")
+metrics.describe("db_request_seconds", "summary", "Time spent executing SQL per request or WebSocket command")
+metrics.describe("db_slow_queries_total", "counter", f"Statements slower than {SLOW_QUERY_MS:g} ms")
+
+class QueryStats:
+    __slots__ = ("queries", "commits", "seconds", "statements")
+
+    def __init__(self, record_statements: bool = False):
+        self.queries = 0
+        self.commits = 0
+        self.seconds = 0.0
+        # Only filled for query budgets, which report what ran when exceeded
+        self.statements: Optional[List[str]] = [] if record_statements else None
+
+    def add_query(self, statement: str, seconds: float):
+        self.queries += 1
+        self.seconds += seconds
+        if self.statements is not None:
+            self.statements.append(statement)
+
+    def headers(self) -> List[tuple]:
+        return [
+            (b"x-db-queries", str(self.queries).encode()),
+            (b"x-db-commits", str(self.commits).encode()),
+            (b"x-db-time-ms", f"{self.seconds * 1000:.2f}".encode()),
+        ]
+
+    def record(self, endpoint: str):
+        """Add these totals to the metrics of `endpoint`"""
+        metrics.observe("db_request_queries", self.queries, endpoint=endpoint)
+        metrics.observe("db_request_commits", self.commits, endpoint=endpoint)
+        metrics.observe("db_request_seconds", self.seconds, endpoint=endpoint)
+
+_current: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+# Query budgets count statements from every thread, since test clients serve requests on another one
+_budgets: List[QueryStats] = []
+_budgets_lock = threading.Lock()
+
+@contextmanager
+def track_queries() -> Iterator[QueryStats]:
+    """Count the statements run in this context (and threads started from it) while the block runs"""
+    stats = QueryStats()
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+@contextmanager
+def query_budget(queries: int, commits: Optional[int] = None) -> Iterator[QueryStats]:
+    """Fail with AssertionError if the block runs more than `queries` statements or `commits` commits.
+
+    For tests and benchmarks:
+
+        with query_budget(2):
+            client.get("/habits/due/today")
+    """
+    stats = QueryStats(record_statements=True)
+    with _budgets_lock:
+        _budgets.append(stats)
+    try:
+        yield stats
+    finally:
+        with _budgets_lock:
+            _budgets.remove(stats)
+    if stats.queries > queries:
+        ran = "\n".join(f"  {statement}" for statement in stats.statements)
+        raise AssertionError(f"{stats.queries} queries run, budget is {queries}:\n{ran}")
+    if commits is not None and stats.commits > commits:
+        raise AssertionError(f"{stats.commits} commits run, budget is {commits}")
+
+def explain(cursor, statement: str, parameters) -> str:
+    """SQLite's query plan for a statement, its steps separated by semicolons"""
+    try:
+        rows = cursor.connection.execute(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall()
+    except Exception as e:
+        return f"(no plan: {e})"
+    return "; ".join(row[-1] for row in rows) or "-"
+
+def log_slow_query(cursor, statement: str, parameters, seconds: float, executemany: bool):
+    metrics.increment("db_slow_queries_total")
+    shown = repr(parameters)
+    if len(shown) > SLOW_QUERY_MAX_PARAMS:
+        shown = shown[:SLOW_QUERY_MAX_PARAMS] + "..."
+    plan = "(executemany)" if executemany else explain(cursor, statement, parameters)
+    logger.warning(
+        "Slow query (%.1f ms): %s | parameters: %s | plan: %s",
+        seconds * 1000, " ".join(statement.split()), shown, plan
+    )
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # Kept on the statement's own context, so a statement that raises leaves nothing behind
+    context._query_start_time = time.perf_counter()
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    seconds = time.perf_counter() - context._query_start_time
+    stats = _current.get()
+    if stats is not None:
+        stats.add_query(statement, seconds)
+    if _budgets:
+        with _budgets_lock:
+            for budget in _budgets:
+                budget.add_query(statement, seconds)
+    if SLOW_QUERY_MS and seconds * 1000 >= SLOW_QUERY_MS:
+        log_slow_query(cursor, statement, parameters, seconds, executemany)
+
+def on_commit(conn):
+    stats = _current.get()
+    if stats is not None:
+        stats.commits += 1
+    if _budgets:
+        with _budgets_lock:
+            for budget in _budgets:
+                budget.commits += 1
+
+def instrument_engine(engine: Engine):
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", after_cursor_execute)
+    event.listen(engine, "commit", on_commit)
+
+class QueryStatsMiddleware:
+    """Count the queries of each HTTP request, into the metrics and, with DEBUG=1, response headers"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + stats.headers()
+            await send(message)
+
+        with track_queries() as stats:
+            try:
+                await self.app(scope, receive, send_with_headers if DEBUG else send)
+            finally:
+                # Label by the endpoint the router matched, not the raw path, to keep the label set bounded
+                endpoint = scope.get("endpoint")
+                stats.record(endpoint.__name__ if endpoint is not None else "unmatched")
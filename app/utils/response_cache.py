@@ -0,0 +1,107 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Callable, Dict, Hashable, Tuple
+
+from fastapi import Request
+from starlette.responses import Response
+
+from utils.http_cache import etag_matches, make_etag
+from utils.logging import setup_logger
+
+logger = setup_logger(__name__)
+
+class CachedResponse:
+    def __init__(self, body: bytes, media_type: str = "application/json"):
+        self.body = body
+        self.media_type = media_type
+        self.etag = make_etag(body)
+
+    def response(self, request: Request) -> Response:
+        """Serve the cached body, or a 304 if the client already holds it"""
+        # Clients must revalidate, which costs a header exchange when nothing changed
+        headers = {"ETag": self.etag, "Cache-Control": "no-cache"}
+        if etag_matches(request.headers.get("if-none-match"), self.etag):
+            return Response(status_code=304, headers=headers)
+        return Response(self.body, headers=headers, media_type=self.media_type)
+
+class ResponseCache:
+    """In-process cache of serialized responses, grouped in invalidation namespaces.
+
+    Keys are (namespace, *parts) tuples. Concurrent misses on the same key are
+    coalesced into a single computation. A computation that overlaps an
+    invalidation of its namespace is returned to its callers but not stored,
+    so a write can never be shadowed by a response computed before it.
+
+    The cache lives in the worker process: run a single worker, or accept that
+    other workers only see writes they served themselves.
+    """
+
+    def __init__(self, max_entries_per_namespace: int = 256):
+        self.max_entries_per_namespace = max_entries_per_namespace
+        self._entries: Dict[str, "OrderedDict[Tuple, CachedResponse]"] = {}
+        self._generations: Dict[str, int] = {}
+        self._in_flight: Dict[Tuple, Future] = {}
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key: Tuple[Hashable, ...], compute: Callable[[], bytes]) -> CachedResponse:
+        namespace = key[0]
+        with self._lock:
+            entries = self._entries.setdefault(namespace, OrderedDict())
+            entry = entries.get(key)
+            if entry is not None:
+                entries.move_to_end(key)
+                return entry
+
+            future = self._in_flight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._in_flight[key] = future
+                generation = self._generations.get(namespace, 0)
+
+        if not owner:
+            # Another request is already computing this response
+            return future.result()
+
+        try:
+            entry = CachedResponse(compute())
+        except BaseException as e:
+            with self._lock:
+                self._release(key, future)
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            self._release(key, future)
+            if self._generations.get(namespace, 0) == generation:
+                entries = self._entries.setdefault(namespace, OrderedDict())
+                entries[key] = entry
+                while len(entries) > self.max_entries_per_namespace:
+                    entries.popitem(last=False)
+        future.set_result(entry)
+        return entry
+
+    def _release(self, key: Tuple, future: Future):
+        # An invalidation may already have replaced this computation with a newer one
+        if self._in_flight.get(key) is future:
+            del self._in_flight[key]
+
+    def response(self, request: Request, key: Tuple[Hashable, ...], compute: Callable[[], bytes]) -> Response:
+        return self.get_or_compute(key, compute).response(request)
+
+    def invalidate(self, *namespaces: str):
+        """Drop every entry of the given namespaces"""
+        with self._lock:
+            for namespace in namespaces:
+                self._generations[namespace] = self._generations.get(namespace, 0) + 1
+                self._entries.pop(namespace, None)
+                # Later misses must not join a computation that started before this write
+                for key in [key for key in self._in_flight if key[0] == namespace]:
+                    del self._in_flight[key]
+        logger.debug("Invalidated response cache namespaces: %s", namespaces)
+
+    def clear(self):
+        with self._lock:
+            namespaces = list(self._entries)
+        self.invalidate(*namespaces)
@@ -0,0 +1,136 @@
+"""
+Shared SQLite engine configuration.
+
+Every database gets two engines on the same file:
+
+- a writer with a single pooled connection, so writes are serialized in the
+  pool instead of racing for SQLite's lock and failing with "database is locked";
+- a reader pool of query_only connections for GET endpoints and exports.
+
+In WAL mode readers never block behind the writer, and the writer never
+waits for readers. Each connection is tuned with the pragmas below when it
+is opened. Every setting can be overridden through the environment.
+
+Statements on both engines are counted and timed by utils/query_stats.py.
+
+Engines are created on first use, not at import, so importing the app never
+touches the disk.
+"""
+import os
+import threading
+from typing import NamedTuple, Optional
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from utils.logging import setup_logger
+from utils.query_stats import instrument_engine
+
+logger = setup_logger(__name__)
+
+# WAL lets readers and the writer run concurrently; set to DELETE for the rollback journal
+SQLITE_JOURNAL_MODE = os.environ.get("SQLITE_JOURNAL_MODE", "WAL")
+
+# In WAL mode NORMAL skips the fsync per commit; a power loss may only roll back the latest commits
+SQLITE_SYNCHRONOUS = os.environ.get("SQLITE_SYNCHRONOUS", "NORMAL")
+
+# Page cache per connection, in KiB
+SQLITE_CACHE_SIZE_KB = int(os.environ.get("SQLITE_CACHE_SIZE_KB", "65536"))
+
+# Bytes of the database file read through mmap instead of read() calls
+SQLITE_MMAP_SIZE = int(os.environ.get("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+
+# How long a connection waits for a lock held by another process before failing
+SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+
+# Pooled reader connections, and how many more may be opened under load
+SQLITE_READ_POOL_SIZE = int(os.environ.get("SQLITE_READ_POOL_SIZE", "8"))
+SQLITE_READ_POOL_OVERFLOW = int(os.environ.get("SQLITE_READ_POOL_OVERFLOW", "8"))
+
+# Seconds a request waits for the writer connection before giving up
+SQLITE_WRITE_TIMEOUT = float(os.environ.get("SQLITE_WRITE_TIMEOUT", "30"))
+
+class StorageEngines(NamedTuple):
+    write: Engine
+    read: Engine
+
+def create_engines(url: str) -> StorageEngines:
+    """Create the serialized writer and the reader pool for a SQLite database URL"""
+    logger.info(f"Initializing database engines for {url} (journal_mode={SQLITE_JOURNAL_MODE})")
+    connect_args = {"check_same_thread": False}  # Pooled connections move between threads
+
+    write = create_engine(
+        url,
+        connect_args=connect_args,
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=SQLITE_WRITE_TIMEOUT
+    )
+    read = create_engine(
+        url,
+        connect_args=connect_args,
+        pool_size=SQLITE_READ_POOL_SIZE,
+        max_overflow=SQLITE_READ_POOL_OVERFLOW
+    )
+    event.listen(write, "connect", lambda conn, _: configure_connection(conn, read_only=False))
+    event.listen(read, "connect", lambda conn, _: configure_connection(conn, read_only=True))
+    instrument_engine(write)
+    instrument_engine(read)
+    return StorageEngines(write=write, read=read)
+
+def configure_connection(dbapi_connection, read_only: bool):
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute(f"PRAGMA busy_timeout = {SQLITE_BUSY_TIMEOUT_MS}")
+        if not read_only:
+            # Stored in the database file; the writer sets it before any reader can open the file
+            cursor.execute(f"PRAGMA journal_mode = {SQLITE_JOURNAL_MODE}")
+        cursor.execute(f"PRAGMA synchronous = {SQLITE_SYNCHRONOUS}")
+        # Negative values are in KiB rather than pages
+        cursor.execute(f"PRAGMA cache_size = -{SQLITE_CACHE_SIZE_KB}")
+        cursor.execute(f"PRAGMA mmap_size = {SQLITE_MMAP_SIZE}")
+        cursor.execute("PRAGMA temp_store = MEMORY")
+        if read_only:
+            cursor.execute("PRAGMA query_only = ON")
+    finally:
+        cursor.close()
+
+class Database:
+    """Engines and session factories of one database, created on first use"""
+
+    def __init__(self, url: str):
+        self.url = url
+        self._engines: Optional[StorageEngines] = None
+        self._lock = threading.Lock()
+        self._sessions = sessionmaker(autocommit=False, autoflush=False)
+        self._read_sessions = sessionmaker(autocommit=False, autoflush=False)
+
+    @property
+    def engines(self) -> StorageEngines:
+        if self._engines is None:
+            with self._lock:
+                if self._engines is None:
+                    engines = create_engines(self.url)
+                    self._sessions.configure(bind=engines.write)
+                    self._read_sessions.configure(bind=engines.read)
+                    self._engines = engines
+        return self._engines
+
+    def session(self) -> Session:
+        """Session on the writer"""
+        self.engines
+        return self._sessions()
+
+    def read_session(self) -> Session:
+        """Session on the read-only pool"""
+        self.engines
+        return self._read_sessions()
+
+    def dispose(self):
+        """Close every pooled connection; engines are recreated on next use"""
+        with self._lock:
+            if self._engines is not None:
+                self._engines.write.dispose()
+                self._engines.read.dispose()
+                self._engines = None
@@ -51,8 +51,26 @@ class HabitClient:
         response.raise_for_status()
         return response.json()
     
+    def import_file(self, path: str) -> Dict[str, Any]:
+        """Stream an NDJSON or CSV file of habits and logs to the import endpoint"""
+        content_type = "text/csv" if str(path).lower().endswith(".csv") else "application/x-ndjson"
+        with open(path, "rb") as f:
+            response = requests.post(
+                f"{self.api_endpoint}/habits/import",
+                data=f,
+                headers={"Content-Type": content_type}
+            )
+        response.raise_for_status()
+        return response.json()
+
     def complete_habit(self, log_id: str) -> bool:
         """Mark a habit log as completed"""
-        response = requests.put(f"{self.api_endpoint}/habits/check/{log_id}")
+        # The server echoes IDs in canonical form, so take the one result rather than look it up
+        (completed,) = self.complete_habits([log_id]).values()
+        return completed
+
+    def complete_habits(self, log_ids: List[str]) -> Dict[str, bool]:
+        """Mark several habit logs as completed in one request"""
+        response = requests.post(f"{self.api_endpoint}/habits/check", json={"log_ids": log_ids})
         response.raise_for_status()
-        return response.json()["status"] == "success" 
\ No newline at end of file
+        return {item["id"]: item["status"] == "success" for item in response.json()["results"]} 
\ No newline at end of file
@@ -1,7 +1,7 @@
 import click
 from datetime import datetime
 from client import HabitClient
-from typing import Optional
+from typing import Optional, Tuple
 import sys
 from pathlib import Path
 
@@ -62,15 +62,31 @@ def due(ctx, date: Optional[str]):
             click.echo(f"  Log ID: {log['id']}")
 
 @cli.command()
-@click.argument('log_id')
+@click.argument('log_ids', nargs=-1, required=True)
 @click.pass_context
-def complete(ctx, log_id: str):
-    """Mark a habit as completed"""
+def complete(ctx, log_ids: Tuple[str, ...]):
+    """Mark one or more habits as completed"""
     client = ctx.obj['client']
-    if client.complete_habit(log_id):
-        click.echo("Habit marked as completed")
-    else:
-        click.echo("Failed to mark habit as completed", err=True)
+    results = client.complete_habits(list(log_ids))
+    for log_id in log_ids:
+        if results.get(log_id):
+            click.echo(f"Habit log {log_id} marked as completed")
+        else:
+            click.echo(f"Failed to mark habit log {log_id} as completed", err=True)
+
+@cli.command(name='import')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.pass_context
+def import_(ctx, path: str):
+    """Import habits and logs from an NDJSON or CSV file"""
+    client = ctx.obj['client']
+    result = client.import_file(path)
+    click.echo(f"Imported {result['habits']} habits and {result['logs']} logs "
+               f"in {result['seconds']}s ({result['records_per_second']} records/s)")
+    if result['skipped']:
+        click.echo(f"Skipped {result['skipped']} records:", err=True)
+        for issue in result['issues']:
+            click.echo(f"  line {issue['line']}: {issue['detail']}", err=True)
 
 def main():
     cli(obj={})
@@ -2,38 +2,38 @@ $(document).ready(async function() {
     const DAYS_TO_SHOW = 7;
 
     
-    const toggleHabitLog = async (logId, completed) => {
-        const endpoint = completed ? 'uncheck' : 'check';
+    // Check or uncheck several logs in one request; resolves to the IDs that were updated
+    const setHabitLogs = async (logIds, completed) => {
+        const endpoint = completed ? 'check' : 'uncheck';
         try {
-            const response = await fetch(`${API_URL}/habits/${endpoint}/${logId}`, {
-                method: 'PUT'
+            const response = await fetch(`${API_URL}/habits/${endpoint}`, {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ log_ids: logIds })
             });
-            if (!response.ok) throw new Error('Failed to toggle habit');
-            return true;
+            if (!response.ok) throw new Error('Failed to update habits');
+            const data = await response.json();
+            return data.results.filter(item => item.status === 'success').map(item => item.id);
         } catch (error) {
-            console.error('Error toggling habit:', error);
-            return false;
+            console.error('Error updating habits:', error);
+            return [];
         }
-    }; 
+    };
 
-    async function fetchHabits() {
+    // One request for the whole table: habit x day slot and completion matrices
+    async function fetchCalendar(from, to) {
         try {
-            const response = await fetch(`${API_URL}/habits`);
+            const response = await fetch(`${API_URL}/habits/calendar?from=${formatDate(from)}&to=${formatDate(to)}`);
             return await response.json();
         } catch (error) {
-            console.error('Error fetching habits:', error);
-            return [];
+            console.error('Error fetching habit calendar:', error);
+            return { habits: [], slots: [], completed: [] };
         }
     }
 
-    async function fetchHabitsForDate(date) {
-        try {
-            const response = await fetch(`${API_URL}/habits/due?date=${formatDate(date)}`);
-            return await response.json();
-        } catch (error) {
-            console.error('Error fetching habits for date:', error);
-            return [];
-        }
+    // Log ID of a habit's slot: the habit ID prefix followed by the slot index in hex
+    function slotLogId(habitId, index) {
+        return habitId.slice(0, 28) + index.toString(16).padStart(8, '0');
     }
 
     function populateHeaders(habits) {
@@ -43,43 +43,33 @@ $(document).ready(async function() {
         });
     }
 
-    async function populateTable(habits) {
-        console.log('Starting populateTable with habits:', habits);
+    function populateTable(calendar, to) {
         const tbody = $('#habits-body');
         tbody.empty();
 
+        // Most recent day first; column j of the matrices is calendar.start + j days
         for (let i = 0; i < DAYS_TO_SHOW; i++) {
-            const date = new Date();
+            const date = new Date(to);
             date.setDate(date.getDate() - i);
-            console.log(`Processing date: ${formatDate(date)}`);
-            
-            const habitLogs = await fetchHabitsForDate(date);
-            console.log('Fetched habit logs:', habitLogs);
-            
+            const day = DAYS_TO_SHOW - 1 - i;
+
             const row = $('<tr>');
-            row.append(`<td>${formatDate(date)}</td>`);
+            row.append(`<td class="date-cell" title="Complete all">${formatDate(date)}</td>`);
 
-            habits.forEach(habit => {
-                console.log(`Processing habit: ${habit.name} (${habit.id})`);
-                const habitLog = habitLogs.find(log => log.habit.id === habit.id);
-                console.log('Found habit log:', habitLog);
-                
-                const completed = habitLog?.latest_log?.completed || false;
-                const logId = habitLog?.latest_log?.id;
-                console.log(`Status - completed: ${completed}, logId: ${logId}`);
-                
+            calendar.habits.forEach((habit, h) => {
+                const slot = calendar.slots[h][day];
+                const completed = calendar.completed[h][day] === 1;
                 const cell = $('<td>', {
                     class: `habit-cell ${completed ? 'completed' : 'uncompleted'}`,
-                    'data-log-id': logId,
+                    'data-log-id': slot > 0 ? slotLogId(habit.id, slot) : undefined,
                     'data-completed': completed
                 });
-                
+
                 row.append(cell);
             });
 
             tbody.append(row);
         }
-        console.log('Finished populating table');
     }
 
     // Event delegation for habit cell clicks
@@ -88,14 +78,33 @@ $(document).ready(async function() {
         const logId = cell.data('log-id');
         const completed = cell.data('completed');
 
-        if (logId && await toggleHabitLog(logId, completed)) {
+        if (logId && (await setHabitLogs([logId], !completed)).length) {
             cell.toggleClass('completed uncompleted');
             cell.data('completed', !completed);
         }
     });
 
+    // Clicking a date completes every open habit of that day at once
+    $('#habits-table').on('click', '.date-cell', async function() {
+        const cells = $(this).siblings('.habit-cell.uncompleted')
+            .filter((_, cell) => $(cell).data('log-id'));
+        const logIds = cells.map((_, cell) => $(cell).data('log-id')).get();
+        if (!logIds.length) return;
+
+        const updated = new Set(await setHabitLogs(logIds, true));
+        cells.each((_, cell) => {
+            if (updated.has($(cell).data('log-id'))) {
+                $(cell).toggleClass('completed uncompleted');
+                $(cell).data('completed', true);
+            }
+        });
+    });
+
     // Initial load
-    const habits = await fetchHabits();
-    populateHeaders(habits);
-    await populateTable(habits);
+    const to = new Date();
+    const from = new Date(to);
+    from.setDate(from.getDate() - (DAYS_TO_SHOW - 1));
+    const calendar = await fetchCalendar(from, to);
+    populateHeaders(calendar.habits);
+    populateTable(calendar, to);
 }); 
\ No newline at end of file
@@ -315,20 +315,12 @@ $(document).ready(function() {
                 wav: isAudioFormatSupported('audio/wav')
             };
             
-            // If this might be an AIFF file and browser doesn't support AIFF, request conversion
-            if (!browserSupport.aiff && browserSupport.mp3) {
-                // First make a HEAD request to check if it's an AIFF file
-                try {
-                    const response = await fetch(requestUrl, { method: 'GET' });
-                    const contentType = response.headers.get('content-type');
-                    
-                    if (contentType && contentType.includes('audio/aiff')) {
-                        console.log('AIFF file detected and browser does not support AIFF. Requesting MP3 conversion.');
-                        requestUrl += '?convert_format=mp3';
-                    }
-                } catch (error) {
-                    console.error('Error checking file type:', error);
-                }
+            // If this is an AIFF file and browser doesn't support AIFF, request conversion.
+            // The sound list already carries each file's media type, so no probe request is needed.
+            const sound = availableSounds.find(s => s.id === soundId);
+            if (!browserSupport.aiff && browserSupport.mp3 && sound && sound.media_type === 'audio/aiff') {
+                console.log('AIFF file detected and browser does not support AIFF. Requesting MP3 conversion.');
+                requestUrl += '?convert_format=mp3';
             }
             
             console.log(`Sound URL: ${requestUrl}`);